@@ -0,0 +1,137 @@
+import hashlib
+import logging
+import math
+import threading
+import time
+import uuid
+from datetime import timedelta
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+
+
+logger = logging.getLogger(__name__)
+
+# Génération partagée entre workers : elle change à chaque mise en liste noire (signal post_save)
+GENERATION_CACHE_KEY = 'token-blacklist:generation'
+# Marge de relecture : une transaction validée en retard peut porter un blacklisted_at antérieur au dernier relevé
+SYNC_OVERLAP = timedelta(minutes=1)
+
+
+def current_generation():
+    generation = cache.get(GENERATION_CACHE_KEY)
+    if generation is None:
+        # Génération absente (premier accès, cache vidé) : un seul worker impose la sienne
+        cache.add(GENERATION_CACHE_KEY, uuid.uuid4().hex, timeout=None)
+        generation = cache.get(GENERATION_CACHE_KEY)
+    return generation
+
+
+def bump_generation():
+    cache.set(GENERATION_CACHE_KEY, uuid.uuid4().hex, timeout=None)
+
+
+class BloomFilter:
+    """
+    Filtre de Bloom : « absent » est certain, « présent » est un faux positif avec une probabilité
+    `error_rate` tant que le filtre ne dépasse pas `capacity` éléments.
+    """
+
+    def __init__(self, capacity, error_rate):
+        capacity = max(capacity, 1)
+        self.size = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def positions(self, key):
+        # Double hachage (Kirsch-Mitzenmacher) : les k positions dérivent de deux empreintes de 64 bits
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        first, second = int.from_bytes(digest[:8], 'little'), int.from_bytes(digest[8:], 'little') | 1
+        return [(first + index * second) % self.size for index in range(self.hashes)]
+
+    def add(self, key):
+        for position in self.positions(key):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, key):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self.positions(key))
+
+
+class BlacklistFilter:
+    """
+    Filtre de Bloom des jti en liste noire, propre au processus, consulté avant la table token_blacklist :
+    un jti absent du filtre n'est certainement pas en liste noire et la requête est évitée.
+    Le filtre est reconstruit en arrière-plan toutes les TOKEN_BLACKLIST_BLOOM_REBUILD_SECONDS et complété
+    dès que la génération partagée change, avec les jti mis en liste noire par les autres workers.
+    """
+
+    def __init__(self):
+        self.bloom = None
+        self.built_at = 0.0
+        self.synced_at = None
+        self.generation = None
+        self.lock = threading.Lock()
+        self.building = False
+
+    def might_contain(self, jti):
+        """ Faux si le jti n'est certainement pas en liste noire ; vrai s'il faut vérifier en base. """
+        if self.bloom is None or time.monotonic() - self.built_at > settings.TOKEN_BLACKLIST_BLOOM_REBUILD_SECONDS:
+            self.schedule_rebuild()
+        if self.bloom is None:
+            return True  # Premier filtre en construction : la base fait foi
+        self.sync()
+        return jti in self.bloom
+
+    def add(self, jti):
+        with self.lock:
+            if self.bloom is not None:
+                self.bloom.add(jti)
+
+    def sync(self):
+        """ Ajoute les jti mis en liste noire depuis la dernière relecture, si la génération a changé. """
+        generation = current_generation()
+        if generation == self.generation:
+            return
+        started = timezone.now()
+        jtis = list(
+            BlacklistedToken.objects.filter(blacklisted_at__gte=self.synced_at - SYNC_OVERLAP).values_list('token__jti', flat=True)
+        )
+        with self.lock:
+            for jti in jtis:
+                self.bloom.add(jti)
+            self.synced_at, self.generation = started, generation
+
+    def rebuild(self):
+        """ Reconstruit le filtre avec les jti encore valides : un token expiré est refusé de toute façon. """
+        started = timezone.now()
+        generation = current_generation()
+        tokens = BlacklistedToken.objects.filter(token__expires_at__gt=started)
+        # Marge pour les mises en liste noire jusqu'à la prochaine reconstruction
+        capacity = max(2 * tokens.count(), settings.TOKEN_BLACKLIST_BLOOM_MIN_CAPACITY)
+        bloom = BloomFilter(capacity, settings.TOKEN_BLACKLIST_BLOOM_ERROR_RATE)
+        for jti in tokens.values_list('token__jti', flat=True).iterator(chunk_size=10000):
+            bloom.add(jti)
+        with self.lock:
+            self.bloom, self.built_at, self.synced_at, self.generation = bloom, time.monotonic(), started, generation
+
+    def schedule_rebuild(self):
+        with self.lock:
+            if self.building:
+                return
+            self.building = True
+        threading.Thread(target=self.run_rebuild, name='token-blacklist-bloom', daemon=True).start()
+
+    def run_rebuild(self):
+        try:
+            self.rebuild()
+        except Exception:
+            logger.exception("Échec de la reconstruction du filtre de la liste noire des tokens")
+        finally:
+            with self.lock:  # Même verrou que schedule_rebuild : une seule reconstruction à la fois
+                self.building = False
+            connections.close_all()  # Connexions ouvertes par ce thread uniquement
+
+
+blacklist_filter = BlacklistFilter()
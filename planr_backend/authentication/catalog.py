@@ -0,0 +1,96 @@
+import bisect
+import hashlib
+import threading
+import time
+import unicodedata
+import uuid
+from django.conf import settings
+from django.core.cache import cache
+from .models import Interest
+
+
+# Version partagée entre workers : la changer invalide les catalogues en mémoire de tous les processus
+VERSION_CACHE_KEY = 'interest-catalog:version'
+
+
+def normalize(text):
+    """ Minuscules sans accents : « Écologie » et « eco » se comparent sur « ecologie ». """
+    decomposed = unicodedata.normalize('NFKD', text.casefold())
+    return ''.join(char for char in decomposed if not unicodedata.combining(char))
+
+
+class InterestCatalog:
+    """
+    Copie en mémoire de la table Interest, petite et rarement modifiée.
+    Chaque lecture compare la version locale à la version partagée dans le cache et ne recharge
+    la table qu'après une modification (signaux post_save / post_delete). La version n'est partagée
+    que si le cache l'est : avec LocMemCache, les autres workers ne voient pas l'invalidation et se
+    contentent de recharger la table toutes les INTEREST_CATALOG_MAX_AGE secondes.
+    """
+
+    def __init__(self, version, interests):
+        self.version = version
+        self.loaded_at = time.monotonic()
+        self.interests = sorted(interests, key=lambda interest: normalize(interest.name))
+        # Empreinte du contenu (ETag) : identique sur tous les workers ayant chargé la même table
+        self.etag = hashlib.blake2b(
+            repr([(interest.id, interest.name) for interest in self.interests]).encode(), digest_size=8
+        ).hexdigest()
+        self.by_id = {interest.id: interest for interest in self.interests}
+        # Index trié (terme normalisé, rang, id) de chaque nom complet et de chacun de ses mots :
+        # une recherche de préfixe est une dichotomie, comme la descente d'un trie
+        terms = set()
+        for interest in self.interests:
+            name = normalize(interest.name)
+            terms.add((name, 0, interest.id))
+            terms.update((word, 1, interest.id) for word in name.split()[1:])
+        self.terms = sorted(terms)
+        self.keys = [term for term, _, _ in self.terms]
+
+    def is_expired(self):
+        max_age = settings.INTEREST_CATALOG_MAX_AGE
+        return bool(max_age) and time.monotonic() - self.loaded_at > max_age
+
+    def search(self, query, limit):
+        """ Centres d'intérêt dont le nom ou l'un des mots commence par `query`, noms complets en tête. """
+        prefix = normalize(query).strip()
+        start = bisect.bisect_left(self.keys, prefix)
+        end = bisect.bisect_left(self.keys, prefix + '\U0010ffff', lo=start)
+        matches = sorted(self.terms[start:end], key=lambda term: (term[1], term[0]))
+
+        results, seen = [], set()
+        for _, _, interest_id in matches:
+            if interest_id not in seen:
+                seen.add(interest_id)
+                results.append(self.by_id[interest_id])
+                if len(results) == limit:
+                    break
+        return results
+
+
+_catalog = None
+_lock = threading.Lock()
+
+
+def get_catalog():
+    """ Retourne le catalogue du processus, rechargé si la version partagée a changé. """
+    global _catalog
+    version = cache.get(VERSION_CACHE_KEY)
+    if version is None:
+        # Version absente (premier accès, cache vidé) : un seul worker impose la sienne
+        cache.add(VERSION_CACHE_KEY, uuid.uuid4().hex, timeout=None)
+        version = cache.get(VERSION_CACHE_KEY)
+
+    catalog = _catalog
+    if catalog is not None and catalog.version == version and not catalog.is_expired():
+        return catalog
+    with _lock:
+        if _catalog is None or _catalog.version != version or _catalog.is_expired():
+            _catalog = InterestCatalog(version, list(Interest.objects.only('id', 'name')))
+        return _catalog
+
+
+def invalidate_catalog():
+    """ Change la version partagée : chaque worker rechargera la table à sa prochaine lecture. """
+    # Jeton aléatoire plutôt qu'un compteur : une version perdue par le cache ne peut pas revenir
+    cache.set(VERSION_CACHE_KEY, uuid.uuid4().hex, timeout=None)
@@ -0,0 +1,82 @@
+import json
+import logging
+import logging.config
+import tempfile
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client
+
+from planr_backend.benchmark import summarize
+
+
+def logging_config(handler):
+    return {
+        'version': 1,
+        'disable_existing_loggers': False,
+        'formatters': {'json': {'()': 'planr_backend.log.JsonFormatter'}},
+        'handlers': {'file': handler},
+        'loggers': {'django': {'handlers': ['file'], 'level': 'DEBUG'}},
+    }
+
+
+class Command(BaseCommand):
+    help = "Mesure le surcoût de la journalisation sur la latence des requêtes (FileHandler synchrone vs file non bloquante)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=300)
+        parser.add_argument('--records', type=int, default=20000, help="Nombre d'enregistrements pour la mesure unitaire.")
+
+    def handle(self, *args, **options):
+        settings.ALLOWED_HOSTS = [*settings.ALLOWED_HOSTS, 'testserver']
+        results = {}
+        with tempfile.TemporaryDirectory() as directory:
+            handlers = {
+                'sync_file_handler': {
+                    'class': 'logging.FileHandler',
+                    'filename': Path(directory) / 'sync.log',
+                    'formatter': 'json',
+                },
+                'queue_handler': {
+                    '()': 'planr_backend.log.QueueRotatingFileHandler',
+                    'filename': Path(directory) / 'queue.log',
+                    'formatter': 'json',
+                },
+            }
+            for name, handler in handlers.items():
+                logging.config.dictConfig(logging_config(handler))
+                results[name] = {
+                    'emit': self.bench_emit(options['records']),
+                    'request': self.bench_requests(options['requests']),
+                }
+        logging.config.dictConfig(settings.LOGGING)
+        self.stdout.write(json.dumps(results, indent=2))
+
+    def bench_emit(self, count):
+        """ Latence d'un appel de log vu du thread appelant. """
+        logger = logging.getLogger('django.bench')
+        latencies = []
+        start = time.perf_counter()
+        for index in range(count):
+            call_start = time.perf_counter()
+            logger.debug("Enregistrement de benchmark %s", index)
+            latencies.append(time.perf_counter() - call_start)
+        return summarize(latencies, time.perf_counter() - start)
+
+    def bench_requests(self, count):
+        """ Latence de requêtes réelles avec journalisation SQL et requêtes au niveau DEBUG (comme en DEBUG=True). """
+        client = Client()
+        latencies = []
+        connection.force_debug_cursor = True  # Active les logs de django.db.backends
+        try:
+            start = time.perf_counter()
+            for _ in range(count):
+                call_start = time.perf_counter()
+                client.post('/users/check_registration/', {'email': 'bench-logging@planr.dev'}, content_type='application/json')
+                latencies.append(time.perf_counter() - call_start)
+            return summarize(latencies, time.perf_counter() - start)
+        finally:
+            connection.force_debug_cursor = False
@@ -0,0 +1,66 @@
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import get_hashers, make_password
+from django.core.management.base import BaseCommand
+
+from authentication.models import User
+from authentication.utils import verify_password
+from planr_backend.benchmark import summarize
+
+
+PASSWORD = 'Bench-password-2024!'
+
+
+class Command(BaseCommand):
+    help = "Mesure le coût de hachage et de vérification de chaque hasheur configuré, et le débit de connexions par cœur."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=10, help="Vérifications mesurées par hasheur.")
+        parser.add_argument('--concurrency', type=int, default=(os.cpu_count() or 1) * 4, help="Connexions simultanées.")
+        parser.add_argument('--logins', type=int, default=100, help="Vérifications au total.")
+
+    def handle(self, *args, **options):
+        cores = os.cpu_count() or 1
+        results = {'cores': cores, 'check_workers': settings.PASSWORD_CHECK_WORKERS, 'hashers': {}}
+
+        for hasher in get_hashers():
+            encoded = hasher.encode(PASSWORD, hasher.salt())
+            verify = self.measure(lambda: hasher.verify(PASSWORD, encoded), options['repeat'])
+            results['hashers'][hasher.algorithm] = {
+                'encode': self.measure(lambda: hasher.encode(PASSWORD, hasher.salt()), options['repeat']),
+                'verify': verify,
+                'logins_per_second_per_core': round(1000 / verify['mean_ms'], 2) if verify['mean_ms'] else None,
+            }
+
+        # Connexions simultanées avec le hasheur préféré, limitées comme dans la vue de connexion
+        encoded = make_password(PASSWORD)
+
+        def login(_):
+            start = time.perf_counter()
+            verify_password(User(password=encoded), PASSWORD)
+            return time.perf_counter() - start
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as pool:
+            latencies = list(pool.map(login, range(options['logins'])))
+        concurrent = summarize(latencies, time.perf_counter() - start)
+        results['concurrent'] = {
+            'hasher': get_hashers()[0].algorithm,
+            'concurrency': options['concurrency'],
+            **concurrent,
+            'logins_per_second_per_core': round(concurrent['throughput'] / min(cores, settings.PASSWORD_CHECK_WORKERS), 2),
+        }
+        self.stdout.write(json.dumps(results, indent=2))
+
+    def measure(self, func, repeat):
+        latencies = []
+        start = time.perf_counter()
+        for _ in range(repeat):
+            call_start = time.perf_counter()
+            func()
+            latencies.append(time.perf_counter() - call_start)
+        return summarize(latencies, time.perf_counter() - start)
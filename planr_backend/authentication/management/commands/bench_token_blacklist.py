@@ -0,0 +1,62 @@
+import json
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+
+from authentication.blacklist import blacklist_filter
+from authentication.models import User
+from authentication.serializers import PlanrTokenRefreshSerializer
+from authentication.tokens import PlanrRefreshToken
+from planr_backend.benchmark import measure, rolled_back
+
+
+class Command(BaseCommand):
+    help = (
+        "Mesure le débit de rafraîchissements (token/refresh/) avec et sans filtre de Bloom "
+        "devant une grande liste noire de tokens."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--blacklisted', type=int, default=200000, help="Tokens en liste noire générés.")
+        parser.add_argument('--refreshes', type=int, default=200, help="Rafraîchissements mesurés par scénario.")
+
+    def handle(self, *args, **options):
+        results = {}
+
+        configured = settings.TOKEN_BLACKLIST_BLOOM
+        try:
+            with rolled_back():
+                self.seed_blacklist(options['blacklisted'])
+                user = User.objects.create_user(email='bench-blacklist@planr.dev', password=None)
+                blacklist_filter.rebuild()  # Synchrone : un thread ne verrait pas les lignes non validées
+
+                for label, enabled in [('database', False), ('bloom', True)]:
+                    settings.TOKEN_BLACKLIST_BLOOM = enabled
+                    tokens = iter([str(PlanrRefreshToken.for_user(user)) for _ in range(options['refreshes'])])
+                    results[label] = measure(lambda: self.refresh(next(tokens)), options['refreshes'])
+        finally:
+            settings.TOKEN_BLACKLIST_BLOOM = configured
+
+        results['blacklisted'] = options['blacklisted']
+        results['filter_bytes'] = len(blacklist_filter.bloom.bits)
+        self.stdout.write(json.dumps(results, indent=2))
+
+    def seed_blacklist(self, count):
+        expires_at = timezone.now() + timedelta(days=30)
+        for offset in range(0, count, 10000):
+            outstanding = OutstandingToken.objects.bulk_create([
+                OutstandingToken(jti=uuid.uuid4().hex, token='bench', expires_at=expires_at)
+                for _ in range(min(10000, count - offset))
+            ])
+            if outstanding[0].pk is None:
+                # Sans RETURNING (anciennes versions de SQLite), les IDs sont relus depuis la base
+                outstanding = OutstandingToken.objects.filter(jti__in=[token.jti for token in outstanding])
+            BlacklistedToken.objects.bulk_create([BlacklistedToken(token=token) for token in outstanding])
+
+    def refresh(self, token):
+        serializer = PlanrTokenRefreshSerializer(data={'refresh': token})
+        serializer.is_valid(raise_exception=True)
@@ -0,0 +1,83 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import OutstandingToken
+
+from authentication.models import PasswordResetAttempt, PasswordResetToken, User
+from events.models import EventRegistration, PrivateEvent
+
+
+class Command(BaseCommand):
+    help = "Purge par lots les données d'authentification expirées (OTP, jetons, tentatives, comptes non vérifiés)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--dry-run', action='store_true', help="Compte les lignes concernées sans rien modifier.")
+        parser.add_argument('--reset-attempt-days', type=int, default=30, help="Conserve les tentatives de réinitialisation de moins de N jours.")
+        parser.add_argument('--stale-user-days', type=int, default=7, help="Supprime les comptes non vérifiés depuis plus de N jours.")
+
+    def handle(self, *args, **options):
+        self.batch_size = options['batch_size']
+        self.dry_run = options['dry_run']
+        now = timezone.now()
+
+        # Comptes créés par process_registration jamais vérifiés, sans aucune activité. last_login est renseigné dès
+        # la première vérification d'OTP : un compte désactivé par un administrateur n'est donc jamais supprimé ici
+        stale_users = User.objects.filter(
+            is_active=False,
+            last_login__isnull=True,
+            otp_created_at__lt=now - timedelta(days=options['stale_user_days']),
+            profile__is_profile_complete=False,
+        ).filter(
+            ~Exists(PrivateEvent.objects.filter(organizer=OuterRef('pk'))),
+            ~Exists(EventRegistration.objects.filter(user=OuterRef('pk'))),
+        )
+        self.purge('Comptes non vérifiés supprimés', stale_users, lambda batch: batch.delete())
+
+        # Au-delà de 15 minutes l'OTP n'est plus valide ; otp_created_at est conservé pour repérer les comptes non vérifiés
+        self.purge(
+            'OTP expirés effacés',
+            User.objects.filter(otp__isnull=False, otp_created_at__lt=now - timedelta(minutes=15)),
+            lambda batch: batch.update(otp=None),
+        )
+        self.purge(
+            'Jetons de réinitialisation expirés supprimés',
+            PasswordResetToken.objects.filter(expires_at__lt=now),
+            lambda batch: batch.delete(),
+        )
+        self.purge(
+            'Tentatives de réinitialisation supprimées',
+            PasswordResetAttempt.objects.filter(requested_at__lt=now - timedelta(days=options['reset_attempt_days'])),
+            lambda batch: batch.delete(),
+        )
+        # Supprime aussi les entrées de blacklist associées (cascade)
+        self.purge(
+            'Jetons JWT expirés supprimés',
+            OutstandingToken.objects.filter(expires_at__lt=now),
+            lambda batch: batch.delete(),
+        )
+
+    def purge(self, label, queryset, apply):
+        """
+        Applique `apply` par lots de clés primaires tant que des lignes correspondent au filtre.
+        Chaque lot est une transaction courte pour ne pas bloquer les tables d'authentification.
+        """
+        start = time.perf_counter()
+        if self.dry_run:
+            total = queryset.count()
+        else:
+            total = 0
+            while True:
+                pks = list(queryset.order_by('pk').values_list('pk', flat=True)[:self.batch_size])
+                if not pks:
+                    break
+                with transaction.atomic():
+                    apply(queryset.model.objects.filter(pk__in=pks))
+                total += len(pks)
+
+        prefix = '[dry-run] ' if self.dry_run else ''
+        self.stdout.write(f"{prefix}{label} : {total} en {time.perf_counter() - start:.2f}s")
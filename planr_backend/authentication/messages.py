@@ -37,6 +37,7 @@ class ErrorMessages:
 
     # Autres erreurs générales
     TOO_MANY_REQUESTS = "Trop de tentatives. Veuillez attendre et réessayer."
+    SERVICE_BUSY = "Le service est momentanément surchargé. Veuillez réessayer dans quelques instants."
     INTERNAL_SERVER_ERROR = "Une erreur interne est survenue. Veuillez réessayer plus tard."
     ACTION_NOT_ALLOWED = "Cette action n'est pas autorisée."
 
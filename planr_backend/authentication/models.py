@@ -1,5 +1,5 @@
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, PermissionsMixin
-from django.db import models
+from django.db import connection, models
 from django.utils import timezone
 from django.core.validators import FileExtensionValidator
 from django.utils.translation import gettext_lazy as _
@@ -7,8 +7,8 @@ from .messages import ErrorMessages, SuccessMessages
 from datetime import timedelta
 import planr_backend.settings as settings
 from planr_backend.utils import process_image
-import uuid
 import hashlib
+import secrets
 
 
 class UserManager(BaseUserManager):
@@ -39,9 +39,7 @@ class User(AbstractBaseUser, PermissionsMixin):
     email = models.EmailField(unique=True, null=True, blank=True)
     phone_number = models.CharField(max_length=15, unique=True, null=True, blank=True)
     otp = models.CharField(max_length=128, null=True, blank=True)
-    otp_created_at = models.DateTimeField(null=True, blank=True)
-    reset_token = models.CharField(max_length=128, null=True, blank=True)
-    reset_token_expiration = models.DateTimeField(null=True, blank=True)
+    otp_created_at = models.DateTimeField(null=True, blank=True, db_index=True)
     last_login_ip = models.CharField(max_length=45, null=True, blank=True)
     last_login_user_agent = models.CharField(max_length=256, null=True, blank=True)
     failed_login_attempts = models.IntegerField(default=0)
@@ -65,14 +63,6 @@ class User(AbstractBaseUser, PermissionsMixin):
             return otp_hash == self.otp and timezone.now() <= expiration_time
         return False
 
-    def generate_reset_token(self):
-        self.reset_token = str(uuid.uuid4())
-        self.reset_token_expiration = timezone.now() + timedelta(hours=1)
-        self.save()
-
-    def is_reset_token_valid(self, token):
-        return self.reset_token == token and self.reset_token_expiration and timezone.now() <= self.reset_token_expiration
-
     def lock_account(self, minutes=10):
         self.locked_until = timezone.now() + timedelta(minutes=minutes)
         self.save()
@@ -83,7 +73,7 @@ class User(AbstractBaseUser, PermissionsMixin):
 
 class PasswordResetAttempt(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='reset_attempts')
-    requested_at = models.DateTimeField(auto_now_add=True)
+    requested_at = models.DateTimeField(auto_now_add=True, db_index=True)
     ip_address = models.CharField(max_length=45, null=True, blank=True)
     user_agent = models.CharField(max_length=256, null=True, blank=True)
 
@@ -91,6 +81,51 @@ class PasswordResetAttempt(models.Model):
         return f"Tentative de réinitialisation de {self.user.email if self.user.email else self.user.phone_number} à {self.requested_at}"
 
 
+class PasswordResetToken(models.Model):
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='reset_tokens')
+    token_hash = models.CharField(max_length=64, unique=True)  # Empreinte SHA-256, le jeton brut n'est jamais stocké
+    expires_at = models.DateTimeField(db_index=True)
+    used_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Jeton de réinitialisation de {self.user} (expire le {self.expires_at})"
+
+    @staticmethod
+    def hash_token(token):
+        return hashlib.sha256(token.encode('utf-8')).hexdigest()
+
+    @classmethod
+    def issue(cls, user, lifetime=timedelta(hours=1)):
+        """Crée un nouveau jeton pour l'utilisateur, invalide les précédents et retourne le jeton brut."""
+        now = timezone.now()
+        token = secrets.token_urlsafe(32)
+        cls.objects.filter(user=user, used_at__isnull=True).update(used_at=now)
+        cls.objects.create(user=user, token_hash=cls.hash_token(token), expires_at=now + lifetime)
+        return token
+
+    @classmethod
+    def consume(cls, token):
+        """
+        Consomme le jeton en une seule requête (UPDATE ... RETURNING) via l'index unique sur l'empreinte.
+        Deux consommations concurrentes ne peuvent pas réussir toutes les deux.
+
+        Returns:
+            int | None: L'ID de l'utilisateur, ou None si le jeton est inconnu, expiré ou déjà utilisé.
+        """
+        now = connection.ops.adapt_datetimefield_value(timezone.now())
+        quote = connection.ops.quote_name
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"UPDATE {quote(cls._meta.db_table)} SET {quote('used_at')} = %s "
+                f"WHERE {quote('token_hash')} = %s AND {quote('used_at')} IS NULL AND {quote('expires_at')} >= %s "
+                f"RETURNING {quote('user_id')}",
+                [now, cls.hash_token(token), now],
+            )
+            row = cursor.fetchone()
+        return row[0] if row else None
+
+
 class Interest(models.Model):
     name = models.CharField(max_length=500, unique=True)
 
@@ -1,5 +1,7 @@
 from rest_framework import serializers
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
 from .models import User, Profile, Interest
+from .tokens import PlanrRefreshToken
 from planr_backend.utils import process_image
 
 
@@ -12,6 +14,14 @@ class InterestSerializer(serializers.ModelSerializer):
         fields = ['id', 'name']
 
 
+class InterestSearchSerializer(serializers.Serializer):
+    """
+    Sérialiseur pour les paramètres de la liste des centres d'intérêt (autocomplétion par préfixe).
+    """
+    q = serializers.CharField(required=False, allow_blank=True, max_length=100)
+    limit = serializers.IntegerField(required=False, min_value=1, max_value=50, default=10)
+
+
 class PrivateUserSerializer(serializers.ModelSerializer):
     """
     Sérialiseur pour l'utilisateur avec des informations privées (email, téléphone, etc.).
@@ -87,3 +97,15 @@ class PublicProfileSerializer(serializers.ModelSerializer):
         fields = ['first_name', 'profile_picture']
 
 
+class PlanrTokenObtainPairSerializer(TokenObtainPairSerializer):
+    """
+    Sérialiseur d'obtention de tokens (token/) émettant les claims de l'utilisateur.
+    """
+    token_class = PlanrRefreshToken
+
+
+class PlanrTokenRefreshSerializer(TokenRefreshSerializer):
+    """
+    Sérialiseur de rafraîchissement (token/refresh/) : les claims sont relus si le profil a changé.
+    """
+    token_class = PlanrRefreshToken
@@ -1,9 +1,41 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save
+from django.db import transaction
 from django.dispatch import receiver
-from .models import User, Profile
+from .models import Interest, User, Profile
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+from .blacklist import bump_generation
+from .catalog import invalidate_catalog
+from .tokens import USER_CLAIM_FIELDS, mark_claims_stale
 
 
 @receiver(post_save, sender=User)
 def create_profile(sender, instance, created, **kwargs):
     if created:
         Profile.objects.create(user=instance)
+
+
+@receiver([post_save, post_delete], sender=Interest)
+def refresh_interest_catalog(sender, **kwargs):
+    transaction.on_commit(invalidate_catalog)
+
+
+@receiver(post_save, sender=Profile)
+def refresh_token_claims(sender, instance, **kwargs):
+    # Les tokens émis avant la modification ne sont plus crus sur parole et seront mis à jour au rafraîchissement
+    transaction.on_commit(lambda: mark_claims_stale(instance.user_id))
+
+
+@receiver(post_save, sender=User)
+def refresh_user_token_claims(sender, instance, created, update_fields=None, **kwargs):
+    # Compte désactivé ou rôle modifié : mêmes conséquences que pour le profil. Les sauvegardes partielles
+    # qui ne touchent aucun champ recopié dans les claims (last_login à la connexion...) sont ignorées
+    if created or (update_fields is not None and not USER_CLAIM_FIELDS & set(update_fields)):
+        return
+    transaction.on_commit(lambda: mark_claims_stale(instance.pk))
+
+
+@receiver(post_save, sender=BlacklistedToken)
+def sync_blacklist_filters(sender, created, **kwargs):
+    # Les filtres de Bloom des autres workers relisent les derniers jti dès que la génération change
+    if created:
+        transaction.on_commit(bump_generation)
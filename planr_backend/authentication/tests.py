@@ -1,3 +1,275 @@
-from django.test import TestCase
+import hashlib
+import threading
+import time
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.hashers import make_password
+from django.core import mail
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, TokenError
+
+from . import catalog, utils
+from .blacklist import BlacklistFilter, BloomFilter, blacklist_filter
+from .messages import ErrorMessages
+from .models import Interest, PasswordResetToken, User
+from .tokens import ClaimsJWTAuthentication, ClaimsUser, PlanrRefreshToken, ROLE_STAFF, claims_are_stale, guest_token_for
+
+
+@override_settings(TOKEN_CLAIMS_TRUSTED=True)
+class TokenClaimsTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(email='user@planr.dev')
+        self.authentication = ClaimsJWTAuthentication()
+
+    def authenticate(self, token):
+        return self.authentication.get_user(self.authentication.get_validated_token(str(token)))
+
+    def save(self, **changes):
+        for field, value in changes.items():
+            setattr(self.user, field, value)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.save()
+
+    def test_fresh_claims_are_trusted(self):
+        self.assertIsInstance(self.authenticate(PlanrRefreshToken.for_user(self.user).access_token), ClaimsUser)
+
+    def test_deactivated_user_is_rejected(self):
+        access = PlanrRefreshToken.for_user(self.user).access_token
+        self.save(is_active=False)
+
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate(access)
+
+    def test_refresh_rereads_role(self):
+        refresh = PlanrRefreshToken.for_user(self.user)
+        self.save(is_staff=True)
+
+        self.assertTrue(claims_are_stale(refresh))
+        self.assertEqual(refresh.access_token['role'], ROLE_STAFF)
+
+    def test_last_login_does_not_mark_claims_stale(self):
+        refresh = PlanrRefreshToken.for_user(self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.save(update_fields=['last_login'])
+
+        self.assertFalse(claims_are_stale(refresh))
+
+    @override_settings(TOKEN_CLAIMS_TRUSTED=False)
+    def test_claims_are_read_from_database_without_shared_cache(self):
+        user = self.authenticate(PlanrRefreshToken.for_user(self.user).access_token)
+        self.assertIsInstance(user, User)
+
+
+class InterestCatalogTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        catalog._catalog = None
+        Interest.objects.bulk_create([Interest(name=name) for name in ['Écologie', 'Jazz', 'Musique électronique']])
+
+    def test_prefix_search_ignores_case_and_accents(self):
+        names = [interest.name for interest in catalog.get_catalog().search('ECO', 10)]
+        self.assertEqual(names, ['Écologie'])
+        self.assertEqual([interest.name for interest in catalog.get_catalog().search('elec', 10)], ['Musique électronique'])
+
+    @override_settings(INTEREST_CATALOG_MAX_AGE=60)
+    def test_reloaded_after_max_age_without_invalidation(self):
+        # Modification faite par un autre worker : sans cache partagé, la version locale ne change pas
+        loaded = catalog.get_catalog()
+        Interest.objects.filter(name='Jazz').update(name='Jazz manouche')
+        self.assertIs(catalog.get_catalog(), loaded)
+
+        loaded.loaded_at -= 61
+        reloaded = catalog.get_catalog()
+        self.assertIn('Jazz manouche', [interest.name for interest in reloaded.interests])
+        self.assertNotEqual(reloaded.etag, loaded.etag)
+
+    def test_etag_returns_not_modified(self):
+        response = self.client.get('/interests/')
+        self.assertEqual(response.status_code, 200)
+        response = self.client.get('/interests/', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+
+class CleanupAuthStateTests(TestCase):
+
+    def create_user(self, email, days=10, **fields):
+        return User.objects.create_user(email=email, is_active=False, otp_created_at=timezone.now() - timedelta(days=days), **fields)
+
+    def setUp(self):
+        self.unverified = self.create_user('unverified@planr.dev')
+        self.recent = self.create_user('recent@planr.dev', days=1)
+        # Désactivé par un administrateur après s'être connecté : jamais purgé
+        self.deactivated = self.create_user('deactivated@planr.dev', last_login=timezone.now() - timedelta(days=30))
+
+    def cleanup(self, *args):
+        out = StringIO()
+        call_command('cleanup_auth_state', *args, stdout=out)
+        return out.getvalue()
+
+    def test_only_never_verified_accounts_are_deleted(self):
+        output = self.cleanup()
+
+        self.assertIn('Comptes non vérifiés supprimés : 1 ', output)
+        self.assertEqual(
+            set(User.objects.values_list('email', flat=True)),
+            {'recent@planr.dev', 'deactivated@planr.dev'},
+        )
+
+    def test_dry_run_deletes_nothing(self):
+        output = self.cleanup('--dry-run')
+
+        self.assertIn('[dry-run] Comptes non vérifiés supprimés : 1 ', output)
+        self.assertEqual(User.objects.count(), 3)
+
+    def test_otp_verification_marks_account_as_verified(self):
+        otp = '123456'
+        User.objects.filter(pk=self.unverified.pk).update(
+            otp=hashlib.sha256(otp.encode('utf-8')).hexdigest(), otp_created_at=timezone.now(),
+        )
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {guest_token_for(self.unverified)}')
+
+        response = client.post('/users/verify-otp/', {'otp': otp}, format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+        self.unverified.refresh_from_db()
+        self.assertTrue(self.unverified.is_active)
+        self.assertIsNotNone(self.unverified.last_login)
+
+
+class PasswordResetTokenTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(email='user@planr.dev', password='old-password')
+
+    def test_token_is_single_use(self):
+        token = PasswordResetToken.issue(self.user)
+
+        self.assertEqual(PasswordResetToken.consume(token), self.user.pk)
+        self.assertIsNone(PasswordResetToken.consume(token))
+
+    def test_expired_token_is_refused(self):
+        token = PasswordResetToken.issue(self.user)
+        PasswordResetToken.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+
+        self.assertIsNone(PasswordResetToken.consume(token))
+
+    def test_issue_invalidates_previous_tokens(self):
+        first = PasswordResetToken.issue(self.user)
+        second = PasswordResetToken.issue(self.user)
+
+        self.assertIsNone(PasswordResetToken.consume(first))
+        self.assertEqual(PasswordResetToken.consume(second), self.user.pk)
+
+    def test_raw_token_is_not_stored(self):
+        token = PasswordResetToken.issue(self.user)
+
+        self.assertFalse(PasswordResetToken.objects.filter(token_hash=token).exists())
+        self.assertIsNone(PasswordResetToken.consume('inconnu'))
+
+    def test_reset_password_flow(self):
+        client = APIClient()
+        response = client.post('/users/request-password-reset/', {'email': self.user.email}, format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+        token = mail.outbox[0].body.rstrip('/').rsplit('/', 1)[-1]
+
+        response = client.post(f'/users/reset-password/{token}/', {'newPassword': 'new-password'}, format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.check_password('new-password'))
+
+        response = client.post(f'/users/reset-password/{token}/', {'newPassword': 'other-password'}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['error'], ErrorMessages.RESET_TOKEN_INVALID)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.check_password('new-password'))
+
+
+class VerifyPasswordTests(TestCase):
+
+    def test_outdated_hash_is_upgraded(self):
+        user = User(password=make_password('secret-password', hasher='bcrypt_sha256'))
+        self.assertTrue(utils.verify_password(user, 'secret-password'))
+        self.assertTrue(user.password.startswith('pbkdf2_sha256$'))
+
+    def test_busy_when_no_slot_frees_up(self):
+        user = User(password=make_password('secret-password'))
+        with mock.patch.object(utils._password_slots, 'acquire', return_value=False):
+            with self.assertRaises(utils.PasswordCheckBusy):
+                utils.verify_password(user, 'secret-password')
+
+    @override_settings(PASSWORD_CHECK_TIMEOUT=0.05)
+    def test_busy_wait_is_bounded_by_timeout(self):
+        user = User(password=make_password('secret-password'))
+        held = 0
+        while utils._password_slots.acquire(blocking=False):  # Toutes les places sont occupées
+            held += 1
+        try:
+            started = time.monotonic()
+            with self.assertRaises(utils.PasswordCheckBusy):
+                utils.verify_password(user, 'secret-password')
+            self.assertLess(time.monotonic() - started, 1)
+        finally:
+            for _ in range(held):
+                utils._password_slots.release()
+
+
+class BloomFilterTests(TestCase):
+
+    def test_false_positive_rate_within_target(self):
+        capacity, error_rate = 50000, 0.001
+        bloom = BloomFilter(capacity, error_rate)
+        for index in range(capacity):
+            bloom.add(f'blacklisted-{index}')
+
+        self.assertTrue(all(f'blacklisted-{index}' in bloom for index in range(capacity)))  # Aucun faux négatif
+        probes = 50000
+        hits = sum(f'probe-{index}' in bloom for index in range(probes))
+        # Filtre rempli à sa capacité : le taux mesuré reste proche de la cible (marge pour l'aléa du hachage)
+        self.assertLessEqual(hits / probes, 2 * error_rate)
+
+
+@override_settings(TOKEN_BLACKLIST_BLOOM=True)
+class BlacklistFilterTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(email='user@planr.dev')
+
+    def test_blacklisted_token_is_rejected(self):
+        token = PlanrRefreshToken.for_user(self.user)
+        blacklist_filter.rebuild()
+        token.check_blacklist()  # Absent du filtre : aucune erreur
+
+        with self.captureOnCommitCallbacks(execute=True):
+            token.blacklist()
+        with self.assertRaises(TokenError):
+            PlanrRefreshToken(str(token))
+
+    def test_single_rebuild_at_a_time(self):
+        checker, started, release = BlacklistFilter(), threading.Event(), threading.Event()
+
+        def rebuild():
+            started.set()
+            release.wait(timeout=10)
+
+        with mock.patch.object(checker, 'rebuild', side_effect=rebuild) as rebuilt, \
+                mock.patch('authentication.blacklist.connections'):
+            checker.schedule_rebuild()
+            started.wait(timeout=10)
+            checker.schedule_rebuild()  # Reconstruction en cours : aucun second thread
+            release.set()
+            for thread in threading.enumerate():
+                if thread.name == 'token-blacklist-bloom':
+                    thread.join(timeout=10)
+
+        self.assertEqual(rebuilt.call_count, 1)
+        self.assertFalse(checker.building)
@@ -0,0 +1,138 @@
+import time
+from datetime import timedelta
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.functional import cached_property
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+from planr_backend.db_routers import route_user
+from .blacklist import blacklist_filter
+from .models import User
+
+
+# Rôles portés par les tokens : invité (vérification OTP en attente), membre, équipe
+ROLE_GUEST, ROLE_MEMBER, ROLE_STAFF = 'guest', 'member', 'staff'
+# Champs de User recopiés dans les claims : les modifier rend les tokens déjà émis obsolètes
+USER_CLAIM_FIELDS = {'is_active', 'is_staff'}
+
+
+def user_claims(user):
+    """ Claims ajoutés aux tokens : les lectures courantes n'ont plus à charger l'utilisateur ni son profil. """
+    profile = getattr(user, 'profile', None)
+    return {
+        'profile_complete': bool(profile and profile.is_profile_complete),
+        'is_active': user.is_active,
+        'role': ROLE_STAFF if user.is_staff else ROLE_MEMBER,
+    }
+
+
+def set_user_claims(token, user):
+    """ Écrit les claims de l'utilisateur et l'instant de leur lecture (plus précis que « iat », à la seconde). """
+    for claim, value in user_claims(user).items():
+        token[claim] = value
+    token['claims_at'] = time.time()
+
+
+def claims_cache_key(user_id):
+    return f'jwt-claims:{user_id}'
+
+
+def mark_claims_stale(user_id):
+    """ Horodate la dernière modification des claims : les tokens émis avant ne sont plus crus sur parole. """
+    cache.set(claims_cache_key(user_id), time.time(), timeout=api_settings.REFRESH_TOKEN_LIFETIME.total_seconds())
+
+
+def claims_are_stale(token):
+    """
+    Vrai si le token est antérieur à la dernière modification de l'utilisateur, ou n'a pas de claims.
+    Sans cache partagé (TOKEN_CLAIMS_TRUSTED), un marqueur posé par un autre worker serait invisible :
+    les claims ne sont jamais crus sur parole et l'utilisateur est relu en base.
+    """
+    if not settings.TOKEN_CLAIMS_TRUSTED or 'claims_at' not in token:
+        return True  # Token invité, ou émis avant l'ajout des claims
+    changed_at = cache.get(claims_cache_key(token[api_settings.USER_ID_CLAIM]))
+    return changed_at is not None and token['claims_at'] < changed_at
+
+
+class PlanrRefreshToken(RefreshToken):
+    """ Refresh token portant les claims de l'utilisateur, relus au rafraîchissement s'ils ont changé. """
+
+    @classmethod
+    def for_user(cls, user):
+        token = super().for_user(user)
+        set_user_claims(token, user)
+        return token
+
+    @property
+    def access_token(self):
+        if claims_are_stale(self):
+            user = User.objects.select_related('profile').filter(**{
+                api_settings.USER_ID_FIELD: self[api_settings.USER_ID_CLAIM]
+            }).first()
+            if user is not None:
+                set_user_claims(self, user)
+        return super().access_token
+
+    def check_blacklist(self):
+        """ La table n'est interrogée que si le filtre de Bloom ne peut exclure le jti. """
+        if not settings.TOKEN_BLACKLIST_BLOOM or blacklist_filter.might_contain(self[api_settings.JTI_CLAIM]):
+            super().check_blacklist()
+
+    def blacklist(self):
+        blacklisted = super().blacklist()
+        blacklist_filter.add(self[api_settings.JTI_CLAIM])
+        return blacklisted
+
+
+def guest_token_for(user):
+    """ Token court réservé à la vérification ou au renvoi de l'OTP. """
+    token = AccessToken.for_user(user)
+    token['role'] = ROLE_GUEST
+    token['is_active'] = user.is_active
+    token['can_verify_otp'] = True
+    token.set_exp(lifetime=timedelta(minutes=15))
+    return token
+
+
+class ClaimsUser(TokenUser):
+    """ Utilisateur reconstruit à partir des claims du token, sans requête SQL. """
+
+    @cached_property
+    def is_active(self):
+        return self.token.get('is_active', True)
+
+    @cached_property
+    def is_staff(self):
+        return self.token.get('role') == ROLE_STAFF
+
+    @cached_property
+    def role(self):
+        return self.token.get('role')
+
+    @cached_property
+    def is_profile_complete(self):
+        return self.token.get('profile_complete', False)
+
+
+class PlanrJWTAuthentication(JWTAuthentication):
+    """ JWTAuthentication qui signale l'utilisateur au routage primaire/réplica dès la validation du token. """
+
+    def get_validated_token(self, raw_token):
+        validated_token = super().get_validated_token(raw_token)
+        route_user(validated_token.get(api_settings.USER_ID_CLAIM))
+        return validated_token
+
+
+class ClaimsJWTAuthentication(PlanrJWTAuthentication):
+    """
+    Authentification sans état pour les endpoints en lecture seule : l'utilisateur est reconstruit depuis
+    les claims du token. Si le token est antérieur à une modification du profil (ou n'a pas de claims),
+    l'utilisateur est chargé en base comme avec JWTAuthentication.
+    """
+
+    def get_user(self, validated_token):
+        if claims_are_stale(validated_token):
+            return super().get_user(validated_token)
+        return ClaimsUser(validated_token)
@@ -2,7 +2,7 @@
 
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import UserViewSet, ProfileViewSet, CheckProfileCompletionViewSet
+from .views import UserViewSet, ProfileViewSet, CheckProfileCompletionViewSet, InterestCatalogView
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 
 
@@ -15,5 +15,6 @@ urlpatterns = [
     path('token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
     path('users/profile/', ProfileViewSet.as_view({'get': 'retrieve', 'put': 'update'}), name='user-profile'),
     path('users/profile/completion/', CheckProfileCompletionViewSet.as_view(), name='check_profile_completion'),
+    path('interests/', InterestCatalogView.as_view(), name='interests'),
     path('', include(router.urls)),
 ]
@@ -1,5 +1,7 @@
 import random
 import hashlib
+import threading
+from django.contrib.auth.hashers import check_password, make_password
 from django.core.mail import send_mail
 import logging
 from django.conf import settings
@@ -7,6 +9,15 @@ from django.conf import settings
 
 logger = logging.getLogger(__name__)
 
+# Au plus PASSWORD_CHECK_WORKERS hachages en parallèle par processus ; au-delà, les connexions attendent
+# une place au plus PASSWORD_CHECK_TIMEOUT secondes puis sont refusées plutôt que de saturer le CPU.
+# L'attente est bloquante : un appelant asynchrone doit passer par sync_to_async
+_password_slots = threading.BoundedSemaphore(settings.PASSWORD_CHECK_WORKERS)
+
+
+class PasswordCheckBusy(Exception):
+    """ Trop de vérifications de mot de passe en attente. """
+
 
 def generate_and_hash_otp():
     """
@@ -20,6 +31,35 @@ def generate_and_hash_otp():
     return otp, hashed_otp
 
 
+def verify_password(user, raw_password):
+    """
+    Vérifie le mot de passe de l'utilisateur dans le thread de la requête, dans la limite des hachages simultanés.
+    Si le hachage stocké n'utilise pas le hasheur préféré (ou ses paramètres actuels), le nouveau
+    hachage est calculé dans le même appel et assigné à `user.password` : il reste à sauvegarder l'utilisateur.
+
+    Args:
+        user (User): L'utilisateur qui se connecte.
+        raw_password (str): Le mot de passe saisi.
+
+    Returns:
+        bool: True si le mot de passe est correct.
+
+    Raises:
+        PasswordCheckBusy: Si aucune place ne se libère dans la file avant PASSWORD_CHECK_TIMEOUT.
+    """
+    upgraded = []
+    if not _password_slots.acquire(timeout=settings.PASSWORD_CHECK_TIMEOUT):
+        raise PasswordCheckBusy
+    try:
+        valid = check_password(raw_password, user.password, setter=lambda raw: upgraded.append(make_password(raw)))
+    finally:
+        _password_slots.release()
+
+    if upgraded:
+        user.password = upgraded[0]
+    return valid
+
+
 def send_email(subject, message, recipient_list):
     """
     Envoie un e-mail à l'utilisateur.
@@ -37,9 +77,9 @@ def send_email(subject, message, recipient_list):
             recipient_list,
             fail_silently=False,
         )
-        logger.info(f"E-mail envoyé à {', '.join(recipient_list)}")
+        logger.info("E-mail envoyé à %s", ', '.join(recipient_list))
     except Exception as e:
-        logger.error(f"Erreur lors de l'envoi de l'e-mail à {', '.join(recipient_list)}: {e}")
+        logger.error("Erreur lors de l'envoi de l'e-mail à %s: %s", ', '.join(recipient_list), e)
 
 
 def send_email_otp(email, otp):
@@ -62,7 +102,7 @@ def send_sms_otp(phone_number, otp):
         otp (str): Le code OTP à envoyer.
     """
     # Simuler l'envoi d'un SMS. En production, intégrer un service comme Twilio ou Nexmo
-    logger.info(f"Code OTP envoyé au numéro {phone_number}: {otp}")
+    logger.info("Code OTP envoyé au numéro %s: %s", phone_number, otp)
 
 
 def send_login_alert(email, ip_address, user_agent):
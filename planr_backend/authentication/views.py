@@ -2,28 +2,30 @@ from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import AllowAny, IsAuthenticated
-from rest_framework_simplejwt.tokens import RefreshToken, AccessToken
-from rest_framework_simplejwt.authentication import JWTAuthentication
 from rest_framework_simplejwt.exceptions import InvalidToken, AuthenticationFailed
 from rest_framework_simplejwt.settings import api_settings
 from rest_framework.exceptions import PermissionDenied
 from rest_framework.views import APIView
 from django.shortcuts import get_object_or_404
+from django.db import transaction
 from django.utils import timezone
+from django.utils.http import parse_etags
 from django.conf import settings
 from datetime import timedelta
-from django.http import Http404
-from .models import User, PasswordResetAttempt, Profile
-from .serializers import PrivateUserSerializer, PublicUserSerializer, PrivateProfileSerializer
-from .utils import generate_and_hash_otp, send_email_otp, send_sms_otp, send_email
+from .models import User, PasswordResetAttempt, PasswordResetToken, Profile
+from .serializers import PrivateUserSerializer, PublicUserSerializer, PrivateProfileSerializer, InterestSerializer, InterestSearchSerializer
+from .catalog import get_catalog
+from .tokens import ROLE_GUEST, ClaimsJWTAuthentication, ClaimsUser, PlanrJWTAuthentication, PlanrRefreshToken, guest_token_for
+from .utils import generate_and_hash_otp, send_email_otp, send_sms_otp, send_email, verify_password, PasswordCheckBusy
 from .messages import ErrorMessages, SuccessMessages  # Centralisation des messages
+from planr_backend.metrics import ACCOUNT_LOCKOUTS, LOGINS, OTP_SENT, OTP_VERIFICATIONS, timed
 import logging
 
 
 logger = logging.getLogger(__name__)
 
 
-class InactiveUserJWTAuthentication(JWTAuthentication):
+class InactiveUserJWTAuthentication(PlanrJWTAuthentication):
     def get_user(self, validated_token):
         try:
             user_id = validated_token[api_settings.USER_ID_CLAIM]
@@ -43,6 +45,7 @@ class UserViewSet(viewsets.ModelViewSet):
     serializer_class = PrivateUserSerializer
 
     @action(detail=False, methods=['post'], permission_classes=[AllowAny])
+    @timed('register')
     def register(self, request):
         data = request.data
         email = data.get('email')
@@ -66,10 +69,7 @@ class UserViewSet(viewsets.ModelViewSet):
                 return Response({'error': ErrorMessages.LOGIN_REQUIRED}, status=status.HTTP_400_BAD_REQUEST)
 
             user = User.objects.get(email=email) if email else User.objects.get(phone_number=phone_number)
-            guest_token = AccessToken.for_user(user)
-            guest_token['role'] = 'guest'
-            guest_token['can_verify_otp'] = True
-            guest_token.set_exp(lifetime=timedelta(minutes=15))
+            guest_token = guest_token_for(user)
 
             return Response({
                 'message': SuccessMessages.REGISTRATION_SUCCESS,
@@ -77,10 +77,10 @@ class UserViewSet(viewsets.ModelViewSet):
             }, status=status.HTTP_201_CREATED)
 
         except PermissionDenied as e:
-            logger.error(f"Erreur lors de l'enregistrement : {e}")
+            logger.error("Erreur lors de l'enregistrement : %s", e)
             return Response({'error': str(e)}, status=status.HTTP_403_FORBIDDEN)
         except Exception as e:
-            logger.error(f"Erreur lors de l'enregistrement : {e}")
+            logger.error("Erreur lors de l'enregistrement : %s", e)
             return Response({'error': ErrorMessages.UNAUTHORIZED_ACCESS}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
     def process_registration(self, identifier, identifier_type, password=None):
@@ -94,6 +94,7 @@ class UserViewSet(viewsets.ModelViewSet):
             send_email_otp(identifier, otp)
         else:
             send_sms_otp(identifier, otp)
+        OTP_SENT.inc(channel=identifier_type, reason='registration')
 
         if not user:
             user = User(
@@ -125,10 +126,7 @@ class UserViewSet(viewsets.ModelViewSet):
             user = User.objects.filter(phone_number=phone_number).first()
 
         if user and user.otp_created_at and timezone.now() < user.otp_created_at + timedelta(minutes=15):
-            guest_token = AccessToken.for_user(user)
-            guest_token['role'] = 'guest'
-            guest_token['can_verify_otp'] = True
-            guest_token.set_exp(lifetime=timedelta(minutes=15))
+            guest_token = guest_token_for(user)
 
             return Response({
                 'message': SuccessMessages.OTP_RESEND_SUCCESS,
@@ -138,6 +136,7 @@ class UserViewSet(viewsets.ModelViewSet):
         return Response({'error': ErrorMessages.USER_NOT_FOUND}, status=status.HTTP_404_NOT_FOUND)
 
     @action(detail=False, methods=['post'], url_path='verify-otp', permission_classes=[AllowAny], authentication_classes=[InactiveUserJWTAuthentication])
+    @timed('verify_otp')
     def verify_otp(self, request):
         otp = request.data.get('otp')
         auth_header = request.headers.get('Authorization')
@@ -155,22 +154,27 @@ class UserViewSet(viewsets.ModelViewSet):
             user = auth.get_user(validated_token)
 
             if user.is_account_locked():
+                OTP_VERIFICATIONS.inc(outcome='locked')
                 return Response({'error': ErrorMessages.ACCOUNT_LOCKED}, status=status.HTTP_403_FORBIDDEN)
 
             if user.is_otp_valid(otp):
+                OTP_VERIFICATIONS.inc(outcome='success')
                 user.is_active = True
                 user.failed_otp_attempts = 0
+                user.last_login = timezone.now()  # Marque le compte comme vérifié (cf. cleanup_auth_state)
                 user.save()
-                refresh = RefreshToken.for_user(user)
+                refresh = PlanrRefreshToken.for_user(user)
                 return Response({
                     'message': SuccessMessages.OTP_VERIFICATION_SUCCESS,
                     'refresh': str(refresh),
                     'access': str(refresh.access_token),
                 })
 
+            OTP_VERIFICATIONS.inc(outcome='invalid')
             user.failed_otp_attempts += 1
             if user.failed_otp_attempts >= 3:
                 user.lock_account(minutes=10)
+                ACCOUNT_LOCKOUTS.inc(reason='otp')
                 return Response({'error': ErrorMessages.OTP_MAX_ATTEMPTS}, status=status.HTTP_403_FORBIDDEN)
 
             user.save()
@@ -179,10 +183,11 @@ class UserViewSet(viewsets.ModelViewSet):
         except (AuthenticationFailed, PermissionDenied) as e:
             return Response({'error': str(e)}, status=status.HTTP_403_FORBIDDEN)
         except Exception as e:
-            logger.error(f"Erreur lors de la vérification de l'OTP : {e}")
+            logger.error("Erreur lors de la vérification de l'OTP : %s", e)
             return Response({'error': ErrorMessages.UNAUTHORIZED_ACCESS}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
     @action(detail=False, methods=['post'], url_path='resend-otp', permission_classes=[AllowAny], authentication_classes=[InactiveUserJWTAuthentication])
+    @timed('resend_otp')
     def resend_otp(self, request):
         auth_header = request.headers.get('Authorization')
 
@@ -193,7 +198,7 @@ class UserViewSet(viewsets.ModelViewSet):
             auth = InactiveUserJWTAuthentication()
             validated_token = auth.get_validated_token(auth_header.split(' ')[1])
 
-            if validated_token.get('role') != 'guest':
+            if validated_token.get('role') != ROLE_GUEST:
                 return Response({'error': ErrorMessages.INVALID_CREDENTIALS}, status=status.HTTP_403_FORBIDDEN)
 
             user = auth.get_user(validated_token)
@@ -208,18 +213,21 @@ class UserViewSet(viewsets.ModelViewSet):
 
             if user.email:
                 send_email_otp(user.email, otp)
+                OTP_SENT.inc(channel='email', reason='resend')
             elif user.phone_number:
                 send_sms_otp(user.phone_number, otp)
+                OTP_SENT.inc(channel='phone_number', reason='resend')
 
             return Response({'message': SuccessMessages.OTP_RESEND_SUCCESS})
 
         except (AuthenticationFailed, PermissionDenied) as e:
             return Response({'error': str(e)}, status=status.HTTP_403_FORBIDDEN)
         except Exception as e:
-            logger.error(f"Erreur lors du renvoi de l'OTP : {e}")
+            logger.error("Erreur lors du renvoi de l'OTP : %s", e)
             return Response({'error': ErrorMessages.UNAUTHORIZED_ACCESS}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
     @action(detail=False, methods=['post'], permission_classes=[AllowAny])
+    @timed('login')
     def login(self, request):
         email = request.data.get('email')
         phone_number = request.data.get('phone_number')
@@ -229,37 +237,52 @@ class UserViewSet(viewsets.ModelViewSet):
             if not email and not phone_number:
                 return Response({'error': ErrorMessages.LOGIN_REQUIRED}, status=status.HTTP_400_BAD_REQUEST)
 
+            method = 'password' if password else 'otp'
             user = None
             if email:
                 user = User.objects.filter(email=email).first()
                 if not user:
+                    LOGINS.inc(method=method, outcome='not_found')
                     return Response({'error': ErrorMessages.USER_NOT_FOUND}, status=status.HTTP_404_NOT_FOUND)
             elif phone_number:
                 user = User.objects.filter(phone_number=phone_number).first()
                 if not user:
+                    LOGINS.inc(method=method, outcome='not_found')
                     return Response({'error': ErrorMessages.USER_NOT_FOUND}, status=status.HTTP_404_NOT_FOUND)
 
             if password:
                 if user.is_account_locked():
+                    LOGINS.inc(method=method, outcome='locked')
                     return Response({'error': ErrorMessages.ACCOUNT_LOCKED}, status=status.HTTP_403_FORBIDDEN)
 
                 if not user.is_active:
+                    LOGINS.inc(method=method, outcome='inactive')
                     return Response({'error': ErrorMessages.USER_INACTIVE}, status=status.HTTP_403_FORBIDDEN)
 
-                if user.check_password(password):
+                try:
+                    password_valid = verify_password(user, password)
+                except PasswordCheckBusy:
+                    LOGINS.inc(method=method, outcome='busy')
+                    return Response({'error': ErrorMessages.SERVICE_BUSY}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+
+                if password_valid:
+                    LOGINS.inc(method=method, outcome='success')
                     user.failed_login_attempts = 0
-                    user.save()
+                    user.last_login = timezone.now()
+                    user.save()  # Enregistre aussi le hachage migré vers le hasheur préféré
 
-                    refresh = RefreshToken.for_user(user)
+                    refresh = PlanrRefreshToken.for_user(user)
                     return Response({
                         'message': SuccessMessages.LOGIN_SUCCESS,
                         'refresh': str(refresh),
                         'access': str(refresh.access_token),
                     }, status=status.HTTP_200_OK)
 
+                LOGINS.inc(method=method, outcome='password_mismatch')
                 user.failed_login_attempts += 1
                 if user.failed_login_attempts >= 5:
                     user.lock_account(minutes=10)
+                    ACCOUNT_LOCKOUTS.inc(reason='login')
                     return Response({'error': ErrorMessages.ACCOUNT_LOCKED}, status=status.HTTP_403_FORBIDDEN)
 
                 user.save()
@@ -268,17 +291,17 @@ class UserViewSet(viewsets.ModelViewSet):
             otp, hashed_otp = generate_and_hash_otp()
             if user.email:
                 send_email_otp(user.email, otp)
+                OTP_SENT.inc(channel='email', reason='login')
             elif user.phone_number:
                 send_sms_otp(user.phone_number, otp)
+                OTP_SENT.inc(channel='phone_number', reason='login')
+            LOGINS.inc(method=method, outcome='otp_sent')
 
             user.otp = hashed_otp
             user.otp_created_at = timezone.now()
             user.save()
 
-            guest_token = AccessToken.for_user(user)
-            guest_token['role'] = 'guest'
-            guest_token['can_verify_otp'] = True
-            guest_token.set_exp(lifetime=timedelta(minutes=15))
+            guest_token = guest_token_for(user)
 
             return Response({
                 'message': SuccessMessages.OTP_SENT,
@@ -290,7 +313,7 @@ class UserViewSet(viewsets.ModelViewSet):
         except ValueError as e:
             return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
         except Exception as e:
-            logger.error(f"Erreur lors de la connexion : {e}")
+            logger.error("Erreur lors de la connexion : %s", e)
             return Response({'error': ErrorMessages.UNAUTHORIZED_ACCESS}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
     @action(detail=False, methods=['post'], permission_classes=[IsAuthenticated])
@@ -301,11 +324,11 @@ class UserViewSet(viewsets.ModelViewSet):
             return Response({'error': ErrorMessages.JWT_REQUIRED}, status=status.HTTP_400_BAD_REQUEST)
 
         try:
-            token = RefreshToken(refresh_token)
+            token = PlanrRefreshToken(refresh_token)
             token.blacklist()
             return Response({'message': SuccessMessages.LOGOUT_SUCCESS})
         except Exception as e:
-            logger.error(f"Erreur lors de la déconnexion : {e}")
+            logger.error("Erreur lors de la déconnexion : %s", e)
             return Response({'error': ErrorMessages.UNAUTHORIZED_ACCESS}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
     @action(detail=False, methods=['post'], url_path='request-password-reset', permission_classes=[AllowAny])
@@ -328,14 +351,14 @@ class UserViewSet(viewsets.ModelViewSet):
                 user_agent=request.META.get('HTTP_USER_AGENT')
             )
 
-            user.generate_reset_token()
-            reset_link = f"{settings.FRONTEND_URL}/reset-password/{user.reset_token}/"
+            reset_token = PasswordResetToken.issue(user)
+            reset_link = f"{settings.FRONTEND_URL}/reset-password/{reset_token}/"
 
             send_email(user.email, f'Cliquez ici pour réinitialiser votre mot de passe : {reset_link}', [user.email])
             return Response({'message': SuccessMessages.PASSWORD_RESET_EMAIL_SENT})
 
         except Exception as e:
-            logger.error(f"Erreur lors de la demande de réinitialisation de mot de passe : {e}")
+            logger.error("Erreur lors de la demande de réinitialisation de mot de passe : %s", e)
             return Response({'error': ErrorMessages.UNAUTHORIZED_ACCESS}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
     @action(detail=False, methods=['post'], url_path='reset-password/(?P<token>[^/.]+)', permission_classes=[AllowAny])
@@ -346,22 +369,19 @@ class UserViewSet(viewsets.ModelViewSet):
             return Response({'error': ErrorMessages.PASSWORD_REQUIRED}, status=status.HTTP_400_BAD_REQUEST)
 
         try:
-            user = get_object_or_404(User, reset_token=token)
-
-            if user.reset_token_expiration < timezone.now():
-                return Response({'error': ErrorMessages.RESET_TOKEN_INVALID}, status=status.HTTP_400_BAD_REQUEST)
+            with transaction.atomic():
+                user_id = PasswordResetToken.consume(token)
+                if user_id is None:
+                    return Response({'error': ErrorMessages.RESET_TOKEN_INVALID}, status=status.HTTP_400_BAD_REQUEST)
 
-            user.set_password(new_password)
-            user.reset_token = None
-            user.reset_token_expiration = None
-            user.save()
+                user = User.objects.get(pk=user_id)
+                user.set_password(new_password)
+                user.save()
 
             return Response({'message': SuccessMessages.PASSWORD_RESET_SUCCESS}, status=status.HTTP_200_OK)
 
-        except Http404:
-            return Response({'error': ErrorMessages.RESET_TOKEN_INVALID}, status=status.HTTP_400_BAD_REQUEST)
         except Exception as e:
-            logger.error(f"Erreur lors de la réinitialisation du mot de passe : {e}")
+            logger.error("Erreur lors de la réinitialisation du mot de passe : %s", e)
             return Response({'error': ErrorMessages.UNAUTHORIZED_ACCESS}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
@@ -385,12 +405,40 @@ class ProfileViewSet(viewsets.ViewSet):
 
 
 class CheckProfileCompletionViewSet(APIView):
+    # Appelé à chaque lancement de l'application : la réponse vient du token tant que le profil n'a pas changé
+    authentication_classes = [ClaimsJWTAuthentication]
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
+        if isinstance(request.user, ClaimsUser):
+            return Response({'is_profile_complete': request.user.is_profile_complete})
+
         # Récupérer le profil de l'utilisateur connecté
         try:
             profile = request.user.profile
             return Response({'is_profile_complete': profile.is_profile_complete})
         except Profile.DoesNotExist:
             return Response({'is_profile_complete': False}, status=status.HTTP_200_OK)
+
+
+class InterestCatalogView(APIView):
+    """
+    Liste des centres d'intérêt servie depuis le catalogue en mémoire, sans requête SQL.
+    Avec ?q=, autocomplétion sur le début du nom ou de l'un de ses mots.
+    L'ETag est l'empreinte du catalogue : tant qu'aucun centre d'intérêt ne change, le client reçoit un 304.
+    """
+    authentication_classes = [ClaimsJWTAuthentication]
+    permission_classes = [AllowAny]
+
+    def get(self, request):
+        params = InterestSearchSerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        catalog = get_catalog()
+
+        etag = f'"{catalog.etag}"'
+        if etag in parse_etags(request.headers.get('If-None-Match', '')):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+
+        query = params.validated_data.get('q', '').strip()
+        interests = catalog.search(query, params.validated_data['limit']) if query else catalog.interests
+        return Response(InterestSerializer(interests, many=True).data, headers={'ETag': etag})
@@ -1,26 +1,58 @@
 from django.contrib import admin
-from .models import PrivateEvent, EventRegistration, Wishlist
+from .models import PrivateEvent, ArchivedPrivateEvent, EventDailyStats, EventOccurrenceOverride, EventRegistration, WaitlistEntry, Wishlist
 
 
 @admin.register(PrivateEvent)
 class PrivateEventAdmin(admin.ModelAdmin):
-    list_display = ('title', 'location', 'date', 'time', 'max_participants')
+    list_display = ('title', 'location', 'date', 'time', 'max_participants', 'recurrence_frequency')
     search_fields = ('title', 'location')
-    list_filter = ('date', 'location')
+    list_filter = ('date', 'location', 'recurrence_frequency')
     ordering = ('date', 'time')
 
 
+@admin.register(EventOccurrenceOverride)
+class EventOccurrenceOverrideAdmin(admin.ModelAdmin):
+    list_display = ('event', 'occurrence_date', 'date', 'time', 'is_cancelled')
+    search_fields = ('event__title',)
+    list_filter = ('is_cancelled',)
+    ordering = ('event', 'occurrence_date')
+
+
 @admin.register(EventRegistration)
 class EventRegistrationAdmin(admin.ModelAdmin):
-    list_display = ('user', 'event', 'registered_at')
+    list_display = ('user', 'event', 'occurrence_date', 'registered_at')
     search_fields = ('user__email', 'event__title')
     list_filter = ('registered_at',)
     ordering = ('registered_at',)
 
 
+@admin.register(WaitlistEntry)
+class WaitlistEntryAdmin(admin.ModelAdmin):
+    list_display = ('user', 'event', 'position', 'joined_at')
+    search_fields = ('user__email', 'event__title')
+    ordering = ('event', 'position')
+
+
 @admin.register(Wishlist)
 class WishlistAdmin(admin.ModelAdmin):
     list_display = ('user', 'event')
     search_fields = ('user__email', 'event__title')
     ordering = ('user',)
 
+
+@admin.register(EventDailyStats)
+class EventDailyStatsAdmin(admin.ModelAdmin):
+    list_display = (
+        'event', 'archived_event', 'day', 'registrations', 'cancellations', 'wishlist_adds', 'wishlist_removals', 'conversions'
+    )
+    search_fields = ('event__title', 'archived_event__title')
+    list_filter = ('day',)
+    ordering = ('-day',)
+
+
+@admin.register(ArchivedPrivateEvent)
+class ArchivedPrivateEventAdmin(admin.ModelAdmin):
+    list_display = ('title', 'location', 'date', 'time', 'archived_at')
+    search_fields = ('title', 'location')
+    list_filter = ('date',)
+    ordering = ('-date',)
@@ -0,0 +1,100 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import OuterRef, Q, Subquery
+from django.utils import timezone
+
+from events.models import (
+    ArchivedEventRegistration, ArchivedPrivateEvent, ArchivedWishlist,
+    EventDailyStats, EventRegistration, PrivateEvent, Wishlist,
+)
+
+
+ARCHIVED_FIELDS = [
+    'title', 'description', 'location', 'latitude', 'longitude', 'date', 'time',
+    'max_participants', 'image', 'organizer_id', 'category',
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "Déplace les événements passés et leurs inscriptions/wishlists vers les tables d'archive, par lots. "
+        "Leurs agrégats quotidiens sont rattachés à l'archive."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=1, help="Archive les événements terminés depuis plus de N jours.")
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--dry-run', action='store_true', help="Affiche ce qui serait archivé sans rien modifier.")
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now().date() - timedelta(days=options['days'])
+        # Événements ponctuels passés et séries récurrentes terminées
+        candidates = PrivateEvent.objects.filter(
+            Q(recurrence_frequency__isnull=True, date__lt=cutoff)
+            | Q(recurrence_frequency__isnull=False, recurrence_until__lt=cutoff)
+        ).order_by('pk')
+
+        if options['dry_run']:
+            self.stdout.write(
+                f"[dry-run] {candidates.count()} événement(s), "
+                f"{EventRegistration.objects.filter(event__in=candidates).count()} inscription(s) et "
+                f"{Wishlist.objects.filter(event__in=candidates).count()} wishlist(s) seraient archivés."
+            )
+            return
+
+        totals = {'events': 0, 'registrations': 0, 'wishlists': 0}
+        start = time.perf_counter()
+        while True:
+            archived = self.archive_batch(candidates, options['batch_size'])
+            if not archived['events']:
+                break
+            for key, value in archived.items():
+                totals[key] += value
+            self.stdout.write(f"Lot archivé : {archived}")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{totals['events']} événement(s), {totals['registrations']} inscription(s) et "
+            f"{totals['wishlists']} wishlist(s) archivés en {time.perf_counter() - start:.2f}s."
+        ))
+
+    def archive_batch(self, candidates, batch_size):
+        """ Archive un lot d'événements dans une transaction courte. """
+        with transaction.atomic():
+            events = list(candidates.select_for_update(skip_locked=True)[:batch_size])
+            if not events:
+                return {'events': 0, 'registrations': 0, 'wishlists': 0}
+
+            archives = ArchivedPrivateEvent.objects.bulk_create([
+                ArchivedPrivateEvent(original_id=event.pk, **{field: getattr(event, field) for field in ARCHIVED_FIELDS})
+                for event in events
+            ])
+            archive_ids = {archive.original_id: archive.pk for archive in archives}
+            event_ids = list(archive_ids)
+
+            registrations = ArchivedEventRegistration.objects.bulk_create([
+                ArchivedEventRegistration(
+                    user_id=row['user_id'],
+                    event_id=archive_ids[row['event_id']],
+                    occurrence_date=row['occurrence_date'],
+                    registered_at=row['registered_at'],
+                )
+                for row in EventRegistration.objects.filter(event_id__in=event_ids)
+                .values('user_id', 'event_id', 'occurrence_date', 'registered_at')
+            ])
+            wishlists = ArchivedWishlist.objects.bulk_create([
+                ArchivedWishlist(user_id=row['user_id'], event_id=archive_ids[row['event_id']])
+                for row in Wishlist.objects.filter(event_id__in=event_ids).values('user_id', 'event_id')
+            ])
+
+            # Les agrégats quotidiens suivent l'archive : l'historique des tableaux de bord est conservé
+            EventDailyStats.objects.filter(event_id__in=event_ids).update(archived_event=Subquery(
+                ArchivedPrivateEvent.objects.filter(original_id=OuterRef('event_id')).values('pk')
+            ))
+
+            # La suppression cascade sur les inscriptions, wishlists, listes d'attente et participants
+            PrivateEvent.objects.filter(pk__in=event_ids).delete()
+
+        return {'events': len(archives), 'registrations': len(registrations), 'wishlists': len(wishlists)}
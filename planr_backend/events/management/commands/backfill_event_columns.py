@@ -0,0 +1,53 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q
+
+from events.models import ArchivedPrivateEvent, PrivateEvent
+from events.utils import encode_geohash, event_starts_at
+
+
+class Command(BaseCommand):
+    help = "Renseigne par lots les colonnes calculées (starts_at, geohash) des événements créés avant leur ajout."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--dry-run', action='store_true', help="Compte les lignes concernées sans rien modifier.")
+
+    def handle(self, *args, **options):
+        self.batch_size = options['batch_size']
+        self.dry_run = options['dry_run']
+
+        self.backfill(PrivateEvent, ['starts_at', 'geohash'], Q(starts_at__isnull=True) | Q(
+            geohash__isnull=True, latitude__isnull=False, longitude__isnull=False,
+        ))
+        self.backfill(ArchivedPrivateEvent, ['starts_at'], Q(starts_at__isnull=True))
+
+    def backfill(self, model, fields, missing):
+        pending = model.objects.filter(missing).order_by('pk')
+        label = model._meta.verbose_name_plural
+
+        if self.dry_run:
+            self.stdout.write(f"[dry-run] {pending.count()} {label} à compléter.")
+            return
+
+        total, last_pk = 0, 0
+        start = time.perf_counter()
+        while True:
+            # Parcours par clé primaire croissante : chaque lot est une requête indexée, sans OFFSET
+            with transaction.atomic():
+                batch = list(pending.filter(pk__gt=last_pk).only('pk', 'date', 'time', 'latitude', 'longitude')[:self.batch_size])
+                if not batch:
+                    break
+                for event in batch:
+                    event.starts_at = event_starts_at(event.date, event.time)
+                    if 'geohash' in fields and event.latitude is not None and event.longitude is not None:
+                        event.geohash = encode_geohash(float(event.latitude), float(event.longitude))
+                model.objects.bulk_update(batch, fields)
+            total += len(batch)
+            last_pk = batch[-1].pk
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{total} {label} complété(s) en {time.perf_counter() - start:.2f}s."
+        ))
@@ -0,0 +1,79 @@
+import time
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Exists, Max, Min, OuterRef, Q
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from events.models import EventDailyStats, EventRegistration, PrivateEvent, Wishlist
+
+
+class Command(BaseCommand):
+    help = (
+        "Reconstruit les agrégats quotidiens (EventDailyStats) à partir des inscriptions et wishlists existantes, "
+        "par plages d'événements. Les désinscriptions et retraits passés ne sont pas connus et restent à zéro."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help="Événements traités par transaction.")
+        parser.add_argument('--dry-run', action='store_true', help="Affiche le nombre de lignes sans rien écrire.")
+
+    def handle(self, *args, **options):
+        bounds = PrivateEvent.objects.aggregate(first=Min('pk'), last=Max('pk'))
+        if bounds['first'] is None:
+            return
+
+        written = 0
+        start = time.perf_counter()
+        batch_size = options['batch_size']
+        for low in range(bounds['first'], bounds['last'] + 1, batch_size):
+            batch = Q(event_id__gte=low, event_id__lt=low + batch_size)
+            rows = self.aggregate(batch)
+            written += len(rows)
+            if options['dry_run'] or not rows and not EventDailyStats.objects.filter(batch).exists():
+                continue
+            # Les lignes du lot sont remplacées d'un bloc : relancer la commande ne double pas les compteurs
+            with transaction.atomic():
+                EventDailyStats.objects.filter(batch).delete()
+                EventDailyStats.objects.bulk_create(rows, batch_size=1000)
+
+        action = "à créer" if options['dry_run'] else "créée(s)"
+        self.stdout.write(self.style.SUCCESS(
+            f"{written} ligne(s) d'agrégats {action} en {time.perf_counter() - start:.2f}s."
+        ))
+
+    def aggregate(self, batch):
+        """ Compte inscriptions, conversions et ajouts en wishlist par événement et par jour local. """
+        tz = timezone.get_current_timezone()
+        counters = defaultdict(lambda: defaultdict(int))
+
+        registrations = (
+            EventRegistration.objects.filter(batch)
+            .annotate(
+                day=TruncDate('registered_at', tzinfo=tz),
+                wishlisted=Exists(Wishlist.objects.filter(user_id=OuterRef('user_id'), event_id=OuterRef('event_id'))),
+            )
+            .values('event_id', 'day')
+            .annotate(total=Count('id'), converted=Count('id', filter=Q(wishlisted=True)))
+        )
+        for row in registrations:
+            counters[row['event_id'], row['day']]['registrations'] = row['total']
+            counters[row['event_id'], row['day']]['conversions'] = row['converted']
+
+        # Les wishlists antérieures au champ created_at sont comptées au jour de la reconstruction
+        today = timezone.localdate()
+        wishlists = (
+            Wishlist.objects.filter(batch)
+            .annotate(day=TruncDate('created_at', tzinfo=tz))
+            .values('event_id', 'day')
+            .annotate(total=Count('id'))
+        )
+        for row in wishlists:
+            counters[row['event_id'], row['day'] or today]['wishlist_adds'] += row['total']
+
+        return [
+            EventDailyStats(event_id=event_id, day=day, **values)
+            for (event_id, day), values in counters.items()
+        ]
@@ -0,0 +1,146 @@
+import json
+import random
+from datetime import date, time as dt_time, timedelta
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from authentication.models import Profile, User
+from events.models import EventRegistration, PrivateEvent, Wishlist
+from events.serializers import PrivateEventListProjection, PrivateEventSerializer
+from planr_backend.benchmark import measure, rolled_back
+from planr_backend.renderers import CamelCaseJSONRenderer
+
+
+class Command(BaseCommand):
+    help = (
+        "Vérifie que la projection values() des listes d'événements produit exactement la sortie de "
+        "PrivateEventSerializer (liste complète et ?participants=preview), puis compare leurs temps de rendu."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='1000,10000', help="Nombres d'événements, séparés par des virgules.")
+        parser.add_argument('--participants', type=int, default=5, help="Participants par événement.")
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        sizes = [int(size) for size in options['sizes'].split(',')]
+        rng = random.Random(options['seed'])
+        renderer = CamelCaseJSONRenderer()
+        results = []
+
+        with rolled_back():
+            viewer, users = self.seed_users(options['participants'])
+            created = 0
+            for size in sizes:
+                self.seed_events(rng, viewer, users, created, size - created)
+                created = size
+                events = PrivateEvent.objects.filter(organizer__in=users).order_by('id')
+                # Requête du ViewSet : organisateur joint, participants et profils préchargés
+                serializer_events = events.select_related('organizer').prefetch_related(PrivateEvent.participants_prefetch())
+
+                for mode, path in [('full', '/private-events/'), ('preview', '/private-events/?participants=preview')]:
+                    request = Request(APIRequestFactory().get(path))
+                    request.user = viewer
+                    queryset = serializer_events.prefetch_related(None) if mode == 'preview' else serializer_events
+
+                    expected = renderer.render(PrivateEventSerializer(queryset.all(), many=True, context={'request': request}).data)
+                    actual = renderer.render(PrivateEventListProjection(events.all(), request).data)
+                    if actual != expected:
+                        raise CommandError(f"Sortie différente du serializer ({size} événements, mode {mode}).")
+
+                    results.append({
+                        'events': size,
+                        'mode': mode,
+                        'identical_output': True,
+                        'bytes': len(actual),
+                        'serializer': measure(
+                            lambda: PrivateEventSerializer(queryset.all(), many=True, context={'request': request}).data,
+                            options['repeat'],
+                        ),
+                        # Meilleur cas du serializer : profils joints et indicateurs précalculés (comme AsyncEventView)
+                        'serializer_precomputed': measure(
+                            lambda: self.serialize_precomputed(queryset.select_related('organizer__profile'), request),
+                            options['repeat'],
+                        ),
+                        'projection': measure(lambda: PrivateEventListProjection(events.all(), request).data, options['repeat']),
+                    })
+                    timings = results[-1]
+                    timings['speedup'] = round(timings['serializer']['mean_ms'] / timings['projection']['mean_ms'], 2)
+                    timings['speedup_precomputed'] = round(
+                        timings['serializer_precomputed']['mean_ms'] / timings['projection']['mean_ms'], 2
+                    )
+
+        self.stdout.write(json.dumps(results, indent=2))
+
+    def serialize_precomputed(self, queryset, request):
+        events = list(queryset)
+        event_ids = [event.id for event in events]
+        context = {
+            'request': request,
+            'wishlist_counts': dict(
+                Wishlist.objects.filter(event_id__in=event_ids).values('event_id').annotate(total=Count('id')).values_list('event_id', 'total')
+            ),
+            'wishlisted_ids': set(Wishlist.objects.filter(user=request.user, event_id__in=event_ids).values_list('event_id', flat=True)),
+            'registered_ids': set(
+                EventRegistration.objects.filter(user=request.user, event_id__in=event_ids).values_list('event_id', flat=True)
+            ),
+        }
+        return PrivateEventSerializer(events, many=True, context=context).data
+
+    def seed_users(self, count):
+        password = make_password(None)
+        viewer = User.objects.create_user(email='bench-list@planr.dev', password=None)  # Profil créé par le signal
+        users = User.objects.bulk_create([
+            User(email=f'bench-list-{index}@planr.dev', password=password) for index in range(max(count, 1))
+        ])
+        users = list(User.objects.filter(email__in=[user.email for user in users]))
+        Profile.objects.bulk_create([
+            Profile(
+                user=user,
+                first_name=f'Bench {index}',
+                birth_date=date(1990, 1, 1),
+                gender=Profile.GENDER_CHOICES[0][0],
+                # Une photo sur deux : couvre l'URL du stockage et l'avatar par défaut
+                profile_picture=f'profiles/bench-{index}.jpg' if index % 2 else None,
+            )
+            for index, user in enumerate(users)
+        ])
+        return viewer, users
+
+    def seed_events(self, rng, viewer, users, offset, count):
+        today = date.today()
+        PrivateEvent.objects.bulk_create([
+            PrivateEvent(
+                title=f'Événement {offset + index}',
+                description='Événement de benchmark',
+                location='Paris',
+                latitude=Decimal(f'{rng.uniform(43.0, 50.5):.6f}') if index % 3 else None,
+                longitude=Decimal(f'{rng.uniform(-1.5, 7.5):.6f}') if index % 3 else None,
+                date=today + timedelta(days=rng.randint(1, 120)),
+                time=dt_time(rng.randint(8, 21), rng.choice([0, 30])),
+                max_participants=20,
+                image=f'event_images/bench-{index}.jpg' if index % 2 else '',
+                organizer=rng.choice(users),
+                category=rng.choice(PrivateEvent.CATEGORY_CHOICES)[0],
+                recurrence_frequency='WEEKLY' if index % 10 == 0 else None,
+                recurrence_until=today + timedelta(days=180) if index % 20 == 0 else None,
+            )
+            for index in range(count)
+        ], batch_size=1000)
+        events = list(PrivateEvent.objects.filter(organizer__in=users).order_by('-id')[:count])
+
+        Participant = PrivateEvent.participants.through
+        Participant.objects.bulk_create([
+            Participant(privateevent_id=event.id, user_id=user.id)
+            for event in events
+            for user in rng.sample(users, rng.randint(0, len(users)))
+        ], batch_size=1000)
+        Wishlist.objects.bulk_create([
+            Wishlist(user=viewer, event=event) for event in events if rng.random() < 0.2
+        ], batch_size=1000)
@@ -0,0 +1,66 @@
+import json
+import random
+import time
+from datetime import date, time as dt_time, timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.test import Client
+from django.core.management.base import BaseCommand
+from rest_framework_simplejwt.tokens import AccessToken
+
+from events.models import PrivateEvent
+from planr_backend.benchmark import rolled_back, summarize
+
+
+class Command(BaseCommand):
+    help = "Mesure le coût de la vue calendrier d'un mois avec des milliers de séries récurrentes."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--series', type=int, default=5000, help="Nombre de séries récurrentes créées.")
+        parser.add_argument('--repeat', type=int, default=10, help="Nombre d'appels mesurés.")
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        settings.ALLOWED_HOSTS = [*settings.ALLOWED_HOSTS, 'testserver']
+
+        with rolled_back():
+            organizer = get_user_model().objects.create_user(email='bench-recurring@planr.dev', password=None)
+            today = date.today()
+            PrivateEvent.objects.bulk_create([
+                PrivateEvent(
+                    title=f'Série {index}',
+                    description='Événement récurrent de benchmark',
+                    location='Paris',
+                    date=today - timedelta(days=rng.randint(0, 3 * 365)),  # Séries anciennes comme récentes
+                    time=dt_time(rng.randint(8, 21), 0),
+                    max_participants=rng.randint(5, 50),
+                    organizer=organizer,
+                    category=rng.choice(PrivateEvent.CATEGORY_CHOICES)[0],
+                    recurrence_frequency=rng.choice(PrivateEvent.RECURRENCE_CHOICES)[0],
+                    recurrence_interval=rng.randint(1, 2),
+                )
+                for index in range(options['series'])
+            ], batch_size=1000)
+
+            client = Client(headers={'Authorization': f'Bearer {AccessToken.for_user(organizer)}'})
+            start = today.replace(day=1)
+            end = (start + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+            path = f'/private-events/occurrences/?start={start}&end={end}'
+
+            latencies, occurrences = [], 0
+            started = time.perf_counter()
+            for _ in range(options['repeat']):
+                call_start = time.perf_counter()
+                response = client.get(path)
+                latencies.append(time.perf_counter() - call_start)
+                occurrences = len(response.json())
+            elapsed = time.perf_counter() - started
+
+        self.stdout.write(json.dumps({
+            'series': options['series'],
+            'month': f'{start:%Y-%m}',
+            'occurrences': occurrences,
+            **summarize(latencies, elapsed),
+        }, indent=2))
@@ -0,0 +1,77 @@
+import json
+import time
+from collections import OrderedDict
+from datetime import date, time as dt_time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from djangorestframework_camel_case.render import CamelCaseJSONRenderer as LibraryCamelCaseJSONRenderer
+from rest_framework.utils.serializer_helpers import ReturnList
+
+from planr_backend.renderers import CamelCaseJSONRenderer
+from planr_backend.benchmark import summarize
+
+
+def build_event_list(count, participants):
+    """ Construit une liste d'événements ayant la forme de la sortie de PrivateEventSerializer. """
+    return ReturnList([
+        OrderedDict([
+            ('id', index),
+            ('title', f'Événement {index}'),
+            ('description', 'Description détaillée de l\'événement ' * 5),
+            ('location', 'Paris'),
+            ('latitude', '48.85660000'),
+            ('longitude', '2.35220000'),
+            ('date', date(2026, 1, 1).isoformat()),
+            ('time', dt_time(18, 30).isoformat()),
+            ('max_participants', 20),
+            ('image', f'http://localhost:8000/media/event_images/{index}.jpg'),
+            ('organizer', OrderedDict([('first_name', 'Alice'), ('profile_picture', None)])),
+            ('participants', [
+                {'firstName': f'Participant {n}', 'profilePicture': 'http://localhost:8000/default-avatar.png'}
+                for n in range(participants)
+            ]),
+            ('wishlist_count', Decimal('3') if index % 2 else 3),
+            ('is_wishlisted', False),
+            ('is_registered', True),
+            ('category_display', 'Sport'),
+            ('recurrence_frequency', None),
+            ('recurrence_interval', 1),
+            ('recurrence_until', None),
+        ])
+        for index in range(count)
+    ], serializer=None)
+
+
+class Command(BaseCommand):
+    help = "Compare le temps de rendu JSON camelCase d'une liste d'événements avant/après le renderer optimisé."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--events', type=int, default=1000)
+        parser.add_argument('--participants', type=int, default=10)
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        data = build_event_list(options['events'], options['participants'])
+        renderers = {
+            'djangorestframework_camel_case': LibraryCamelCaseJSONRenderer(),
+            'planr_backend': CamelCaseJSONRenderer(),
+        }
+
+        outputs = {name: renderer.render(data) for name, renderer in renderers.items()}
+        if len(set(outputs.values())) != 1:
+            raise CommandError("Les deux renderers ne produisent pas une sortie identique.")
+
+        results = {}
+        for name, renderer in renderers.items():
+            latencies = []
+            start = time.perf_counter()
+            for _ in range(options['repeat']):
+                call_start = time.perf_counter()
+                renderer.render(data)
+                latencies.append(time.perf_counter() - call_start)
+            results[name] = summarize(latencies, time.perf_counter() - start)
+
+        results['identical_output'] = True
+        results['bytes'] = len(outputs['planr_backend'])
+        self.stdout.write(json.dumps(results, indent=2))
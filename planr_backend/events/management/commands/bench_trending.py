@@ -0,0 +1,67 @@
+import io
+import json
+import random
+import time
+from datetime import date, time as dt_time, timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from events.models import PrivateEvent
+from planr_backend.benchmark import measure, rolled_back
+
+
+class Command(BaseCommand):
+    help = "Mesure le coût du classement ?ordering=-trending, des incréments et de la décroissance sur un grand volume d'événements."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--events', type=int, default=1000000)
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        today = date.today()
+
+        with rolled_back():
+            organizer = get_user_model().objects.create_user(email='bench-trending@planr.dev', password=None)
+            created = 0
+            while created < options['events']:
+                size = min(10000, options['events'] - created)
+                PrivateEvent.objects.bulk_create([
+                    PrivateEvent(
+                        title=f'Événement {created + index}',
+                        description='Événement de benchmark',
+                        location='Paris',
+                        date=today + timedelta(days=rng.randint(-60, 120)),
+                        time=dt_time(rng.randint(8, 22), 0),
+                        max_participants=20,
+                        organizer=organizer,
+                        category='SPORT',
+                        # La plupart des événements n'ont aucune activité récente
+                        trending=rng.expovariate(0.2) if rng.random() < 0.3 else 0.0,
+                    )
+                    for index in range(size)
+                ], batch_size=size)
+                created += size
+
+            ranking = PrivateEvent.objects.filter(PrivateEvent.upcoming(timezone.now())).order_by('-trending')
+            event_ids = list(PrivateEvent.objects.filter(organizer=organizer).values_list('pk', flat=True)[:options['repeat']])
+            bumps = iter(event_ids)
+
+            decay_output = io.StringIO()
+            decay_start = time.perf_counter()
+            call_command('decay_trending', stdout=decay_output)
+            decay_seconds = time.perf_counter() - decay_start
+
+            results = {
+                'events': options['events'],
+                'top_50': measure(lambda: list(ranking.values_list('pk', flat=True)[:50]), options['repeat']),
+                'bump': measure(lambda: PrivateEvent.bump_trending(next(bumps), 1.0), len(event_ids)),
+                'decay_seconds': round(decay_seconds, 2),
+                'plan': ranking.values('pk')[:50].explain(),
+            }
+
+        self.stdout.write(json.dumps(results, indent=2))
@@ -0,0 +1,200 @@
+import io
+import json
+import random
+from datetime import date, time as dt_time, timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test import Client
+from PIL import Image
+from rest_framework.test import APIRequestFactory
+from rest_framework.request import Request
+from rest_framework_simplejwt.tokens import AccessToken
+
+from authentication.models import Interest, Profile, User
+from events.models import EventRegistration, PrivateEvent, Wishlist
+from events.serializers import PrivateEventSerializer
+from events.views import PrivateEventViewSet
+from planr_backend.benchmark import measure
+from planr_backend.utils import process_image
+
+
+BENCH_EMAIL = 'bench-api@planr.dev'
+BENCH_PASSWORD = 'Bench-api-2024!'
+
+
+class Command(BaseCommand):
+    help = (
+        "Génère un jeu de données reproductible puis mesure les sérialiseurs, process_image "
+        "et les endpoints liste/inscription/connexion (débit, p50/p99, requêtes SQL) au format JSON."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=200)
+        parser.add_argument('--events', type=int, default=500)
+        parser.add_argument('--interests', type=int, default=30)
+        parser.add_argument('--requests', type=int, default=30, help="Appels mesurés par scénario.")
+        parser.add_argument('--login-requests', type=int, default=20, help="Appels mesurés pour la connexion (hachage coûteux).")
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--output', help="Fichier JSON où écrire les résultats, pour comparer deux versions.")
+        parser.add_argument('--keep-data', action='store_true', help="Conserve le jeu de données au lieu de l'annuler.")
+
+    def handle(self, *args, **options):
+        if User.objects.filter(email=BENCH_EMAIL).exists():
+            raise CommandError(f"L'utilisateur {BENCH_EMAIL} existe déjà : supprimez le jeu de données conservé.")
+
+        settings.ALLOWED_HOSTS = [*settings.ALLOWED_HOSTS, 'testserver']
+        rng = random.Random(options['seed'])
+
+        # Les données de test sont créées puis annulées, sauf avec --keep-data
+        with transaction.atomic():
+            bench_user = self.build_dataset(rng, options)
+            results = {
+                'dataset': {
+                    'users': options['users'],
+                    'events': options['events'],
+                    'registrations': EventRegistration.objects.count(),
+                    'wishlists': Wishlist.objects.count(),
+                },
+                'micro': {
+                    'event_serializer': self.bench_serializer(bench_user, options['requests']),
+                    'process_image': self.bench_process_image(rng, options['requests']),
+                },
+                'endpoints': {
+                    'event_list': self.bench_list(bench_user, options['requests']),
+                    'event_register': self.bench_register(bench_user, options['requests']),
+                    'login': self.bench_login(options['login_requests']),
+                },
+            }
+            if not options['keep_data']:
+                transaction.set_rollback(True)
+
+        output = json.dumps(results, indent=2)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                file.write(output)
+        self.stdout.write(output)
+
+    def build_dataset(self, rng, options):
+        """
+        Crée utilisateurs, profils, centres d'intérêt, événements, inscriptions et wishlists.
+        Le même `--seed` produit toujours le même jeu de données.
+        """
+        password = make_password(None)  # Mot de passe inutilisable partagé : un seul hachage
+        users = User.objects.bulk_create([
+            User(email=f'bench-{index}@planr.dev', password=password) for index in range(options['users'])
+        ], batch_size=1000)
+        bench_user = User.objects.create_user(email=BENCH_EMAIL, password=BENCH_PASSWORD)  # Passe par le signal
+
+        interests = Interest.objects.bulk_create([
+            Interest(name=f'Centre d’intérêt de benchmark {index}') for index in range(options['interests'])
+        ])
+        Profile.objects.bulk_create([
+            Profile(
+                user=user,
+                first_name=f'Bench {index}',
+                birth_date=date(1970, 1, 1) + timedelta(days=rng.randint(0, 40 * 365)),
+                gender=rng.choice(Profile.GENDER_CHOICES)[0],
+                is_profile_complete=True,
+            )
+            for index, user in enumerate(users)
+        ], batch_size=1000)
+        ProfileInterest = Profile.interests.through
+        ProfileInterest.objects.bulk_create([
+            ProfileInterest(profile_id=profile_id, interest=interest)
+            for profile_id in Profile.objects.filter(user__in=users).values_list('id', flat=True)
+            for interest in rng.sample(interests, min(3, len(interests)))
+        ], batch_size=1000)
+
+        today = date.today()
+        events = PrivateEvent.objects.bulk_create([
+            PrivateEvent(
+                title=f'Événement de benchmark {index}',
+                description='Événement généré pour le benchmark',
+                location=rng.choice(['Paris', 'Lyon', 'Marseille', 'Lille', 'Bordeaux']),
+                latitude=Decimal(f'{rng.uniform(43.0, 50.5):.6f}'),
+                longitude=Decimal(f'{rng.uniform(-1.5, 7.5):.6f}'),
+                date=today + timedelta(days=rng.randint(-30, 180)),  # Environ 15 % d'événements passés
+                time=dt_time(rng.randint(8, 21), rng.choice([0, 30])),
+                max_participants=rng.randint(5, 30),
+                organizer=rng.choice(users),
+                category=rng.choice(PrivateEvent.CATEGORY_CHOICES)[0],
+            )
+            for index in range(options['events'])
+        ], batch_size=1000)
+
+        EventInterest = PrivateEvent.interests.through
+        EventInterest.objects.bulk_create([
+            EventInterest(privateevent=event, interest=interest)
+            for event in events
+            for interest in rng.sample(interests, min(2, len(interests)))
+        ], batch_size=1000)
+
+        # Une place reste toujours libre pour que le scénario d'inscription ne soit pas refusé
+        registrations, participants = [], []
+        EventParticipant = PrivateEvent.participants.through
+        for event in events:
+            for user in rng.sample(users, min(rng.randint(0, event.max_participants - 1), len(users))):
+                registrations.append(EventRegistration(user=user, event=event))
+                participants.append(EventParticipant(privateevent=event, user=user))
+        EventRegistration.objects.bulk_create(registrations, batch_size=1000)
+        EventParticipant.objects.bulk_create(participants, batch_size=1000)
+
+        Wishlist.objects.bulk_create([
+            Wishlist(user=user, event=event)
+            for user in [bench_user, *users]
+            for event in rng.sample(events, min(5, len(events)))
+        ], batch_size=1000)
+        return bench_user
+
+    def bench_serializer(self, user, repeat):
+        """ Sérialisation de la liste d'événements telle que la vue la construit. """
+        request = APIRequestFactory().get('/private-events/')
+        request = Request(request)
+        request.user = user
+        view = PrivateEventViewSet(request=request, format_kwarg=None, action='list')
+
+        def serialize():
+            PrivateEventSerializer(view.get_queryset(), many=True, context={'request': request}).data
+        return measure(serialize, repeat)
+
+    def bench_process_image(self, rng, repeat):
+        """ Redimensionnement et compression d'une photo de 12 Mpx. """
+        image = Image.effect_noise((4000, 3000), 64).convert('RGB')
+        buffer = io.BytesIO()
+        image.save(buffer, format='PNG')
+        content = buffer.getvalue()
+
+        def process():
+            process_image(SimpleUploadedFile('photo.png', content, content_type='image/png'))
+        return measure(process, max(repeat // 10, 1))  # Chaque appel coûte des centaines de millisecondes
+
+    def bench_list(self, user, repeat):
+        client = Client(headers={'Authorization': f'Bearer {AccessToken.for_user(user)}'})
+        return measure(lambda: self.check_response(client.get('/private-events/'), 200), repeat)
+
+    def bench_register(self, user, repeat):
+        """ Inscriptions successives du même utilisateur à des événements à venir distincts. """
+        client = Client(headers={'Authorization': f'Bearer {AccessToken.for_user(user)}'})
+        event_ids = list(
+            PrivateEvent.objects.filter(date__gt=date.today()).exclude(participants=user).values_list('id', flat=True)[:repeat]
+        )
+        pending = iter(event_ids)
+
+        def register():
+            response = client.post('/registrations/', {'event_id': next(pending)}, content_type='application/json')
+            self.check_response(response, 201)
+        return measure(register, len(event_ids))
+
+    def bench_login(self, repeat):
+        client = Client()
+        payload = {'email': BENCH_EMAIL, 'password': BENCH_PASSWORD}
+        return measure(lambda: self.check_response(client.post('/users/login/', payload, content_type='application/json'), 200), repeat)
+
+    def check_response(self, response, expected):
+        if response.status_code != expected:
+            raise CommandError(f"{response.request['PATH_INFO']} a répondu {response.status_code} : {response.content[:200]!r}")
@@ -0,0 +1,47 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Case, F, Max, Min, Q, Value, When
+
+from events.models import PrivateEvent
+
+
+class Command(BaseCommand):
+    help = (
+        "Applique la décroissance exponentielle du score de popularité, par plages de clés primaires. "
+        "À exécuter à intervalle régulier (cron), en passant cet intervalle à --elapsed-hours."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--elapsed-hours', type=float, default=1.0, help="Temps écoulé depuis la dernière exécution.")
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--threshold', type=float, default=0.01, help="Les scores inférieurs sont remis à zéro.")
+
+    def handle(self, *args, **options):
+        factor = 0.5 ** (options['elapsed_hours'] / settings.TRENDING_HALF_LIFE_HOURS)
+        bounds = PrivateEvent.objects.aggregate(first=Min('pk'), last=Max('pk'))
+        if bounds['first'] is None:
+            return
+
+        updated = 0
+        start = time.perf_counter()
+        batch_size = options['batch_size']
+        for low in range(bounds['first'], bounds['last'] + 1, batch_size):
+            # Transaction courte par plage : les incréments concurrents ne sont bloqués que sur un lot
+            with transaction.atomic():
+                updated += (
+                    PrivateEvent.objects
+                    .filter(pk__gte=low, pk__lt=low + batch_size)
+                    .exclude(trending=0)
+                    .update(trending=Case(
+                        # Scores négligeables remis à zéro (un retrait ne soustrait que la part restante de son apport)
+                        When(Q(trending__lt=options['threshold']), then=Value(0.0)),
+                        default=F('trending') * factor,
+                    ))
+                )
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{updated} score(s) réduit(s) d'un facteur {factor:.4f} en {time.perf_counter() - start:.2f}s."
+        ))
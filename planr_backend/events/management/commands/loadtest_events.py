@@ -0,0 +1,81 @@
+import asyncio
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.test import AsyncClient, Client
+from rest_framework_simplejwt.tokens import AccessToken
+
+from planr_backend.benchmark import summarize
+
+
+SCENARIOS = {
+    'list': ('/private-events/', '/async/private-events/'),
+    'upcoming': ('/my-upcoming-events/', '/async/my-upcoming-events/'),
+}
+
+
+class Command(BaseCommand):
+    help = "Compare le débit et la latence p99 des lectures d'événements synchrones et asynchrones."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--email', required=True, help="E-mail de l'utilisateur utilisé pour s'authentifier.")
+        parser.add_argument('--scenario', choices=SCENARIOS, default='list')
+        parser.add_argument('--requests', type=int, default=200)
+        parser.add_argument('--concurrency', type=int, default=20)
+
+    def handle(self, *args, **options):
+        user = get_user_model().objects.filter(email=options['email']).first()
+        if not user:
+            raise CommandError(f"Aucun utilisateur avec l'e-mail {options['email']}.")
+
+        # Les clients de test s'annoncent comme « testserver », comme sous le lanceur de tests
+        settings.ALLOWED_HOSTS = [*settings.ALLOWED_HOSTS, 'testserver']
+        headers = {'Authorization': f'Bearer {AccessToken.for_user(user)}'}
+        sync_path, async_path = SCENARIOS[options['scenario']]
+        total, concurrency = options['requests'], options['concurrency']
+
+        results = {
+            # Vue DRF synchrone, un thread par requête (modèle WSGI/gunicorn threads)
+            'sync_view_wsgi': self.run_threaded(sync_path, headers, total, concurrency),
+            # Vue DRF synchrone servie par le handler ASGI (thread_sensitive)
+            'sync_view_asgi': asyncio.run(self.run_async(sync_path, headers, total, concurrency)),
+            # Vue asynchrone native servie par le handler ASGI
+            'async_view_asgi': asyncio.run(self.run_async(async_path, headers, total, concurrency)),
+        }
+        self.stdout.write(json.dumps(results, indent=2))
+
+    def run_threaded(self, path, headers, total, concurrency):
+        def call(_):
+            client = Client()
+            start = time.perf_counter()
+            response = client.get(path, headers=headers)
+            self.check_response(path, response)
+            return time.perf_counter() - start
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            latencies = list(pool.map(call, range(total)))
+        return summarize(latencies, time.perf_counter() - start)
+
+    async def run_async(self, path, headers, total, concurrency):
+        client = AsyncClient()
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def call():
+            async with semaphore:
+                start = time.perf_counter()
+                response = await client.get(path, headers=headers)
+                self.check_response(path, response)
+                return time.perf_counter() - start
+
+        start = time.perf_counter()
+        latencies = await asyncio.gather(*(call() for _ in range(total)))
+        return summarize(latencies, time.perf_counter() - start)
+
+    def check_response(self, path, response):
+        if response.status_code != 200:
+            raise CommandError(f"{path} a répondu {response.status_code} : {response.content[:200]!r}")
@@ -0,0 +1,203 @@
+import csv
+import io
+import random
+import time
+from datetime import date, time as dt_time, timedelta
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import Max
+
+from authentication.catalog import invalidate_catalog
+from authentication.models import Interest, Profile, User
+from events.models import EventRegistration, PrivateEvent
+
+
+# Villes pondérées par leur poids approximatif dans l'activité (nom, latitude, longitude, poids)
+CITIES = [
+    ('Paris', 48.8566, 2.3522, 40), ('Lyon', 45.7640, 4.8357, 10), ('Marseille', 43.2965, 5.3698, 9),
+    ('Toulouse', 43.6047, 1.4442, 7), ('Lille', 50.6292, 3.0573, 6), ('Bordeaux', 44.8378, -0.5792, 6),
+    ('Nantes', 47.2184, -1.5536, 5), ('Strasbourg', 48.5734, 7.7521, 5), ('Montpellier', 43.6108, 3.8767, 5),
+    ('Rennes', 48.1173, -1.6778, 4), ('Nice', 43.7102, 7.2620, 4), ('Grenoble', 45.1885, 5.7245, 3),
+]
+CITY_WEIGHTS = [city[3] for city in CITIES]
+# Créneaux horaires pondérés : la majorité des événements ont lieu en soirée
+HOURS = list(range(8, 23))
+HOUR_WEIGHTS = [1, 2, 3, 3, 2, 2, 3, 3, 4, 6, 10, 12, 10, 6, 3]
+
+
+class Command(BaseCommand):
+    help = (
+        "Génère rapidement un grand jeu de données réaliste et déterministe (utilisateurs, profils, "
+        "centres d'intérêt, événements, inscriptions) par lots, sans passer par les signaux."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100000)
+        parser.add_argument('--events', type=int, default=50000)
+        parser.add_argument('--interests', type=int, default=200)
+        parser.add_argument('--registrations', type=int, default=8, help="Nombre moyen d'inscrits par événement.")
+        parser.add_argument('--chunk-size', type=int, default=10000, help="Lignes générées et écrites par transaction.")
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--prefix', default='seed', help="Préfixe des e-mails et centres d'intérêt générés.")
+        parser.add_argument('--password', help="Mot de passe commun aux comptes générés (inutilisable par défaut).")
+
+    def handle(self, *args, **options):
+        prefix = options['prefix']
+        if User.objects.filter(email__startswith=f'{prefix}-').exists():
+            raise CommandError(f"Des utilisateurs « {prefix}-… » existent déjà : choisissez un autre --prefix.")
+
+        self.rng = random.Random(options['seed'])
+        self.chunk_size = options['chunk_size']
+        # COPY est bien plus rapide que des INSERT multi-lignes, mais n'existe que sous PostgreSQL
+        self.use_copy = connection.vendor == 'postgresql'
+        self.rows = 0
+        self.today = date.today()
+        start = time.perf_counter()
+
+        # Un seul hachage pour tous les comptes : le coût de PBKDF2 dominerait sinon la génération
+        self.password = make_password(options['password'])
+        interest_ids = self.seed_interests(prefix, options['interests'])
+        user_ids = self.seed_users(prefix, options['users'], interest_ids)
+        self.seed_events(options['events'], user_ids, interest_ids, options['registrations'])
+
+        if self.use_copy:
+            # Les IDs sont attribués ici : les séquences doivent être recalées sur les valeurs insérées
+            models = [Interest, User, Profile, PrivateEvent, EventRegistration, Profile.interests.through,
+                      PrivateEvent.interests.through, PrivateEvent.participants.through]
+            with connection.cursor() as cursor:
+                for sql in connection.ops.sequence_reset_sql(no_style(), models):
+                    cursor.execute(sql)
+
+        invalidate_catalog()  # bulk_create et COPY n'envoient pas les signaux qui invalident le catalogue
+
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(
+            f"{self.rows} ligne(s) créée(s) en {elapsed:.1f}s ({self.rows / elapsed * 60:,.0f} lignes/min)."
+        ))
+
+    def next_id(self, model):
+        return (model.objects.aggregate(last=Max('pk'))['last'] or 0) + 1
+
+    def write(self, model, objects):
+        """ Écrit un lot d'instances avec COPY (PostgreSQL) ou bulk_create, sans envoyer de signaux. """
+        if not objects:
+            return
+        if self.use_copy:
+            self.copy(model, objects)
+        else:
+            model.objects.bulk_create(objects, batch_size=1000)
+        self.rows += len(objects)
+
+    def copy(self, model, objects):
+        # Les tables de liaison n'ont pas d'ID attribué : la colonne est alors laissée à sa séquence
+        fields = [field for field in model._meta.concrete_fields if not (field.primary_key and objects[0].pk is None)]
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for obj in objects:
+            row = []
+            for field in fields:
+                # pre_save renseigne les champs auto_now_add, comme le ferait bulk_create
+                value = field.get_db_prep_save(field.pre_save(obj, True), connection)
+                row.append(r'\N' if value is None else value)
+            writer.writerow(row)
+        buffer.seek(0)
+
+        quote = connection.ops.quote_name
+        columns = ', '.join(quote(field.column) for field in fields)
+        with connection.cursor() as cursor:
+            cursor.cursor.copy_expert(
+                f"COPY {quote(model._meta.db_table)} ({columns}) FROM STDIN WITH (FORMAT csv, NULL '\\N')", buffer
+            )
+
+    def chunks(self, total):
+        """ Découpe [0, total) en lots de `chunk_size`, chacun écrit dans sa propre transaction. """
+        for offset in range(0, total, self.chunk_size):
+            with transaction.atomic():
+                yield range(offset, min(offset + self.chunk_size, total))
+
+    def seed_interests(self, prefix, count):
+        first_id = self.next_id(Interest)
+        self.write(Interest, [Interest(id=first_id + index, name=f'{prefix} intérêt {index}') for index in range(count)])
+        return list(range(first_id, first_id + count))
+
+    def seed_users(self, prefix, count, interest_ids):
+        """ Crée les comptes et leurs profils ; le signal create_profile n'est jamais déclenché. """
+        first_user_id, first_profile_id = self.next_id(User), self.next_id(Profile)
+        ProfileInterest = Profile.interests.through
+        rng = self.rng
+
+        for chunk in self.chunks(count):
+            users, profiles, profile_interests = [], [], []
+            for index in chunk:
+                user_id, profile_id = first_user_id + index, first_profile_id + index
+                users.append(User(id=user_id, email=f'{prefix}-{index}@planr.dev', password=self.password))
+
+                complete = rng.random() < 0.7  # Environ 30 % des comptes n'ont jamais complété leur profil
+                profiles.append(Profile(
+                    id=profile_id,
+                    user_id=user_id,
+                    first_name=f'Utilisateur {index}' if complete else None,
+                    birth_date=self.today - timedelta(days=int(rng.gauss(30, 9) * 365.25)) if complete else None,
+                    gender=rng.choice(Profile.GENDER_CHOICES)[0] if complete else None,
+                    is_profile_complete=complete,
+                ))
+                profile_interests.extend(
+                    ProfileInterest(profile_id=profile_id, interest_id=interest_id)
+                    for interest_id in rng.sample(interest_ids, min(rng.randint(0, 5), len(interest_ids)))
+                )
+            self.write(User, users)
+            self.write(Profile, profiles)
+            self.write(ProfileInterest, profile_interests)
+            self.stdout.write(f"Utilisateurs : {chunk.stop}/{count}")
+        return range(first_user_id, first_user_id + count)
+
+    def seed_events(self, count, user_ids, interest_ids, mean_registrations):
+        """ Crée les événements, leurs centres d'intérêt et leurs inscrits, dans la limite des places. """
+        first_id, registration_id = self.next_id(PrivateEvent), self.next_id(EventRegistration)
+        EventInterest = PrivateEvent.interests.through
+        EventParticipant = PrivateEvent.participants.through
+        rng = self.rng
+
+        for chunk in self.chunks(count):
+            events, event_interests, registrations, participants = [], [], [], []
+            for index in chunk:
+                event_id = first_id + index
+                name, latitude, longitude, _ = rng.choices(CITIES, weights=CITY_WEIGHTS)[0]
+                # Un an d'historique, six mois à venir, concentrés sur les prochaines semaines
+                day = self.today + timedelta(days=round(rng.triangular(-365, 180, 14)))
+                if rng.random() < 0.4:
+                    day += timedelta(days=5 - day.weekday() if day.weekday() < 5 else 0)  # Décalé au week-end
+                events.append(PrivateEvent(
+                    id=event_id,
+                    title=f'Événement {index}',
+                    description="Événement généré par seed_data",
+                    location=name,
+                    latitude=Decimal(f'{rng.gauss(latitude, 0.05):.6f}'),
+                    longitude=Decimal(f'{rng.gauss(longitude, 0.07):.6f}'),
+                    date=day,
+                    time=dt_time(rng.choices(HOURS, weights=HOUR_WEIGHTS)[0], rng.choice([0, 15, 30, 45])),
+                    max_participants=max(2, round(rng.lognormvariate(2.5, 0.6))),
+                    # Quelques organisateurs très actifs, une longue traîne d'occasionnels
+                    organizer_id=user_ids[int(len(user_ids) * rng.random() ** 3)],
+                    category=rng.choice(PrivateEvent.CATEGORY_CHOICES)[0],
+                ))
+                event_interests.extend(
+                    EventInterest(privateevent_id=event_id, interest_id=interest_id)
+                    for interest_id in rng.sample(interest_ids, min(rng.randint(1, 3), len(interest_ids)))
+                )
+
+                # Distribution exponentielle : la plupart des événements ont peu d'inscrits, quelques-uns sont complets
+                seats = round(rng.expovariate(1 / mean_registrations)) if mean_registrations else 0
+                for user_id in rng.sample(user_ids, min(seats, events[-1].max_participants, len(user_ids))):
+                    registrations.append(EventRegistration(id=registration_id, user_id=user_id, event_id=event_id))
+                    participants.append(EventParticipant(privateevent_id=event_id, user_id=user_id))
+                    registration_id += 1
+            self.write(PrivateEvent, events)
+            self.write(EventInterest, event_interests)
+            self.write(EventRegistration, registrations)
+            self.write(EventParticipant, participants)
+            self.stdout.write(f"Événements : {chunk.stop}/{count}")
@@ -1,7 +1,51 @@
-from django.db import models
+from django.db import IntegrityError, models, transaction
+from django.db.models import Count, F, Prefetch, Q, Window
+from django.db.models.functions import RowNumber
 from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.utils import timezone
 from PIL import Image
+from .utils import GEOHASH_PRECISION, encode_geohash, event_starts_at, iter_occurrence_dates
+
+
+class StartsAtField(models.DateTimeField):
+    """
+    Début de l'événement (timezone-aware), recalculé depuis `date` et `time` à chaque écriture.
+    pre_save est aussi appelé par bulk_create : la colonne ne peut pas diverger des champs d'origine.
+    """
+
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault('editable', False)
+        kwargs.setdefault('null', True)  # Lignes antérieures à la colonne : voir la commande backfill_event_columns
+        kwargs.setdefault('db_index', True)
+        super().__init__(*args, **kwargs)
+
+    def pre_save(self, model_instance, add):
+        opts = model_instance._meta
+        value = event_starts_at(
+            opts.get_field('date').to_python(model_instance.date),
+            opts.get_field('time').to_python(model_instance.time),
+        )
+        setattr(model_instance, self.attname, value)
+        return value
+
+
+class GeohashField(models.CharField):
+    """ Geohash de la position de l'événement, recalculé depuis `latitude` et `longitude` à chaque écriture. """
+
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault('max_length', GEOHASH_PRECISION)
+        kwargs.setdefault('editable', False)
+        kwargs.setdefault('null', True)  # Lignes antérieures à la colonne : voir la commande backfill_event_columns
+        super().__init__(*args, **kwargs)
+
+    def pre_save(self, model_instance, add):
+        latitude, longitude = model_instance.latitude, model_instance.longitude
+        value = None
+        if latitude is not None and longitude is not None:
+            value = encode_geohash(float(latitude), float(longitude))
+        setattr(model_instance, self.attname, value)
+        return value
 
 
 class EventBase(models.Model):
@@ -13,6 +57,7 @@ class EventBase(models.Model):
     longitude = models.DecimalField(max_digits=11, decimal_places=8, null=True, blank=True)
     date = models.DateField()
     time = models.TimeField()
+    starts_at = StartsAtField()  # Combinaison indexée de date et time, pour filtrer « pas encore commencé » en SQL
     max_participants = models.IntegerField()
     image = models.ImageField(upload_to='event_images/', null=True, blank=True)
 
@@ -39,33 +84,315 @@ class PrivateEvent(EventBase):
         ('FAM', 'Famille et Enfants'),
     ]
     
+    RECURRENCE_CHOICES = [
+        ('DAILY', 'Tous les jours'),
+        ('WEEKLY', 'Toutes les semaines'),
+        ('MONTHLY', 'Tous les mois'),
+    ]
+
     organizer = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='private_events')
     interests = models.ManyToManyField('authentication.Interest', related_name='private_events', blank=True)
     participants = models.ManyToManyField(get_user_model(), related_name='participating_private_events', blank=True)
     category = models.CharField(max_length=5, choices=CATEGORY_CHOICES)
+    recurrence_frequency = models.CharField(max_length=7, choices=RECURRENCE_CHOICES, null=True, blank=True)
+    recurrence_interval = models.PositiveSmallIntegerField(default=1)
+    recurrence_until = models.DateField(null=True, blank=True)  # Sans date de fin, la série est illimitée
+    geohash = GeohashField()  # Regroupement des événements sur la carte par préfixe
+    # Popularité récente : augmentée à chaque inscription ou ajout en wishlist, réduite périodiquement par decay_trending
+    trending = models.FloatField(default=0, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['date'], name='privateevent_date_idx'),
+            # varchar_pattern_ops : index utilisable par les recherches de préfixe (LIKE 'u09t%') sous PostgreSQL
+            models.Index(fields=['geohash'], name='privateevent_geohash_idx', opclasses=['varchar_pattern_ops']),
+            models.Index(fields=['-trending'], name='privateevent_trending_idx'),
+            # Index partiel : seules les séries récurrentes sont indexées sur leur date de fin
+            models.Index(fields=['recurrence_until'], condition=Q(recurrence_frequency__isnull=False), name='privateevent_series_until_idx'),
+        ]
 
     def __str__(self):
         return f"{self.title} (Privé) - {self.get_category_display()}"
 
+    @property
+    def is_recurring(self):
+        return bool(self.recurrence_frequency)
+
+    @classmethod
+    def started(cls, moment):
+        """
+        Condition des événements déjà commencés à `moment`.
+        Tant que starts_at n'est pas renseigné (lignes non traitées par backfill_event_columns), date et time font foi.
+        """
+        local = timezone.localtime(moment)
+        return Q(starts_at__lte=moment) | (
+            Q(starts_at__isnull=True) & (Q(date__lt=local.date()) | Q(date=local.date(), time__lte=local.time()))
+        )
+
+    @classmethod
+    def upcoming(cls, moment):
+        """ Condition des événements pas encore commencés à `moment` et des séries récurrentes encore en cours. """
+        local = timezone.localtime(moment)
+        return Q(starts_at__gt=moment) | (
+            Q(starts_at__isnull=True) & (Q(date__gt=local.date()) | Q(date=local.date(), time__gt=local.time()))
+        ) | (
+            Q(recurrence_frequency__isnull=False)
+            & (Q(recurrence_until__isnull=True) | Q(recurrence_until__gte=local.date()))
+        )
+
+    @classmethod
+    def participants_prefetch(cls):
+        """ Préchargement des participants et de leur profil, dans l'ordre de PrivateEventListProjection. """
+        return Prefetch('participants', queryset=get_user_model().objects.select_related('profile').order_by('pk'))
+
+    @classmethod
+    def bump_trending(cls, event_id, weight):
+        """
+        Ajoute `weight` au score de popularité en une requête (UPDATE ... SET trending = trending + weight),
+        sans relire l'événement ni recalculer le score depuis les inscriptions.
+        """
+        cls.objects.filter(pk=event_id).update(trending=F('trending') + weight)
+
+    @classmethod
+    def participant_previews(cls, event_ids, size):
+        """
+        Retourne {event_id: (nombre de participants, `size` premiers participants)} en une seule requête :
+        ROW_NUMBER() et COUNT(*) OVER (PARTITION BY événement), filtrés sur le rang.
+        """
+        partition = {'partition_by': F('privateevent_id')}
+        rows = (
+            cls.participants.through.objects
+            .filter(privateevent_id__in=event_ids)
+            .annotate(
+                rank=Window(RowNumber(), order_by=F('id').asc(), **partition),
+                total=Window(Count('id'), **partition),
+            )
+            .filter(rank__lte=size)
+            .order_by('privateevent_id', 'rank')
+            .values('privateevent_id', 'total', 'user_id', 'user__profile__first_name', 'user__profile__profile_picture')
+        )
+        previews = {}
+        for row in rows:
+            previews.setdefault(row['privateevent_id'], (row['total'], []))[1].append(row)
+        return previews
+
+    def occurrences(self, start, end):
+        """
+        Génère paresseusement les occurrences comprises entre `start` et `end` (inclus).
+        Seule la fenêtre demandée est parcourue, jamais la série complète.
+        """
+        if not self.is_recurring:
+            if start <= self.date <= end:
+                yield self.date
+            return
+
+        last = min(end, self.recurrence_until) if self.recurrence_until else end
+        yield from iter_occurrence_dates(self.date, self.recurrence_frequency, self.recurrence_interval, start, last)
+
+    def is_occurrence(self, day):
+        """ Vérifie que `day` est une occurrence de la série. """
+        return next(self.occurrences(day, day), None) is not None
+
+    def promote_from_waitlist(self):
+        """
+        Inscrit la personne en tête de la liste d'attente si une place est libre.
+        Le verrou sur l'événement, pris aussi par les inscriptions directes, sérialise le contrôle de la capacité :
+        deux annulations simultanées promeuvent deux personnes différentes et une inscription concurrente ne
+        peut pas faire dépasser max_participants. Les entrées verrouillées ailleurs (départ de la liste
+        d'attente en cours) sont ignorées (SKIP LOCKED), sans verrouiller les utilisateurs joints.
+        """
+        if self.is_recurring:
+            return None  # Les séries récurrentes n'ont pas de liste d'attente
+
+        with transaction.atomic():
+            PrivateEvent.objects.select_for_update().get(pk=self.pk)
+            if self.participants.count() >= self.max_participants:
+                return None
+
+            entry = (
+                self.waitlist_entries.select_for_update(skip_locked=True, of=('self',))
+                .select_related('user')
+                .order_by('position')
+                .first()
+            )
+            if entry is None:
+                return None
+
+            EventRegistration.objects.create(user=entry.user, event=self)
+            self.participants.add(entry.user)
+            record_registration(self.pk, entry.user_id)
+            entry.delete()
+            return entry.user
+
+
+class EventOccurrenceOverride(models.Model):
+    """ Modèle pour modifier ou annuler une occurrence d'une série récurrente """
+    event = models.ForeignKey(PrivateEvent, on_delete=models.CASCADE, related_name='occurrence_overrides')
+    occurrence_date = models.DateField()  # Date d'origine de l'occurrence dans la série
+    date = models.DateField(null=True, blank=True)
+    time = models.TimeField(null=True, blank=True)
+    max_participants = models.IntegerField(null=True, blank=True)
+    is_cancelled = models.BooleanField(default=False)
+
+    class Meta:
+        unique_together = ('event', 'occurrence_date')
+
+    def __str__(self):
+        return f"Occurrence du {self.occurrence_date} de {self.event}"
+
 
 class EventRegistration(models.Model):
     """ Modèle pour les inscriptions aux événements """
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     event = models.ForeignKey(PrivateEvent, on_delete=models.CASCADE)
+    occurrence_date = models.DateField(null=True, blank=True)  # Renseignée pour les séries récurrentes
     registered_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
-        unique_together = ('user', 'event')
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'event', 'occurrence_date'], name='unique_occurrence_registration'),
+            models.UniqueConstraint(fields=['user', 'event'], condition=Q(occurrence_date__isnull=True), name='unique_event_registration'),
+        ]
 
     def __str__(self):
         return f"{self.user} inscrit à {self.event}"
 
 
+class WaitlistEntry(models.Model):
+    """ Modèle pour la liste d'attente d'un événement complet """
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='waitlist_entries')
+    event = models.ForeignKey(PrivateEvent, on_delete=models.CASCADE, related_name='waitlist_entries')
+    position = models.PositiveBigIntegerField()
+    joined_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        # L'index (event, position) permet de lire la tête de file sans parcourir la liste
+        unique_together = [('user', 'event'), ('event', 'position')]
+        ordering = ['position']
+
+    def __str__(self):
+        return f"{self.user} en attente pour {self.event} (position {self.position})"
+
+
 class Wishlist(models.Model):
     """ Modèle pour les listes de souhaits """
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     event = models.ForeignKey('PrivateEvent', on_delete=models.CASCADE, related_name='wishlists')
+    created_at = models.DateTimeField(auto_now_add=True, null=True)  # Vide pour les ajouts antérieurs au champ
+
+    class Meta:
+        unique_together = ('user', 'event')
 
     def __str__(self):
         return f"Wishlist de {self.user} pour l'événement {self.event}"
 
+
+class EventDailyStats(models.Model):
+    """
+    Agrégats quotidiens d'un événement, tenus à jour à chaque action (voir record_registration et record_wishlist).
+    Les tableaux de bord organisateur ne lisent que cette table, jamais les inscriptions brutes.
+    À l'archivage de l'événement, les lignes sont rattachées à son archive (voir archive_past_events).
+    """
+    event = models.ForeignKey(PrivateEvent, on_delete=models.SET_NULL, null=True, related_name='daily_stats')
+    archived_event = models.ForeignKey(
+        'ArchivedPrivateEvent', on_delete=models.CASCADE, null=True, blank=True, related_name='daily_stats'
+    )
+    day = models.DateField()
+    registrations = models.IntegerField(default=0)
+    cancellations = models.IntegerField(default=0)
+    wishlist_adds = models.IntegerField(default=0)
+    wishlist_removals = models.IntegerField(default=0)
+    conversions = models.IntegerField(default=0)  # Inscriptions d'utilisateurs ayant l'événement en wishlist
+
+    class Meta:
+        unique_together = ('event', 'day')
+
+    def __str__(self):
+        return f"Statistiques de {self.event or self.archived_event} le {self.day}"
+
+    @classmethod
+    def record(cls, event_id, **increments):
+        """ Incrémente les compteurs du jour en une requête, en créant la ligne du jour au besoin. """
+        day = timezone.localdate()
+        updates = {field: F(field) + value for field, value in increments.items()}
+        if cls.objects.filter(event_id=event_id, day=day).update(**updates):
+            return
+        try:
+            with transaction.atomic():
+                cls.objects.create(event_id=event_id, day=day, **increments)
+        except IntegrityError:
+            # Ligne créée entre-temps par une requête concurrente
+            cls.objects.filter(event_id=event_id, day=day).update(**updates)
+
+
+def remaining_trending(weight, added_at):
+    """
+    Part encore présente dans le score d'un apport de `weight` fait à `added_at`. decay_trending ne réduit
+    le score que par intervalles entiers : l'apport a perdu au plus 0.5 ** (âge / demi-vie), et retirer
+    cette part ne fait jamais descendre le score sous son niveau d'avant l'apport.
+    Sans date (wishlist antérieure au champ created_at), l'apport n'est pas connu et rien n'est retiré.
+    """
+    if added_at is None:
+        return 0.0
+    age_hours = max((timezone.now() - added_at).total_seconds() / 3600, 0.0)
+    return weight * 0.5 ** (age_hours / settings.TRENDING_HALF_LIFE_HOURS)
+
+
+def record_registration(event_id, user_id, cancelled=False, registered_at=None):
+    """
+    Répercute une inscription (ou une désinscription) sur le score de popularité et les agrégats.
+    Une désinscription retire l'apport de l'inscription après décroissance (`registered_at`), pas son poids initial.
+    """
+    weight = settings.TRENDING_WEIGHTS['registration']
+    if cancelled:
+        PrivateEvent.bump_trending(event_id, -remaining_trending(weight, registered_at))
+        EventDailyStats.record(event_id, cancellations=1)
+        return
+    PrivateEvent.bump_trending(event_id, weight)
+    converted = Wishlist.objects.filter(user_id=user_id, event_id=event_id).exists()
+    EventDailyStats.record(event_id, registrations=1, conversions=int(converted))
+
+
+def record_wishlist(event_id, removed=False, added_at=None):
+    """ Répercute un ajout (ou un retrait, de l'ajout fait à `added_at`) en wishlist sur le score de popularité et les agrégats. """
+    weight = settings.TRENDING_WEIGHTS['wishlist']
+    PrivateEvent.bump_trending(event_id, -remaining_trending(weight, added_at) if removed else weight)
+    EventDailyStats.record(event_id, **{'wishlist_removals' if removed else 'wishlist_adds': 1})
+
+
+
+class ArchivedPrivateEvent(EventBase):
+    """ Archive des événements passés, sortis des tables chaudes par la commande archive_past_events """
+    original_id = models.BigIntegerField(unique=True)  # ID de l'événement d'origine
+    organizer = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='archived_private_events')
+    category = models.CharField(max_length=5, choices=PrivateEvent.CATEGORY_CHOICES)
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['organizer', '-date'], name='archivedevent_organizer_idx')]
+
+    def __str__(self):
+        return f"{self.title} (Archivé) - {self.get_category_display()}"
+
+
+class ArchivedEventRegistration(models.Model):
+    """ Archive des inscriptions aux événements passés """
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='archived_registrations')
+    event = models.ForeignKey(ArchivedPrivateEvent, on_delete=models.CASCADE, related_name='registrations')
+    occurrence_date = models.DateField(null=True, blank=True)
+    registered_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [models.Index(fields=['user', 'event'], name='archivedreg_user_event_idx')]
+
+    def __str__(self):
+        return f"{self.user} était inscrit à {self.event}"
+
+
+class ArchivedWishlist(models.Model):
+    """ Archive des listes de souhaits des événements passés """
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='archived_wishlists')
+    event = models.ForeignKey(ArchivedPrivateEvent, on_delete=models.CASCADE, related_name='wishlists')
+
+    def __str__(self):
+        return f"Wishlist archivée de {self.user} pour l'événement {self.event}"
@@ -1,19 +1,63 @@
 from rest_framework import serializers
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from .models import PrivateEvent, EventRegistration, Wishlist
+from django.core.files.storage import default_storage
+from django.db import models, transaction
+from django.db.models import Count, Max
+from django.utils import timezone
+from .models import PrivateEvent, ArchivedPrivateEvent, EventDailyStats, EventOccurrenceOverride, EventRegistration, WaitlistEntry, Wishlist
+from .utils import event_starts_at
 from planr_backend.utils import process_image
+from authentication.models import Profile
 from authentication.serializers import PublicProfileSerializer
+from planr_backend.metrics import CAPACITY_REJECTIONS
 from PIL import Image
-from datetime import datetime
 import io
+from datetime import timedelta
+from operator import itemgetter
+
+
+def profile_picture_url(request, name):
+    """ URL absolue d'une photo de profil à partir du nom de fichier stocké, sans charger le profil. """
+    url = default_storage.url(name) if name else '/default-avatar.png'
+    return request.build_absolute_uri(url) if request else url
+
+
+class ParticipantSerializer(serializers.Serializer):
+    """ Serializer compact pour un participant, à partir d'une ligne values() de la table des participants. """
+    id = serializers.IntegerField(source='user_id')
+    first_name = serializers.CharField(source='user__profile__first_name', allow_null=True)
+    profile_picture = serializers.SerializerMethodField()
+
+    def get_profile_picture(self, row):
+        return profile_picture_url(self.context.get('request'), row['user__profile__profile_picture'])
+
+
+class PrivateEventListSerializer(serializers.ListSerializer):
+    """ Précharge le nombre de participants et leur aperçu de toute la liste en une requête. """
+
+    def to_representation(self, data):
+        if self.child.participants_preview_requested() and 'participant_previews' not in self.context:
+            events = list(data.all() if isinstance(data, models.manager.BaseManager) else data)
+            self.context['participant_previews'] = PrivateEvent.participant_previews(
+                [event.id for event in events], settings.PARTICIPANT_PREVIEW_SIZE
+            )
+            data = events
+        return super().to_representation(data)
 
 
 class PrivateEventSerializer(serializers.ModelSerializer):
-    """ Serializer pour les événements privés. """
+    """
+    Serializer pour les événements privés.
+    Avec ?participants=preview, la liste complète des participants est remplacée par leur nombre et un aperçu ;
+    la liste complète est paginée sous private-events/{id}/participants/.
+    """
     organizer = PublicProfileSerializer(source='organizer.profile', read_only=True)
     category_display = serializers.CharField(source='get_category_display', read_only=True)
     category = serializers.CharField(write_only=True)
     participants = serializers.SerializerMethodField()
+    participants_count = serializers.SerializerMethodField()
+    participants_preview = serializers.SerializerMethodField()
     wishlist_count = serializers.SerializerMethodField()
     is_wishlisted = serializers.SerializerMethodField()
     is_registered = serializers.SerializerMethodField()
@@ -33,19 +77,55 @@ class PrivateEventSerializer(serializers.ModelSerializer):
             'image',
             'organizer',
             'participants',
+            'participants_count',
+            'participants_preview',
             'wishlist_count',
             'is_wishlisted',
             'is_registered',
             'category',
-            'category_display'
+            'category_display',
+            'recurrence_frequency',
+            'recurrence_interval',
+            'recurrence_until'
         ]
+        list_serializer_class = PrivateEventListSerializer
+
+    def participants_preview_requested(self):
+        request = self.context.get('request')
+        return request is not None and request.GET.get('participants') == 'preview'
+
+    def get_fields(self):
+        """ Expose soit la liste complète des participants, soit leur nombre et un aperçu. """
+        fields = super().get_fields()
+        hidden = ['participants'] if self.participants_preview_requested() else ['participants_count', 'participants_preview']
+        for name in hidden:
+            fields.pop(name)
+        return fields
+
+    def participant_preview(self, obj):
+        previews = self.context.get('participant_previews')  # Aperçus précalculés pour toute la liste
+        if previews is None:
+            previews = self.context['participant_previews'] = PrivateEvent.participant_previews([obj.id], settings.PARTICIPANT_PREVIEW_SIZE)
+        return previews.get(obj.id, (0, []))
+
+    def get_participants_count(self, obj):
+        return self.participant_preview(obj)[0]
+
+    def get_participants_preview(self, obj):
+        return ParticipantSerializer(self.participant_preview(obj)[1], many=True, context=self.context).data
     
     def get_wishlist_count(self, obj):
         """ Calcule le nombre de fois que cet événement a été ajouté à la wishlist. """
+        wishlist_counts = self.context.get('wishlist_counts')  # Compteurs précalculés pour toute la page
+        if wishlist_counts is not None:
+            return wishlist_counts.get(obj.id, 0)
         return Wishlist.objects.filter(event=obj).count()
 
     def get_is_wishlisted(self, obj):
         """ Vérifie si l'utilisateur actuel a ajouté cet événement à sa wishlist. """
+        wishlisted_ids = self.context.get('wishlisted_ids')
+        if wishlisted_ids is not None:
+            return obj.id in wishlisted_ids
         user = self.context['request'].user  # Récupère l'utilisateur courant
         if not user.is_authenticated:
             return False  # Si l'utilisateur n'est pas authentifié, retourne False
@@ -53,6 +133,9 @@ class PrivateEventSerializer(serializers.ModelSerializer):
 
     def get_is_registered(self, obj):
         """ Vérifie si l'utilisateur actuel est inscrit à cet événement. """
+        registered_ids = self.context.get('registered_ids')
+        if registered_ids is not None:
+            return obj.id in registered_ids
         user = self.context['request'].user  # Récupère l'utilisateur courant
         if not user.is_authenticated:
             return False  # Si l'utilisateur n'est pas authentifié, retourne False
@@ -78,6 +161,16 @@ class PrivateEventSerializer(serializers.ModelSerializer):
         
         return serialized_participants
 
+    def validate(self, data):
+        """ Valide la cohérence de la règle de récurrence. """
+        date = data.get('date', getattr(self.instance, 'date', None))
+        until = data.get('recurrence_until', getattr(self.instance, 'recurrence_until', None))
+        if data.get('recurrence_interval') == 0:
+            raise serializers.ValidationError("L'intervalle de récurrence doit être d'au moins 1.")
+        if until and date and until < date:
+            raise serializers.ValidationError("La fin de la récurrence doit être postérieure à la date de l'événement.")
+        return data
+
     def validate_image(self, image):
         """ Valide que le fichier est bien une image et limite la taille à 5 MB. """
         if not image.content_type.startswith('image/'):
@@ -94,12 +187,129 @@ class PrivateEventSerializer(serializers.ModelSerializer):
         return super().save(**kwargs)
 
 
+class PrivateEventListProjection:
+    """
+    Rendu en lecture seule d'une liste d'événements à partir de projections values() : ni instance de modèle,
+    ni serializer imbriqué par ligne. Les valeurs sont converties par des accesseurs préparés une fois pour
+    toute la liste, et les indicateurs (wishlist, inscription, participants) sont agrégés en une requête chacun.
+    La sortie est identique à PrivateEventSerializer(many=True), y compris avec ?participants=preview
+    (vérifié par la commande bench_event_list).
+    """
+    COLUMNS = [
+        'id', 'title', 'description', 'location', 'latitude', 'longitude', 'date', 'time', 'max_participants',
+        'image', 'category', 'recurrence_frequency', 'recurrence_interval', 'recurrence_until',
+        'organizer__profile__id', 'organizer__profile__first_name', 'organizer__profile__profile_picture',
+    ]
+
+    def __init__(self, queryset, request):
+        self.queryset = queryset
+        self.request = request
+        self.preview = request.GET.get('participants') == 'preview'
+
+    @property
+    def data(self):
+        rows = list(self.queryset.prefetch_related(None).values(*self.COLUMNS))
+        event_ids = [row['id'] for row in rows]
+        getters = self.getters(event_ids)
+        return [{key: getter(row) for key, getter in getters} for row in rows]
+
+    def getters(self, event_ids):
+        """ Accesseurs (clé, fonction) dans l'ordre des champs de PrivateEventSerializer. """
+        request = self.request
+        fields = PrivateEventSerializer(context={'request': request}).fields
+        image_storage = PrivateEvent._meta.get_field('image').storage
+        profile_storage = Profile._meta.get_field('profile_picture').storage
+        categories = dict(PrivateEvent.CATEGORY_CHOICES)
+
+        def column(name, convert=None):
+            # Comme Serializer.to_representation : une valeur nulle est rendue telle quelle
+            if convert is None:
+                return itemgetter(name)
+            return lambda row: None if row[name] is None else convert(row[name])
+
+        def image_url(storage):
+            # Comme ImageField(use_url=True) : nom vide -> None, sinon URL absolue
+            return lambda name: request.build_absolute_uri(storage.url(name)) if name else None
+
+        profile_image = image_url(profile_storage)
+        getters = [
+            ('id', column('id')),
+            ('title', column('title', str)),
+            ('description', column('description', str)),
+            ('location', column('location', str)),
+            ('latitude', column('latitude', fields['latitude'].to_representation)),
+            ('longitude', column('longitude', fields['longitude'].to_representation)),
+            ('date', column('date', lambda value: value.isoformat())),
+            ('time', column('time', lambda value: value.isoformat())),
+            ('max_participants', column('max_participants', int)),
+            ('image', column('image', image_url(image_storage))),
+            # Comme le serializer imbriqué : organisateur sans profil -> None
+            ('organizer', lambda row: None if row['organizer__profile__id'] is None else {
+                'first_name': row['organizer__profile__first_name'],
+                'profile_picture': profile_image(row['organizer__profile__profile_picture']),
+            }),
+        ]
+        getters.extend(self.participant_getters(event_ids))
+
+        wishlist_counts = dict(
+            Wishlist.objects.filter(event_id__in=event_ids).values('event_id').annotate(total=Count('id')).values_list('event_id', 'total')
+        )
+        user = request.user
+        wishlisted_ids = registered_ids = set()
+        if user.is_authenticated:
+            wishlisted_ids = set(Wishlist.objects.filter(user=user, event_id__in=event_ids).values_list('event_id', flat=True))
+            registered_ids = set(EventRegistration.objects.filter(user=user, event_id__in=event_ids).values_list('event_id', flat=True))
+
+        getters.extend([
+            ('wishlist_count', lambda row: wishlist_counts.get(row['id'], 0)),
+            ('is_wishlisted', lambda row: row['id'] in wishlisted_ids),
+            ('is_registered', lambda row: row['id'] in registered_ids),
+            ('category_display', lambda row: categories.get(row['category'], row['category'])),
+            ('recurrence_frequency', column('recurrence_frequency')),
+            ('recurrence_interval', column('recurrence_interval', int)),
+            ('recurrence_until', column('recurrence_until', lambda value: value.isoformat())),
+        ])
+        return getters
+
+    def participant_getters(self, event_ids):
+        request = self.request
+        if self.preview:
+            previews = PrivateEvent.participant_previews(event_ids, settings.PARTICIPANT_PREVIEW_SIZE)
+            return [
+                ('participants_count', lambda row: previews.get(row['id'], (0, []))[0]),
+                ('participants_preview', lambda row: [
+                    {
+                        'id': participant['user_id'],
+                        'first_name': participant['user__profile__first_name'],
+                        'profile_picture': profile_picture_url(request, participant['user__profile__profile_picture']),
+                    }
+                    for participant in previews.get(row['id'], (0, []))[1]
+                ]),
+            ]
+
+        # Même ordre que PrivateEvent.participants_prefetch(), utilisé par le serializer
+        participants = {}
+        rows = (
+            get_user_model().objects
+            .filter(participating_private_events__in=event_ids)
+            .order_by('pk')
+            .values_list('participating_private_events', 'profile__first_name', 'profile__profile_picture')
+        )
+        for event_id, first_name, picture in rows:
+            participants.setdefault(event_id, []).append({
+                'firstName': first_name,
+                'profilePicture': profile_picture_url(request, picture),
+            })
+        return [('participants', lambda row: participants.get(row['id'], []))]
+
+
 class EventRegistrationSerializer(serializers.ModelSerializer):
     event_id = serializers.IntegerField(write_only=True)  # ID de l'événement.
+    occurrence_date = serializers.DateField(required=False, allow_null=True)  # Occurrence choisie pour une série récurrente.
 
     class Meta:
         model = EventRegistration
-        fields = ['user', 'event_id', 'registered_at']
+        fields = ['user', 'event_id', 'occurrence_date', 'registered_at']
         read_only_fields = ['user', 'registered_at']
 
     def validate(self, data):
@@ -107,16 +317,42 @@ class EventRegistrationSerializer(serializers.ModelSerializer):
         event_id = data.get('event_id')
         user = self.context['request'].user
 
-        if EventRegistration.objects.filter(user=user, event_id=event_id).exists():
+        now = timezone.now()
+        # « Déjà commencé » est évalué en SQL sur starts_at (indexé), sans recombiner date et heure. Le verrou
+        # sur l'événement, tenu jusqu'à la création de l'inscription, l'empêche de croiser une promotion
+        # depuis la liste d'attente (PrivateEvent.promote_from_waitlist)
+        event = PrivateEvent.objects.select_for_update().annotate(has_started=PrivateEvent.started(now)).get(id=event_id)
+        if not event.is_recurring:
+            data['occurrence_date'] = None
+        occurrence_date = data.get('occurrence_date')
+
+        if EventRegistration.objects.filter(user=user, event_id=event_id, occurrence_date=occurrence_date).exists():
             raise serializers.ValidationError("Vous êtes déjà inscrit à cet événement.")
 
-        event = PrivateEvent.objects.get(id=event_id)
+        if event.is_recurring:
+            if not occurrence_date or not event.is_occurrence(occurrence_date):
+                raise serializers.ValidationError("Veuillez choisir une occurrence valide de cet événement récurrent.")
+
+            override = EventOccurrenceOverride.objects.filter(event=event, occurrence_date=occurrence_date).first()
+            if override and override.is_cancelled:
+                raise serializers.ValidationError("Cette occurrence de l'événement a été annulée.")
 
-        if event.participants.count() >= event.max_participants:
+            max_participants = override.max_participants if override and override.max_participants else event.max_participants
+            participants_count = EventRegistration.objects.filter(event=event, occurrence_date=occurrence_date).count()
+            has_started = event_starts_at(
+                override.date if override and override.date else occurrence_date,
+                override.time if override and override.time else event.time,
+            ) <= now
+        else:
+            max_participants = event.max_participants
+            participants_count = event.participants.count()
+            has_started = event.has_started
+
+        if participants_count >= max_participants:
+            CAPACITY_REJECTIONS.inc()
             raise serializers.ValidationError("L'événement a atteint le nombre maximum de participants.")
 
-        event_start = datetime.combine(event.date, event.time)
-        if event_start <= datetime.now():
+        if has_started:
             raise serializers.ValidationError("Il n'est plus possible de s'inscrire à cet événement car il a déjà commencé.")
 
         return data
@@ -128,13 +364,224 @@ class EventRegistrationSerializer(serializers.ModelSerializer):
         registration = EventRegistration.objects.create(
             user=user,
             event_id=event_id,
+            occurrence_date=validated_data.get('occurrence_date'),
         )
         return registration
 
 
+class OccurrenceWindowSerializer(serializers.Serializer):
+    """ Serializer pour la fenêtre de dates d'une vue calendrier. """
+    start = serializers.DateField()
+    end = serializers.DateField()
+
+    MAX_DAYS = 62
+
+    def validate(self, data):
+        """ Limite la fenêtre pour borner le nombre d'occurrences générées. """
+        if data['end'] < data['start']:
+            raise serializers.ValidationError("La fin de la période doit être postérieure à son début.")
+        if (data['end'] - data['start']).days > self.MAX_DAYS:
+            raise serializers.ValidationError(f"La période ne peut pas dépasser {self.MAX_DAYS} jours.")
+        return data
+
+
+class AnalyticsWindowSerializer(OccurrenceWindowSerializer):
+    """ Serializer pour la période d'un tableau de bord organisateur (30 derniers jours par défaut). """
+    start = serializers.DateField(required=False)
+    end = serializers.DateField(required=False)
+
+    MAX_DAYS = 366
+    DEFAULT_DAYS = 30
+
+    def validate(self, data):
+        data.setdefault('end', timezone.localdate())
+        data.setdefault('start', data['end'] - timedelta(days=self.DEFAULT_DAYS - 1))
+        return super().validate(data)
+
+
+class ClusterQuerySerializer(serializers.Serializer):
+    """ Serializer pour la zone visible d'une carte : bbox « ouest,sud,est,nord » et niveau de zoom. """
+    bbox = serializers.CharField()
+    zoom = serializers.IntegerField(min_value=0, max_value=20)
+
+    def validate_bbox(self, value):
+        try:
+            west, south, east, north = (float(part) for part in value.split(','))
+        except ValueError:
+            raise serializers.ValidationError("La zone doit être au format « ouest,sud,est,nord ».")
+        if not (-180 <= west < east <= 180 and -90 <= south < north <= 90):
+            raise serializers.ValidationError("La zone est invalide (l'antiméridien ne peut pas être traversé).")
+        return south, west, north, east
+
+
+class EventClusterSerializer(serializers.Serializer):
+    """ Serializer pour un groupe d'événements d'une cellule geohash. """
+    geohash = serializers.CharField()
+    count = serializers.IntegerField()
+    latitude = serializers.FloatField()
+    longitude = serializers.FloatField()
+    event_id = serializers.IntegerField(allow_null=True)  # Renseigné quand la cellule ne contient qu'un événement
+
+
+class EventDailyStatsSerializer(serializers.ModelSerializer):
+    """ Serializer pour les agrégats d'une journée d'un événement. """
+    class Meta:
+        model = EventDailyStats
+        fields = ['day', 'registrations', 'cancellations', 'wishlist_adds', 'wishlist_removals', 'conversions']
+
+
+class EventAnalyticsSerializer(serializers.Serializer):
+    """ Serializer pour les indicateurs d'un événement dans le tableau de bord organisateur. """
+    id = serializers.IntegerField()
+    title = serializers.CharField()
+    date = serializers.DateField()
+    max_participants = serializers.IntegerField()
+    registrations = serializers.IntegerField()
+    cancellations = serializers.IntegerField()
+    wishlist_adds = serializers.IntegerField()
+    wishlist_removals = serializers.IntegerField()
+    conversions = serializers.IntegerField()
+    fill_rate = serializers.FloatField(allow_null=True)  # Vide pour les séries récurrentes et les événements sans capacité
+    conversion_rate = serializers.FloatField(allow_null=True)
+    daily = EventDailyStatsSerializer(many=True)
+
+
+class EventOccurrenceSerializer(serializers.Serializer):
+    """ Serializer compact pour une occurrence d'événement dans une vue calendrier. """
+    id = serializers.IntegerField()
+    title = serializers.CharField()
+    location = serializers.CharField()
+    category = serializers.CharField()
+    occurrence_date = serializers.DateField()
+    date = serializers.DateField()
+    time = serializers.TimeField()
+    max_participants = serializers.IntegerField()
+    participants_count = serializers.IntegerField()
+
+
+class WaitlistEntrySerializer(serializers.ModelSerializer):
+    """ Serializer pour la liste d'attente d'un événement complet. """
+    event_id = serializers.IntegerField()
+
+    class Meta:
+        model = WaitlistEntry
+        fields = ['id', 'event_id', 'position', 'joined_at']
+        read_only_fields = ['id', 'position', 'joined_at']
+
+    def validate(self, data):
+        """ Valide que l'utilisateur peut rejoindre la liste d'attente de l'événement. """
+        event_id = data.get('event_id')
+        user = self.context['request'].user
+
+        event = PrivateEvent.objects.annotate(has_started=PrivateEvent.started(timezone.now())).filter(id=event_id).first()
+        if event is None:
+            raise serializers.ValidationError("Cet événement n'existe pas.")
+
+        if EventRegistration.objects.filter(user=user, event_id=event_id).exists():
+            raise serializers.ValidationError("Vous êtes déjà inscrit à cet événement.")
+
+        if event.is_recurring:
+            raise serializers.ValidationError("La liste d'attente n'est pas disponible pour les événements récurrents.")
+
+        if WaitlistEntry.objects.filter(user=user, event_id=event_id).exists():
+            raise serializers.ValidationError("Vous êtes déjà sur la liste d'attente de cet événement.")
+
+        if event.participants.count() < event.max_participants:
+            raise serializers.ValidationError("Des places sont disponibles, inscrivez-vous directement à l'événement.")
+
+        if event.has_started:
+            raise serializers.ValidationError("Il n'est plus possible de rejoindre la liste d'attente car l'événement a déjà commencé.")
+
+        return data
+
+    def create(self, validated_data):
+        """ Ajoute l'utilisateur en fin de liste d'attente. """
+        event_id = validated_data.pop('event_id')
+        user = self.context['request'].user
+        with transaction.atomic():
+            # Le verrou sur l'événement sérialise l'attribution des positions
+            PrivateEvent.objects.select_for_update().filter(id=event_id).first()
+            # validate() a lu sans verrou : une inscription simultanée du même utilisateur a pu passer entre-temps
+            if WaitlistEntry.objects.filter(user=user, event_id=event_id).exists():
+                raise serializers.ValidationError("Vous êtes déjà sur la liste d'attente de cet événement.")
+            last_position = WaitlistEntry.objects.filter(event_id=event_id).aggregate(last=Max('position'))['last']
+            return WaitlistEntry.objects.create(
+                user=user,
+                event_id=event_id,
+                position=(last_position or 0) + 1,
+            )
+
 
 class WishlistSerializer(serializers.ModelSerializer):
     """ Serializer pour la wishlist des événements privés. """
     class Meta:
         model = Wishlist
         fields = ['user', 'event']
+
+
+class BatchOperationSerializer(serializers.Serializer):
+    """ Serializer pour une opération d'un lot : ajout/retrait en wishlist ou (dés)inscription. """
+    WISHLIST_OPERATIONS = ['wishlist_add', 'wishlist_remove', 'wishlist_toggle']
+    REGISTRATION_OPERATIONS = ['register', 'unregister']
+
+    op = serializers.ChoiceField(choices=WISHLIST_OPERATIONS + REGISTRATION_OPERATIONS)
+    event_id = serializers.IntegerField()
+    occurrence_date = serializers.DateField(required=False, allow_null=True)  # Séries récurrentes uniquement
+    idempotency_key = serializers.CharField(max_length=64, required=False)  # Rejouer la clé renvoie le résultat enregistré
+
+    def validate_idempotency_key(self, value):
+        if not settings.BATCH_IDEMPOTENCY_KEYS:
+            raise serializers.ValidationError("Les clés d'idempotence nécessitent un cache partagé entre les workers.")
+        return value
+
+
+class BatchMutationSerializer(serializers.Serializer):
+    """ Serializer pour un lot d'opérations exécutées dans une seule transaction. """
+    operations = BatchOperationSerializer(many=True, allow_empty=False, max_length=settings.BATCH_MAX_OPERATIONS)
+
+    def validate_operations(self, operations):
+        """ Une opération au plus par cible : le lot s'applique alors ensemble, sans dépendre de l'ordre. """
+        targets, keys = set(), set()
+        for operation in operations:
+            is_wishlist = operation['op'] in BatchOperationSerializer.WISHLIST_OPERATIONS
+            target = ('wishlist', operation['event_id']) if is_wishlist else ('registration', operation['event_id'], operation.get('occurrence_date'))
+            if target in targets:
+                raise serializers.ValidationError(f"Plusieurs opérations portent sur l'événement {operation['event_id']}.")
+            targets.add(target)
+
+            key = operation.get('idempotency_key')
+            if key and key in keys:
+                raise serializers.ValidationError(f"La clé d'idempotence « {key} » est utilisée plusieurs fois.")
+            keys.add(key)
+        return operations
+
+
+class ArchivedPrivateEventSerializer(serializers.ModelSerializer):
+    """ Serializer en lecture seule pour l'historique des événements archivés. """
+    organizer = PublicProfileSerializer(source='organizer.profile', read_only=True)
+    category_display = serializers.CharField(source='get_category_display', read_only=True)
+    participants_count = serializers.IntegerField(read_only=True)
+    was_registered = serializers.BooleanField(read_only=True)
+
+    class Meta:
+        model = ArchivedPrivateEvent
+        fields = [
+            'id',
+            'original_id',
+            'title',
+            'description',
+            'location',
+            'latitude',
+            'longitude',
+            'date',
+            'time',
+            'max_participants',
+            'image',
+            'organizer',
+            'participants_count',
+            'was_registered',
+            'category',
+            'category_display',
+            'archived_at'
+        ]
+        read_only_fields = fields
@@ -1,3 +1,942 @@
-from django.test import TestCase
+import tempfile
+import threading
+from datetime import date, time, timedelta
+from io import StringIO
+from unittest import mock, skipIf
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management import call_command
+from django.db import DEFAULT_DB_ALIAS, connection, connections, transaction
+from django.db.backends.signals import connection_created
+from django.db.models import Sum
+from django.test import AsyncClient, RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings, skipUnlessDBFeature
+from django.utils import timezone
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.exceptions import ValidationError
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+
+from authentication.models import Profile, User
+from authentication.tokens import PlanrRefreshToken
+from .models import ArchivedPrivateEvent, EventDailyStats, EventOccurrenceOverride, EventRegistration, PrivateEvent, WaitlistEntry, Wishlist
+from .models import record_registration, record_wishlist
+from .utils import GEOHASH_ALPHABET, GEOHASH_PRECISION, ZOOM_GEOHASH_PRECISION, add_months, encode_geohash, expand_occurrences, iter_occurrence_dates
+from .utils import geohash_bounds, geohash_cell_size, geohash_cover
+from .serializers import EventRegistrationSerializer, PrivateEventListProjection, PrivateEventSerializer, WaitlistEntrySerializer
+from .views import BatchMutationView, PrivateEventViewSet
+from planr_backend.db_routers import REPLICA_DB_ALIAS, pin_primary, read_from_replica
+from planr_backend.middleware import ReplicaRoutingMiddleware
+from planr_backend.renderers import CamelCaseJSONRenderer
+
+
+def create_event(organizer, days=1, **fields):
+    """ Événement à `days` jours d'aujourd'hui, à 18h30. """
+    return PrivateEvent.objects.create(**{
+        'title': 'Événement',
+        'description': 'Description',
+        'location': 'Paris',
+        'date': timezone.localdate() + timedelta(days=days),
+        'time': time(18, 30),
+        'max_participants': 4,
+        'organizer': organizer,
+        'category': 'SPORT',
+        **fields,
+    })
+
+
+def register(event, user):
+    EventRegistration.objects.create(event=event, user=user)
+    event.participants.add(user)
+
+
+def authenticated_client(user):
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f'Bearer {PlanrRefreshToken.for_user(user).access_token}')
+    return client
+
+
+class UpcomingEventsTests(TestCase):
+
+    def setUp(self):
+        self.organizer = User.objects.create_user(email='organizer@planr.dev')
+        self.user = User.objects.create_user(email='user@planr.dev')
+        self.client = authenticated_client(self.user)
+
+    def test_running_series_is_upcoming(self):
+        series = create_event(self.organizer, days=-7, recurrence_frequency='WEEKLY')
+        past = create_event(self.organizer, days=-7)
+        series.participants.add(self.user)
+        past.participants.add(self.user)
+
+        for path in ['/my-upcoming-events/', '/async/my-upcoming-events/']:
+            response = self.client.get(path)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual([event['id'] for event in response.json()], [series.id])
+
+    def test_started_event_without_starts_at_refuses_registrations(self):
+        event = create_event(self.organizer, days=-1)
+        PrivateEvent.objects.filter(pk=event.pk).update(starts_at=None)  # Ligne pas encore traitée par le backfill
+
+        response = self.client.post('/registrations/', {'eventId': event.id}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(EventRegistration.objects.filter(event=event).exists())
+
+    def test_upcoming_event_without_starts_at_is_listed(self):
+        event = create_event(self.organizer, days=2)
+        PrivateEvent.objects.filter(pk=event.pk).update(starts_at=None)
+        event.participants.add(self.user)
+
+        response = self.client.get('/my-upcoming-events/')
+        self.assertEqual([row['id'] for row in response.json()], [event.id])
+
+
+class OccurrenceDatesTests(SimpleTestCase):
+
+    def dates(self, first, frequency, interval, start, end):
+        return list(iter_occurrence_dates(first, frequency, interval, start, end))
+
+    def test_add_months_keeps_day_of_month(self):
+        self.assertEqual(add_months(date(2024, 11, 15), 3), date(2025, 2, 15))
+        self.assertEqual(add_months(date(2024, 1, 31), 2), date(2024, 3, 31))
+        self.assertEqual(add_months(date(2024, 2, 29), 48), date(2028, 2, 29))
+
+    def test_add_months_skips_missing_days(self):
+        self.assertIsNone(add_months(date(2024, 1, 31), 1))
+        self.assertIsNone(add_months(date(2024, 2, 29), 12))
+
+    def test_interval_steps_from_first_occurrence(self):
+        self.assertEqual(
+            self.dates(date(2024, 1, 1), 'DAILY', 3, date(2024, 1, 5), date(2024, 1, 15)),
+            [date(2024, 1, 7), date(2024, 1, 10), date(2024, 1, 13)],
+        )
+        self.assertEqual(
+            self.dates(date(2024, 1, 1), 'WEEKLY', 2, date(2023, 12, 1), date(2024, 2, 5)),
+            [date(2024, 1, 1), date(2024, 1, 15), date(2024, 1, 29)],
+        )
+
+    def test_monthly_series_skips_short_months(self):
+        self.assertEqual(
+            self.dates(date(2024, 1, 31), 'MONTHLY', 1, date(2024, 1, 1), date(2024, 8, 31)),
+            [date(2024, 1, 31), date(2024, 3, 31), date(2024, 5, 31), date(2024, 7, 31), date(2024, 8, 31)],
+        )
+        self.assertEqual(
+            self.dates(date(2024, 1, 31), 'MONTHLY', 2, date(2024, 4, 1), date(2024, 12, 31)),
+            [date(2024, 5, 31), date(2024, 7, 31)],  # Septembre et novembre n'ont pas de 31
+        )
+
+    def test_window_without_occurrence_is_empty(self):
+        self.assertEqual(self.dates(date(2024, 1, 31), 'MONTHLY', 1, date(2024, 2, 1), date(2024, 2, 29)), [])
+        self.assertEqual(self.dates(date(2024, 3, 1), 'DAILY', 1, date(2024, 1, 1), date(2024, 2, 29)), [])
+
+
+class OccurrencesTests(TestCase):
+
+    def setUp(self):
+        self.organizer = User.objects.create_user(email='organizer@planr.dev')
+        self.user = User.objects.create_user(email='user@planr.dev')
+        self.series = create_event(
+            self.organizer, date=date(2030, 1, 7), recurrence_frequency='WEEKLY', recurrence_until=date(2030, 1, 28),
+        )
+
+    def test_series_stops_at_recurrence_until(self):
+        self.assertEqual(
+            list(self.series.occurrences(date(2030, 1, 1), date(2030, 3, 1))),
+            [date(2030, 1, 7), date(2030, 1, 14), date(2030, 1, 21), date(2030, 1, 28)],
+        )
+        self.assertFalse(self.series.is_occurrence(date(2030, 2, 4)))
+
+    def test_overrides_are_applied_and_cancelled_occurrences_hidden(self):
+        moved = EventOccurrenceOverride.objects.create(event=self.series, occurrence_date=date(2030, 1, 14), date=date(2030, 1, 15))
+        EventOccurrenceOverride.objects.create(event=self.series, occurrence_date=date(2030, 1, 21), is_cancelled=True)
+        events = PrivateEvent.objects.prefetch_related('occurrence_overrides')
+
+        self.assertEqual(
+            [(day, override) for _, day, override in expand_occurrences(events, date(2030, 1, 1), date(2030, 1, 31))],
+            [(date(2030, 1, 7), None), (date(2030, 1, 14), moved), (date(2030, 1, 28), None)],
+        )
+
+    def test_occurrences_action(self):
+        single = create_event(self.organizer, date=date(2030, 1, 10), title='Ponctuel')
+        create_event(self.organizer, date=date(2030, 3, 1))  # Hors de la fenêtre
+        EventOccurrenceOverride.objects.create(
+            event=self.series, occurrence_date=date(2030, 1, 14), date=date(2030, 1, 15), time=time(9, 0), max_participants=8,
+        )
+        EventOccurrenceOverride.objects.create(event=self.series, occurrence_date=date(2030, 1, 21), is_cancelled=True)
+        EventRegistration.objects.create(event=self.series, user=self.user, occurrence_date=date(2030, 1, 14))
+        register(single, self.user)
+
+        response = authenticated_client(self.user).get('/private-events/occurrences/?start=2030-01-01&end=2030-01-31')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [(row['id'], row['occurrenceDate'], row['date'], row['time'], row['maxParticipants'], row['participantsCount']) for row in response.json()],
+            [
+                (self.series.id, '2030-01-07', '2030-01-07', '18:30:00', 4, 0),
+                (single.id, '2030-01-10', '2030-01-10', '18:30:00', 4, 1),
+                (self.series.id, '2030-01-14', '2030-01-15', '09:00:00', 8, 1),
+                (self.series.id, '2030-01-28', '2030-01-28', '18:30:00', 4, 0),
+            ],
+        )
+
+    def test_occurrences_window_is_bounded(self):
+        response = authenticated_client(self.user).get('/private-events/occurrences/?start=2030-01-01&end=2030-06-01')
+        self.assertEqual(response.status_code, 400)
+
+
+class GeohashTests(SimpleTestCase):
+
+    def test_known_vectors(self):
+        self.assertEqual(encode_geohash(42.6, -5.6, 5), 'ezs42')
+        self.assertEqual(encode_geohash(57.64911, 10.40744, 11), 'u4pruydqqvj')
+        self.assertEqual(len(encode_geohash(48.8566, 2.3522)), GEOHASH_PRECISION)
+
+    def test_bounds_contain_encoded_position(self):
+        self.assertEqual(geohash_bounds('ezs42'), (42.5830078125, -5.625, 42.626953125, -5.5810546875))
+        for geohash in ['ezs42', 'u4pruydqqvj', 's', 'u09tv']:
+            south, west, north, east = geohash_bounds(geohash)
+            self.assertEqual((north - south, east - west), geohash_cell_size(len(geohash)))
+            self.assertEqual(encode_geohash((south + north) / 2, (west + east) / 2, len(geohash)), geohash)
+
+    def test_cover_at_cell_boundary(self):
+        # L'origine est le coin commun de quatre cellules de précision 1
+        self.assertEqual(geohash_cover(-1, -1, 1, 1, 1), {'7', 'k', 'e', 's'})
+        # Un bord appartient à la cellule qui commence sur ce bord
+        self.assertEqual(geohash_cover(0, 0, 1, 1, 1), {'s'})
+
+    def test_cover_contains_every_overlapping_cell(self):
+        south, west, north, east = 40.3, -10.7, 52.1, 8.2
+        cells = {first + second for first in GEOHASH_ALPHABET for second in GEOHASH_ALPHABET}
+        overlapping = set()
+        for cell in cells:
+            cell_south, cell_west, cell_north, cell_east = geohash_bounds(cell)
+            if cell_south < north and cell_north > south and cell_west < east and cell_east > west:
+                overlapping.add(cell)
+        self.assertEqual(geohash_cover(south, west, north, east, 2), overlapping)
+
+    def test_zoom_precision_gives_cells_of_32_to_128_pixels(self):
+        self.assertEqual(len(ZOOM_GEOHASH_PRECISION), 21)
+        self.assertEqual(ZOOM_GEOHASH_PRECISION[-1], GEOHASH_PRECISION)
+        for zoom, precision in enumerate(ZOOM_GEOHASH_PRECISION):
+            degrees_per_pixel = 360 / 2 ** zoom / 256  # Tuiles de carte de 256 px
+            with self.subTest(zoom=zoom):
+                for size in geohash_cell_size(precision):
+                    self.assertTrue(32 <= size / degrees_per_pixel <= 128)
+
+
+class EventClusterTests(TestCase):
+    path = '/private-events/clusters/?bbox=2.2,48.8,2.5,48.9&zoom=12'
+
+    def setUp(self):
+        cache.clear()
+        self.organizer = User.objects.create_user(email='organizer@planr.dev')
+        self.client = authenticated_client(self.organizer)
+        create_event(self.organizer, latitude='48.8566', longitude='2.3522')
+        create_event(self.organizer, latitude='48.8570', longitude='2.3530')
+        self.isolated = create_event(self.organizer, latitude='48.8900', longitude='2.2500')
+        create_event(self.organizer, latitude='45.7600', longitude='4.8300')  # Lyon, hors de la zone
+        create_event(self.organizer, days=-2, latitude='48.8566', longitude='2.3522')  # Passé
+
+    def test_clusters_are_grouped_by_cell(self):
+        response = self.client.get(self.path)
+        self.assertEqual(response.status_code, 200)
+        grouped, isolated = response.json()
+
+        self.assertEqual(grouped['geohash'], encode_geohash(48.8566, 2.3522, ZOOM_GEOHASH_PRECISION[12]))
+        self.assertEqual((grouped['count'], grouped['eventId']), (2, None))
+        self.assertEqual((grouped['latitude'], grouped['longitude']), (48.8568, 2.3526))
+        self.assertEqual((isolated['count'], isolated['eventId']), (1, self.isolated.id))
+
+    def test_tiles_are_cached(self):
+        self.client.get(self.path)
+        tile = encode_geohash(48.8566, 2.3522, 4)  # Zone de 0,3° : tuiles de précision 4 sous MAX_CLUSTER_TILES
+        self.assertEqual([cluster['count'] for cluster in cache.get(f'event-clusters:5:{tile}')], [2])
+
+        create_event(self.organizer, latitude='48.8567', longitude='2.3523')
+        self.assertEqual(self.client.get(self.path).json()[0]['count'], 2)
+        cache.clear()
+        self.assertEqual(self.client.get(self.path).json()[0]['count'], 3)
+
+    def test_invalid_bbox_is_rejected(self):
+        response = self.client.get('/private-events/clusters/?bbox=170,10,-170,20&zoom=3')
+        self.assertEqual(response.status_code, 400)
+
+
+@override_settings(PARTICIPANT_PREVIEW_SIZE=5)
+class ParticipantsTests(TestCase):
+
+    def setUp(self):
+        organizer = User.objects.create_user(email='organizer@planr.dev')
+        self.event = create_event(organizer, max_participants=20)
+        self.participants = [User.objects.create_user(email=f'participant-{index}@planr.dev') for index in range(12)]
+        for user in self.participants:
+            register(self.event, user)
+        self.client = authenticated_client(organizer)
+
+    def pages(self, path):
+        """ Suit les liens `next` et retourne les identifiants de chaque page. """
+        pages = []
+        while path:
+            body = self.client.get(path).json()
+            pages.append([participant['id'] for participant in body['results']])
+            path = body['next']
+        return pages
+
+    def test_participants_are_paginated_by_cursor(self):
+        pages = self.pages(f'/private-events/{self.event.id}/participants/?page_size=5')
+
+        self.assertEqual([len(page) for page in pages], [5, 5, 2])
+        self.assertEqual(sum(pages, []), [user.id for user in self.participants])
+
+    def test_cursor_is_stable_under_registrations(self):
+        first = self.client.get(f'/private-events/{self.event.id}/participants/?page_size=5').json()
+        # Entre deux pages : un désistement sur la première page et deux nouvelles inscriptions
+        self.event.participants.remove(self.participants[0])
+        newcomers = [User.objects.create_user(email=f'newcomer-{index}@planr.dev') for index in range(2)]
+        for user in newcomers:
+            register(self.event, user)
+
+        rest = sum(self.pages(first['next']), [])
+        self.assertEqual(rest, [user.id for user in self.participants[5:] + newcomers])
+
+    def test_preview_truncates_participants(self):
+        response = self.client.get(f'/private-events/{self.event.id}/?participants=preview')
+        body = response.json()
+
+        self.assertNotIn('participants', body)
+        self.assertEqual(body['participantsCount'], 12)
+        self.assertEqual([participant['id'] for participant in body['participantsPreview']], [user.id for user in self.participants[:5]])
+
+    def test_preview_counts_every_event_of_list(self):
+        other = create_event(self.event.organizer, days=2)
+        register(other, self.participants[0])
+        empty = create_event(self.event.organizer, days=3)
+
+        rows = {row['id']: row for row in self.client.get('/private-events/?participants=preview').json()}
+        self.assertEqual(
+            {event_id: (row['participantsCount'], len(row['participantsPreview'])) for event_id, row in rows.items()},
+            {self.event.id: (12, 5), other.id: (1, 1), empty.id: (0, 0)},
+        )
+
+    def test_full_list_without_preview(self):
+        body = self.client.get(f'/private-events/{self.event.id}/').json()
+
+        self.assertNotIn('participantsCount', body)
+        self.assertEqual(len(body['participants']), 12)
+
+
+@override_settings(BATCH_IDEMPOTENCY_KEYS=True)
+class BatchMutationTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.organizer = User.objects.create_user(email='organizer@planr.dev')
+        self.user = User.objects.create_user(email='user@planr.dev')
+        self.client = authenticated_client(self.user)
+        self.event = create_event(self.organizer)
+
+    def batch(self, *operations):
+        with self.captureOnCommitCallbacks(execute=True):  # Résultats mémorisés à la validation
+            response = self.client.post('/batch/', {'operations': list(operations)}, format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()['results']
+
+    def stats(self, field):
+        return EventDailyStats.objects.filter(event=self.event).aggregate(total=Sum(field))['total'] or 0
+
+    def test_replayed_toggle_is_not_reapplied(self):
+        operation = {'op': 'wishlist_toggle', 'eventId': self.event.id, 'idempotencyKey': 'toggle-1'}
+        first, = self.batch(operation)
+        replay, = self.batch(operation)
+
+        self.assertEqual((first['status'], first['replayed']), ('added', False))
+        self.assertEqual((replay['status'], replay['replayed']), ('added', True))
+        self.assertTrue(Wishlist.objects.filter(user=self.user, event=self.event).exists())
+        self.assertEqual(self.stats('wishlist_adds'), 1)
+
+    def test_operation_in_progress_elsewhere_is_not_applied(self):
+        cache.set(f'batch-op:{self.user.pk}:toggle-1', BatchMutationView.IN_PROGRESS)
+        result, = self.batch({'op': 'wishlist_toggle', 'eventId': self.event.id, 'idempotencyKey': 'toggle-1'})
+
+        self.assertEqual(result['status'], 'in_progress')
+        self.assertFalse(Wishlist.objects.filter(user=self.user, event=self.event).exists())
+
+    def test_invalid_operation_releases_its_key(self):
+        result, = self.batch({'op': 'register', 'eventId': 0, 'idempotencyKey': 'register-1'})
+
+        self.assertEqual(result['status'], 'invalid')
+        self.assertIsNone(cache.get(f'batch-op:{self.user.pk}:register-1'))
+
+    @override_settings(BATCH_IDEMPOTENCY_KEYS=False)
+    def test_keys_refused_without_shared_cache(self):
+        response = self.client.post('/batch/', {'operations': [
+            {'op': 'wishlist_add', 'eventId': self.event.id, 'idempotencyKey': 'add-1'},
+        ]}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_existing_wishlist_row_is_not_counted(self):
+        Wishlist.objects.create(user=self.user, event=self.event)
+        result, = self.batch({'op': 'wishlist_add', 'eventId': self.event.id})
+
+        self.assertEqual(result['status'], 'unchanged')
+        self.assertEqual(self.stats('wishlist_adds'), 0)
+
+    def test_rows_skipped_by_insert_are_not_counted(self):
+        # Lignes ignorées par INSERT ... ON CONFLICT DO NOTHING, comme si une autre requête les avait créées
+        with mock.patch.object(Wishlist.objects, 'bulk_create', return_value=[]), \
+                mock.patch.object(EventRegistration.objects, 'bulk_create', return_value=[]):
+            results = self.batch(
+                {'op': 'wishlist_add', 'eventId': self.event.id},
+                {'op': 'register', 'eventId': self.event.id},
+            )
+
+        self.assertEqual([result['status'] for result in results], ['unchanged', 'unchanged'])
+        self.assertEqual((self.stats('wishlist_adds'), self.stats('registrations')), (0, 0))
+        self.assertFalse(self.event.participants.filter(pk=self.user.pk).exists())
+
+    def test_registration_is_recorded_once(self):
+        result, = self.batch({'op': 'register', 'eventId': self.event.id})
+
+        self.assertEqual(result['status'], 'registered')
+        self.assertEqual(self.stats('registrations'), 1)
+        self.assertTrue(self.event.participants.filter(pk=self.user.pk).exists())
+
+
+
+
+@override_settings(TRENDING_WEIGHTS={'registration': 3.0, 'wishlist': 1.0}, TRENDING_HALF_LIFE_HOURS=24)
+class TrendingScoreTests(TestCase):
+    """ Le score reste la somme décroissante des apports : un retrait ne soustrait que la part restante du sien. """
+
+    def setUp(self):
+        self.event = create_event(User.objects.create_user(email='organizer@planr.dev'))
+        self.user = User.objects.create_user(email='user@planr.dev')
+
+    def trending(self):
+        return PrivateEvent.objects.values_list('trending', flat=True).get(pk=self.event.pk)
+
+    def decay(self, hours):
+        call_command('decay_trending', elapsed_hours=hours, stdout=StringIO())
+
+    def test_decay_halves_score_each_half_life(self):
+        PrivateEvent.bump_trending(self.event.pk, 4.0)
+        self.decay(24)
+        self.assertAlmostEqual(self.trending(), 2.0)
+        self.decay(12)
+        self.assertAlmostEqual(self.trending(), 2.0 * 0.5 ** 0.5)
+
+    def test_negligible_score_is_reset(self):
+        PrivateEvent.bump_trending(self.event.pk, 0.005)
+        self.decay(1)
+        self.assertEqual(self.trending(), 0.0)
+
+    def test_immediate_cancellation_removes_full_weight(self):
+        record_registration(self.event.pk, self.user.pk)
+        record_registration(self.event.pk, self.user.pk, cancelled=True, registered_at=timezone.now())
+        self.assertAlmostEqual(self.trending(), 0.0, places=6)
+
+    def test_cancellation_after_decay_removes_decayed_contribution(self):
+        record_wishlist(self.event.pk)  # Apport d'un autre utilisateur, conservé
+        record_registration(self.event.pk, self.user.pk)
+        self.decay(24)
+        self.assertAlmostEqual(self.trending(), 2.0)
+
+        registered_at = timezone.now() - timedelta(hours=24)
+        record_registration(self.event.pk, self.user.pk, cancelled=True, registered_at=registered_at)
+        self.assertAlmostEqual(self.trending(), 0.5, places=3)
+
+    def test_removal_of_undated_wishlist_subtracts_nothing(self):
+        PrivateEvent.bump_trending(self.event.pk, 2.0)
+        record_wishlist(self.event.pk, removed=True, added_at=None)
+        self.assertEqual(self.trending(), 2.0)
+
+    def test_toggle_off_uses_wishlist_age(self):
+        client = authenticated_client(self.user)
+        client.post('/wishlist/toggle/', {'eventId': self.event.pk}, format='json')
+        Wishlist.objects.update(created_at=timezone.now() - timedelta(hours=48))
+        self.decay(24)
+        self.decay(24)
+        self.assertAlmostEqual(self.trending(), 0.25)
+
+        response = client.post('/wishlist/toggle/', {'eventId': self.event.pk}, format='json')
+        self.assertEqual(response.status_code, 204)
+        self.assertAlmostEqual(self.trending(), 0.0, places=3)
+
+
+class ArchiveDailyStatsTests(TestCase):
+
+    def test_archiving_keeps_daily_stats(self):
+        organizer = User.objects.create_user(email='organizer@planr.dev')
+        event = create_event(organizer, days=-3)
+        EventDailyStats.record(event.id, registrations=2, wishlist_adds=1)
+
+        call_command('archive_past_events', stdout=StringIO())
+
+        self.assertFalse(PrivateEvent.objects.filter(pk=event.pk).exists())
+        stats = EventDailyStats.objects.get()
+        self.assertIsNone(stats.event_id)
+        self.assertEqual(stats.archived_event, ArchivedPrivateEvent.objects.get(original_id=event.pk))
+        self.assertEqual((stats.registrations, stats.wishlist_adds), (2, 1))
+
+
+class EventAnalyticsTests(TestCase):
+
+    def setUp(self):
+        self.organizer = User.objects.create_user(email='organizer@planr.dev')
+        self.client = authenticated_client(self.organizer)
+
+    def add_stats(self, event, days_ago, **counters):
+        EventDailyStats.objects.create(event=event, day=timezone.localdate() - timedelta(days=days_ago), **counters)
+
+    def analytics(self, **params):
+        response = self.client.get('/private-events/my-events/analytics/', params)
+        self.assertEqual(response.status_code, 200)
+        return {row['id']: row for row in response.json()['events']}
+
+    def test_totals_sum_all_days_and_daily_rows_follow_window(self):
+        event = create_event(self.organizer, max_participants=4)
+        self.add_stats(event, 40, registrations=2, wishlist_adds=4, conversions=1)
+        self.add_stats(event, 1, registrations=1, cancellations=1, wishlist_adds=1, wishlist_removals=1)
+        other = create_event(User.objects.create_user(email='other@planr.dev'))
+        self.add_stats(other, 1, registrations=5)
+
+        rows = self.analytics()
+        self.assertEqual(list(rows), [event.id])
+        row = rows[event.id]
+        self.assertEqual(
+            (row['registrations'], row['cancellations'], row['wishlistAdds'], row['wishlistRemovals'], row['conversions']),
+            (3, 1, 5, 1, 1),
+        )
+        self.assertEqual(row['fillRate'], 0.5)
+        self.assertEqual(row['conversionRate'], 0.2)
+        self.assertEqual([day['day'] for day in row['daily']], [str(timezone.localdate() - timedelta(days=1))])
+
+    def test_recurring_event_has_no_fill_rate(self):
+        series = create_event(self.organizer, recurrence_frequency='WEEKLY')
+        self.add_stats(series, 1, registrations=2)
+        self.assertIsNone(self.analytics()[series.id]['fillRate'])
+
+    def test_zero_capacity_event_has_no_fill_rate(self):
+        event = create_event(self.organizer, max_participants=0)
+        self.add_stats(event, 1, registrations=1)
+
+        row = self.analytics()[event.id]
+        self.assertIsNone(row['fillRate'])
+        self.assertIsNone(row['conversionRate'])  # Aucun ajout en wishlist
+
+class WaitlistPromotionTests(TestCase):
+
+    def setUp(self):
+        organizer = User.objects.create_user(email='organizer@planr.dev')
+        self.event = create_event(organizer, max_participants=2)
+        self.participants = [User.objects.create_user(email=f'participant-{index}@planr.dev') for index in range(2)]
+        for user in self.participants:
+            register(self.event, user)
+        self.waiting = [User.objects.create_user(email=f'waiting-{index}@planr.dev') for index in range(2)]
+        for position, user in enumerate(self.waiting, start=1):
+            WaitlistEntry.objects.create(event=self.event, user=user, position=position)
+
+    def test_cancellation_promotes_head_of_waitlist(self):
+        registration = EventRegistration.objects.get(event=self.event, user=self.participants[0])
+        response = authenticated_client(self.participants[0]).delete(f'/registrations/{registration.pk}/')
+
+        self.assertEqual(response.status_code, 204)
+        self.assertTrue(self.event.participants.filter(pk=self.waiting[0].pk).exists())
+        self.assertEqual(list(WaitlistEntry.objects.values_list('user', flat=True)), [self.waiting[1].pk])
+
+    def test_full_event_promotes_nobody(self):
+        self.assertIsNone(self.event.promote_from_waitlist())
+        self.assertEqual(WaitlistEntry.objects.count(), 2)
+
+    def test_double_join_is_rejected_after_lock(self):
+        newcomer = User.objects.create_user(email='newcomer@planr.dev')
+        serializer = WaitlistEntrySerializer(data={'event_id': self.event.pk}, context={'request': mock.Mock(user=newcomer)})
+        self.assertTrue(serializer.is_valid())
+        # Inscription concurrente validée et enregistrée entre validate() et create()
+        WaitlistEntry.objects.create(event=self.event, user=newcomer, position=3)
+
+        with self.assertRaises(ValidationError):
+            serializer.save()
+        self.assertEqual(WaitlistEntry.objects.filter(user=newcomer).count(), 1)
+
+
+@skipUnlessDBFeature('has_select_for_update_skip_locked')
+class WaitlistConcurrencyTests(TransactionTestCase):
+    """ Annulations, promotions et inscriptions simultanées, chacune dans sa propre connexion. """
+
+    def setUp(self):
+        organizer = User.objects.create_user(email='organizer@planr.dev')
+        self.event = create_event(organizer, max_participants=2)
+        self.participants = [User.objects.create_user(email=f'participant-{index}@planr.dev') for index in range(2)]
+        for user in self.participants:
+            register(self.event, user)
+        self.waiting = [User.objects.create_user(email=f'waiting-{index}@planr.dev') for index in range(2)]
+        for position, user in enumerate(self.waiting, start=1):
+            WaitlistEntry.objects.create(event=self.event, user=user, position=position)
+
+    def run_concurrently(self, *actions):
+        barrier = threading.Barrier(len(actions))
+        errors = []
+
+        def run(action):
+            try:
+                barrier.wait()
+                action()
+            except Exception as error:
+                errors.append(error)
+            finally:
+                connection.close()  # Connexion propre au thread
+
+        threads = [threading.Thread(target=run, args=(action,)) for action in actions]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+
+    def cancel(self, user):
+        with transaction.atomic():
+            EventRegistration.objects.filter(event=self.event, user=user).delete()
+            self.event.participants.remove(user)
+            PrivateEvent.objects.get(pk=self.event.pk).promote_from_waitlist()
+
+    def test_simultaneous_cancellations_promote_two_people(self):
+        self.run_concurrently(*[lambda user=user: self.cancel(user) for user in self.participants])
+
+        self.assertEqual(set(self.event.participants.values_list('pk', flat=True)), {user.pk for user in self.waiting})
+        self.assertFalse(WaitlistEntry.objects.exists())
+
+    def test_registration_racing_promotion_does_not_overfill(self):
+        newcomer = User.objects.create_user(email='newcomer@planr.dev')
+
+        def register_directly():
+            request = mock.Mock(user=newcomer)
+            with transaction.atomic():
+                serializer = EventRegistrationSerializer(data={'event_id': self.event.pk}, context={'request': request})
+                if serializer.is_valid():
+                    serializer.save()
+                    self.event.participants.add(newcomer)
+
+        self.run_concurrently(lambda: self.cancel(self.participants[0]), register_directly)
+
+        self.assertEqual(self.event.participants.count(), self.event.max_participants)
+
+    def test_locked_user_row_does_not_skip_entry(self):
+        EventRegistration.objects.filter(event=self.event, user=self.participants[0]).delete()
+        self.event.participants.remove(self.participants[0])
+        locked, release = threading.Event(), threading.Event()
+
+        def lock_waiting_user():
+            # Verrou d'un UPDATE sans rapport avec la liste d'attente (mise à jour du compte, par exemple)
+            try:
+                with transaction.atomic():
+                    User.objects.select_for_update(no_key=True).get(pk=self.waiting[0].pk)
+                    locked.set()
+                    release.wait(timeout=10)
+            finally:
+                connection.close()
+
+        thread = threading.Thread(target=lock_waiting_user)
+        thread.start()
+        try:
+            locked.wait(timeout=10)
+            promoted = self.event.promote_from_waitlist()
+        finally:
+            release.set()
+            thread.join()
+
+        self.assertEqual(promoted, self.waiting[0])
+
+    def test_simultaneous_joins_by_same_user(self):
+        newcomer = User.objects.create_user(email='newcomer@planr.dev')
+        statuses = []
+
+        def join():
+            statuses.append(authenticated_client(newcomer).post('/waitlist/', {'eventId': self.event.pk}, format='json').status_code)
+
+        self.run_concurrently(join, join)
+
+        self.assertEqual(sorted(statuses), [201, 400])
+        self.assertEqual(WaitlistEntry.objects.filter(user=newcomer).count(), 1)
+
+
+class PrivateEventListProjectionTests(TestCase):
+    """ La projection values() doit rendre exactement la sortie de PrivateEventSerializer(many=True). """
+
+    def setUp(self):
+        self.viewer = User.objects.create_user(email='viewer@planr.dev')
+        organizer = User.objects.create_user(email='organizer@planr.dev')
+        Profile.objects.filter(user=organizer).update(first_name='Alice', profile_picture='profiles/alice.jpg')
+        without_profile = User.objects.create_user(email='no-profile@planr.dev')
+        Profile.objects.filter(user=without_profile).delete()
+        participants = [User.objects.create_user(email=f'participant-{index}@planr.dev') for index in range(7)]
+        Profile.objects.filter(user__in=participants[::2]).update(first_name='Bob', profile_picture='profiles/bob.png')
+
+        events = [
+            create_event(organizer, latitude='48.8566', longitude='2.3522', image='event_images/concert.jpg'),
+            create_event(organizer, days=3, category='CONF', recurrence_frequency='WEEKLY', recurrence_until=timezone.localdate() + timedelta(days=60)),
+            create_event(without_profile, days=5, max_participants=10),
+            create_event(organizer, days=8, category='PARTY', recurrence_frequency='DAILY', recurrence_interval=2),
+        ]
+        # Participants ajoutés dans le désordre : l'ordre de sortie ne doit pas dépendre de l'insertion
+        for event, members in zip(events, [participants[::-1], participants[2:5], [], participants[1:2]]):
+            for user in members:
+                register(event, user)
+        register(events[0], self.viewer)
+        Wishlist.objects.create(user=self.viewer, event=events[0])
+        Wishlist.objects.create(user=self.viewer, event=events[2])
+        Wishlist.objects.create(user=participants[0], event=events[2])
+
+    def render_both(self, path):
+        request = Request(APIRequestFactory().get(path))
+        request.user = self.viewer
+        events = PrivateEvent.objects.order_by('date', 'id')
+        queryset = events.select_related('organizer').prefetch_related(PrivateEvent.participants_prefetch())
+        renderer = CamelCaseJSONRenderer()
+        expected = renderer.render(PrivateEventSerializer(queryset, many=True, context={'request': request}).data)
+        actual = renderer.render(PrivateEventListProjection(events, request).data)
+        return actual, expected
+
+    def test_full_list_matches_serializer(self):
+        actual, expected = self.render_both('/private-events/')
+        self.assertEqual(actual, expected)
+
+    def test_preview_matches_serializer(self):
+        actual, expected = self.render_both('/private-events/?participants=preview')
+        self.assertEqual(actual, expected)
+
+    def test_list_is_paginated_when_configured(self):
+        class TwoPerPage(PageNumberPagination):
+            page_size = 2
+
+        client = authenticated_client(self.viewer)
+        with mock.patch.object(PrivateEventViewSet, 'pagination_class', TwoPerPage):
+            for projection in [True, False]:
+                with self.subTest(projection=projection), override_settings(EVENT_LIST_PROJECTION=projection):
+                    first = client.get('/private-events/?ordering=date').json()
+                    second = client.get('/private-events/?ordering=date&page=2').json()
+                    self.assertEqual(first['count'], 4)
+                    self.assertEqual(len(first['results']), 2)
+                    self.assertEqual(
+                        [event['id'] for event in first['results'] + second['results']],
+                        list(PrivateEvent.objects.order_by('date').values_list('id', flat=True)),
+                    )
+
+
+class AsyncPrivateEventViewTests(TestCase):
+    """ Les vues ASGI doivent répondre exactement comme PrivateEventViewSet. """
+
+    def setUp(self):
+        self.viewer = User.objects.create_user(email='viewer@planr.dev')
+        organizer = User.objects.create_user(email='organizer@planr.dev')
+        participants = [User.objects.create_user(email=f'participant-{index}@planr.dev') for index in range(7)]
+        self.events = [
+            create_event(organizer, title='Concert', location='Lyon'),
+            create_event(organizer, days=3, category='CONF', recurrence_frequency='WEEKLY'),
+            create_event(organizer, days=5, title='Concert en plein air', max_participants=10),
+        ]
+        for user in participants:
+            register(self.events[0], user)
+        register(self.events[1], self.viewer)
+        Wishlist.objects.create(user=self.viewer, event=self.events[0])
+        Wishlist.objects.create(user=participants[0], event=self.events[2])
+
+        self.sync_client = authenticated_client(self.viewer)
+        self.async_client = AsyncClient()
+        self.headers = {'Authorization': self.sync_client._credentials['HTTP_AUTHORIZATION']}
+
+    async def assert_same_response(self, query, pk=None):
+        suffix = '' if pk is None else f'{pk}/'
+        expected = await sync_to_async(self.sync_client.get)(f'/private-events/{suffix}{query}')
+        actual = await self.async_client.get(f'/async/private-events/{suffix}{query}', headers=self.headers)
+        self.assertEqual(actual.status_code, expected.status_code)
+        self.assertEqual(actual.json(), expected.json())
+        return actual
+
+    async def test_list_matches_sync_view(self):
+        for query in ['?ordering=date', '?ordering=-date&participants=preview', '?location=Lyon', '?search=concert&ordering=date', '?ordering=category']:
+            with self.subTest(query=query):
+                response = await self.assert_same_response(query)
+                self.assertTrue(response.json())
+
+    async def test_detail_matches_sync_view(self):
+        for query in ['', '?participants=preview']:
+            with self.subTest(query=query):
+                response = await self.assert_same_response(query, pk=self.events[0].pk)
+                self.assertEqual(response.json()['wishlistCount'], 1)
+
+    async def test_unknown_event_is_not_found(self):
+        response = await self.assert_same_response('', pk=0)
+        self.assertEqual(response.status_code, 404)
+
+    async def test_list_is_paginated_like_sync_view(self):
+        class TwoPerPage(PageNumberPagination):
+            page_size = 2
+
+        with mock.patch.object(PrivateEventViewSet, 'pagination_class', TwoPerPage):
+            for page in [1, 2]:
+                with self.subTest(page=page):
+                    expected = (await sync_to_async(self.sync_client.get)(f'/private-events/?ordering=date&page={page}')).json()
+                    actual = (await self.async_client.get(f'/async/private-events/?ordering=date&page={page}', headers=self.headers)).json()
+                    self.assertEqual(actual['count'], 3)
+                    self.assertEqual(actual['results'], expected['results'])
+                    self.assertEqual(bool(actual['next']), bool(expected['next']))
+                    self.assertEqual(bool(actual['previous']), bool(expected['previous']))
+
+    async def test_anonymous_request_is_refused(self):
+        for suffix in ['', f'{self.events[0].pk}/']:
+            with self.subTest(suffix=suffix):
+                expected = await sync_to_async(APIClient().get)(f'/private-events/{suffix}')
+                actual = await AsyncClient().get(f'/async/private-events/{suffix}')
+                self.assertEqual(actual.status_code, 401)
+                self.assertEqual(actual.json(), expected.json())
+                self.assertEqual(actual['WWW-Authenticate'], expected['WWW-Authenticate'])
+
+
+class ReplicaRoutingTests(TransactionTestCase):
+    """
+    Primaire et réplica sont deux bases SQLite distinctes : le réplica ne reçoit que les lignes
+    recopiées explicitement, ce qui simule le retard de réplication.
+    """
+    # Le réplica n'est déclaré qu'au setUpClass : '__all__' l'inclut, un alias inconnu du lanceur de tests non
+    databases = '__all__'
+
+    @classmethod
+    def setUpClass(cls):
+        cls.replica_dir = tempfile.TemporaryDirectory()
+        connections.settings = connections.configure_settings({
+            **connections.settings,
+            REPLICA_DB_ALIAS: {'ENGINE': 'django.db.backends.sqlite3', 'NAME': f'{cls.replica_dir.name}/replica.sqlite3'},
+        })
+        call_command('migrate', database=REPLICA_DB_ALIAS, run_syncdb=True, verbosity=0)
+        # L'épinglage exige un cache partagé entre workers : un cache fichier en tient lieu
+        cls.enterClassContext(override_settings(CACHES={'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': f'{cls.replica_dir.name}/cache',
+        }}))
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        connections[REPLICA_DB_ALIAS].close()
+        del connections[REPLICA_DB_ALIAS]
+        del connections.settings[REPLICA_DB_ALIAS]
+        cls.replica_dir.cleanup()
+
+    def setUp(self):
+        cache.clear()
+        self.organizer = User.objects.create_user(email='organizer@planr.dev')
+        self.user = User.objects.create_user(email='user@planr.dev')
+        self.event = create_event(self.organizer)
+        self.replicate(self.organizer, self.organizer.profile, self.user, self.user.profile, self.event)
+
+    @staticmethod
+    def replicate(*instances):
+        # bulk_create n'envoie aucun signal : rien n'est réécrit sur le primaire
+        for instance in instances:
+            type(instance).objects.using(REPLICA_DB_ALIAS).bulk_create([instance])
+
+    def event_ids(self, client, path):
+        response = client.get(path)
+        self.assertEqual(response.status_code, 200)
+        return [event['id'] for event in response.json()]
+
+    def test_safe_reads_use_replica(self):
+        Wishlist.objects.create(user=self.user, event=self.event)  # Pas encore répliqué
+
+        self.assertEqual(self.event_ids(authenticated_client(self.user), '/private-events/my-wishlist/'), [])
+
+    def test_writer_reads_own_writes_from_primary(self):
+        client, other = authenticated_client(self.user), authenticated_client(self.organizer)
+        response = client.post('/wishlist/toggle/', {'eventId': self.event.id}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertFalse(Wishlist.objects.using(REPLICA_DB_ALIAS).exists())
+
+        self.assertEqual(self.event_ids(client, '/private-events/my-wishlist/'), [self.event.id])
+        # Les autres clients restent sur le réplica
+        late_event = create_event(self.organizer, days=3)
+        self.assertNotIn(late_event.id, self.event_ids(other, '/private-events/'))
+        self.assertIn(late_event.id, self.event_ids(client, '/private-events/'))
+
+    def test_pin_survives_token_refresh(self):
+        response = authenticated_client(self.user).post('/wishlist/toggle/', {'eventId': self.event.id}, format='json')
+        self.assertEqual(response.status_code, 201)
+
+        # Nouveau token d'accès, comme après un rafraîchissement : l'épinglage suit l'utilisateur
+        self.assertEqual(self.event_ids(authenticated_client(self.user), '/private-events/my-wishlist/'), [self.event.id])
+
+    def test_local_memory_cache_is_refused(self):
+        locmem = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+        with override_settings(CACHES=locmem), self.assertRaises(ImproperlyConfigured):
+            ReplicaRoutingMiddleware(lambda request: None)
+
+    def test_router_has_no_side_effects(self):
+        with read_from_replica():
+            self.assertEqual(PrivateEvent.objects.select_for_update().db, DEFAULT_DB_ALIAS)
+            self.assertEqual(PrivateEvent.objects.all().db, REPLICA_DB_ALIAS)
+            pin_primary()
+            self.assertEqual(PrivateEvent.objects.all().db, DEFAULT_DB_ALIAS)
+        self.assertEqual(PrivateEvent.objects.all().db, DEFAULT_DB_ALIAS)
+
+
+@skipIf(connection.settings_dict['OPTIONS'].get('pool'), "Le pool impose CONN_MAX_AGE à 0")
+class ConnectionReuseTests(TransactionTestCase):
+    """
+    Les requêtes sont servies par le handler WSGI, comme par un worker gunicorn synchrone : contrairement
+    au client de test, la fin de chaque réponse déclenche close_old_connections.
+    """
+    requests = 10
+
+    def setUp(self):
+        user = User.objects.create_user(email='user@planr.dev')
+        token = PlanrRefreshToken.for_user(user).access_token
+        self.environ = RequestFactory().get('/private-events/', headers={'Authorization': f'Bearer {token}'}).environ
+        settings_dict = connection.settings_dict
+        self.addCleanup(settings_dict.update, {key: settings_dict[key] for key in ['CONN_MAX_AGE', 'CONN_HEALTH_CHECKS']})
+
+    def skip_if_connections_never_close(self):
+        # Une base SQLite en mémoire n'est jamais fermée par Django : elle disparaîtrait avec sa connexion
+        if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            self.skipTest("Connexion à une base SQLite en mémoire, jamais fermée")
+
+    def serve(self, conn_max_age, before_request=None):
+        """ Sert les requêtes et retourne le nombre de connexions physiques ouvertes. """
+        connection.settings_dict['CONN_MAX_AGE'] = conn_max_age
+        connection.close()
+        handler, opened = WSGIHandler(), []
+
+        def on_connect(sender, connection, **kwargs):
+            # Référence conservée : l'identité d'un objet détruit pourrait être réattribuée
+            opened.append(connection.connection)
+
+        def start_response(status, headers):
+            self.assertEqual(status, '200 OK')
+
+        connection_created.connect(on_connect)
+        try:
+            for _ in range(self.requests):
+                if before_request:
+                    before_request()
+                handler(dict(self.environ), start_response).close()  # Envoie request_finished
+        finally:
+            connection_created.disconnect(on_connect)
+        return len({id(raw_connection) for raw_connection in opened})
+
+    def test_persistent_connection_is_reused_across_requests(self):
+        self.assertLessEqual(self.serve(conn_max_age=60), 1)
+
+    def test_connection_per_request_without_persistence(self):
+        self.skip_if_connections_never_close()
+        self.assertEqual(self.serve(conn_max_age=0), self.requests)
+
+    @skipIf(connection.vendor == 'sqlite', "SQLite considère toujours sa connexion utilisable")
+    def test_health_check_replaces_broken_connection(self):
+        connection.settings_dict['CONN_HEALTH_CHECKS'] = True
+
+        def break_connection():
+            if connection.connection is not None:
+                connection.connection.close()  # Coupure côté serveur (redémarrage de Postgres)
+
+        self.assertEqual(self.serve(conn_max_age=60, before_request=break_connection), self.requests)
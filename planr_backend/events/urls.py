@@ -1,16 +1,24 @@
 from django.urls import path, include
 from django.conf.urls.static import static
 from rest_framework.routers import DefaultRouter
-from .views import PrivateEventViewSet, EventRegistrationViewSet, WishlistViewSet, MyUpcomingEventsView
+from .views import PrivateEventViewSet, EventRegistrationViewSet, WaitlistEntryViewSet, WishlistViewSet, MyUpcomingEventsView, EventHistoryViewSet
+from .views import BatchMutationView
+from .views import AsyncPrivateEventView, AsyncMyUpcomingEventsView
 from django.conf import settings
 
 router = DefaultRouter()
 router.register(r'private-events', PrivateEventViewSet, basename='privateevent')
 router.register(r'registrations', EventRegistrationViewSet, basename='registration')
+router.register(r'waitlist', WaitlistEntryViewSet, basename='waitlist')
 router.register(r'wishlists', WishlistViewSet, basename='wishlist')
+router.register(r'event-history', EventHistoryViewSet, basename='event-history')
 
 urlpatterns = [
     path('my-upcoming-events/', MyUpcomingEventsView.as_view(), name='my-upcoming-events'),
+    path('async/private-events/', AsyncPrivateEventView.as_view(), name='async-privateevent-list'),
+    path('async/private-events/<int:pk>/', AsyncPrivateEventView.as_view(), name='async-privateevent-detail'),
+    path('async/my-upcoming-events/', AsyncMyUpcomingEventsView.as_view(), name='async-my-upcoming-events'),
 	path('wishlist/toggle/', WishlistViewSet.as_view({'post': 'toggle_wishlist'}), name='toggle-wishlist'),
+    path('batch/', BatchMutationView.as_view(), name='batch-mutations'),
     path('', include(router.urls)),
 ] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
@@ -0,0 +1,170 @@
+import calendar
+from datetime import date, datetime, timedelta
+
+from django.utils import timezone
+
+
+FREQUENCY_DAYS = {
+    'DAILY': 1,
+    'WEEKLY': 7,
+}
+
+
+def event_starts_at(day, at):
+    """
+    Combine une date et une heure locales (TIME_ZONE) en un instant timezone-aware.
+
+    Returns:
+        datetime: Le début de l'événement, ou None si la date ou l'heure manque.
+    """
+    if day is None or at is None:
+        return None
+    return timezone.make_aware(datetime.combine(day, at))
+
+
+def add_months(day, months):
+    """
+    Décale une date d'un nombre de mois en conservant le jour du mois.
+
+    Returns:
+        date: La date décalée, ou None si ce jour n'existe pas dans le mois cible (ex. le 31).
+    """
+    year, month = divmod(day.month - 1 + months, 12)
+    year += day.year
+    if day.day > calendar.monthrange(year, month + 1)[1]:
+        return None
+    return date(year, month + 1, day.day)
+
+
+def iter_occurrence_dates(first, frequency, interval, start, end):
+    """
+    Génère les dates d'une série récurrente comprises entre `start` et `end` (inclus).
+    Le premier pas est calculé directement : le coût dépend de la fenêtre, pas de l'ancienneté de la série.
+
+    Args:
+        first (date): Date de la première occurrence.
+        frequency (str): 'DAILY', 'WEEKLY' ou 'MONTHLY'.
+        interval (int): Nombre de périodes entre deux occurrences.
+        start (date): Début de la fenêtre.
+        end (date): Fin de la fenêtre.
+    """
+    start = max(start, first)
+    if start > end:
+        return
+
+    if frequency == 'MONTHLY':
+        months = (start.year - first.year) * 12 + start.month - first.month
+        step = -(-months // interval)  # Arrondi supérieur
+        while True:
+            day = add_months(first, step * interval)
+            if day is not None:
+                if day > end:
+                    return
+                if day >= start:
+                    yield day
+            elif add_months(first.replace(day=1), step * interval) > end:
+                return
+            step += 1
+
+    period = timedelta(days=FREQUENCY_DAYS[frequency] * interval)
+    step = -(-(start - first).days // period.days)
+    day = first + step * period
+    while day <= end:
+        yield day
+        day += period
+
+
+def expand_occurrences(events, start, end):
+    """
+    Génère les occurrences visibles des événements dans la fenêtre, en appliquant les modifications
+    par occurrence (`occurrence_overrides` doit être préchargé sur la fenêtre).
+
+    Yields:
+        tuple: (événement, date d'origine de l'occurrence, modification ou None).
+    """
+    for event in events:
+        overrides = {override.occurrence_date: override for override in event.occurrence_overrides.all()}
+        for day in event.occurrences(start, end):
+            override = overrides.get(day)
+            if override and override.is_cancelled:
+                continue
+            yield event, day, override
+
+
+GEOHASH_ALPHABET = '0123456789bcdefghjkmnpqrstuvwxyz'
+GEOHASH_PRECISION = 9  # Cellules d'environ 5 m, largement suffisant pour regrouper
+
+# Précision de regroupement par niveau de zoom (0 à 20) : environ une cellule pour 50 à 100 px de carte
+ZOOM_GEOHASH_PRECISION = (1, 1, 1, 2, 2, 3, 3, 3, 4, 4, 5, 5, 5, 6, 6, 7, 7, 7, 8, 8, 9)
+
+
+def encode_geohash(latitude, longitude, precision=GEOHASH_PRECISION):
+    """
+    Encode une position en geohash : deux positions proches partagent un long préfixe commun.
+
+    Returns:
+        str: Le geohash de `precision` caractères.
+    """
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars, value, bits, even = [], 0, 0, True
+    while len(chars) < precision:
+        bounds, coordinate = (lon_range, longitude) if even else (lat_range, latitude)
+        middle = (bounds[0] + bounds[1]) / 2
+        if coordinate >= middle:
+            value, bounds[0] = value * 2 + 1, middle
+        else:
+            value, bounds[1] = value * 2, middle
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(GEOHASH_ALPHABET[value])
+            value, bits = 0, 0
+    return ''.join(chars)
+
+
+def geohash_cell_size(precision):
+    """ Hauteur et largeur (en degrés) d'une cellule geohash de cette précision. """
+    lon_bits = (5 * precision + 1) // 2
+    lat_bits = 5 * precision // 2
+    return 180 / 2 ** lat_bits, 360 / 2 ** lon_bits
+
+
+def geohash_bounds(geohash):
+    """
+    Returns:
+        tuple: (sud, ouest, nord, est) de la cellule.
+    """
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    even = True
+    for char in geohash:
+        value = GEOHASH_ALPHABET.index(char)
+        for shift in range(4, -1, -1):
+            bounds = lon_range if even else lat_range
+            middle = (bounds[0] + bounds[1]) / 2
+            if value >> shift & 1:
+                bounds[0] = middle
+            else:
+                bounds[1] = middle
+            even = not even
+    return lat_range[0], lon_range[0], lat_range[1], lon_range[1]
+
+
+def geohash_cover(south, west, north, east, precision):
+    """
+    Ensemble des cellules geohash de cette précision qui recoupent le rectangle.
+    Les points d'échantillonnage sont espacés d'au plus une cellule : aucune cellule n'est manquée.
+    """
+    height, width = geohash_cell_size(precision)
+    cells = set()
+    latitude = south
+    while True:
+        longitude = west
+        while True:
+            cells.add(encode_geohash(latitude, longitude, precision))
+            if longitude >= east:
+                break
+            longitude = min(longitude + width, east)
+        if latitude >= north:
+            break
+        latitude = min(latitude + height, north)
+    return cells
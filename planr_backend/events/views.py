@@ -3,27 +3,80 @@ from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from rest_framework import permissions, generics, status
+from rest_framework import permissions, generics, serializers, status
+from rest_framework.request import Request
+from rest_framework.exceptions import AuthenticationFailed, NotAuthenticated, NotFound
+from rest_framework.pagination import CursorPagination
+from rest_framework.settings import api_settings
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Avg, Count, Exists, Min, OuterRef, Prefetch, Q, Sum
+from django.db.models.functions import Substr
+from django.http import HttpResponse
 from django.utils import timezone
-from .models import PrivateEvent, EventRegistration, Wishlist
-from .serializers import PrivateEventSerializer, EventRegistrationSerializer, WishlistSerializer
+from django.views import View
+from asgiref.sync import sync_to_async
+import asyncio
+from .models import PrivateEvent, ArchivedEventRegistration, ArchivedPrivateEvent, EventOccurrenceOverride, EventRegistration, WaitlistEntry, Wishlist
+from .models import EventDailyStats, record_registration, record_wishlist
+from .serializers import PrivateEventSerializer, EventRegistrationSerializer, WaitlistEntrySerializer, WishlistSerializer
+from .serializers import ArchivedPrivateEventSerializer, EventOccurrenceSerializer, OccurrenceWindowSerializer
+from .serializers import BatchMutationSerializer, BatchOperationSerializer, ParticipantSerializer, PrivateEventListProjection
+from .serializers import AnalyticsWindowSerializer, ClusterQuerySerializer, EventAnalyticsSerializer, EventClusterSerializer
+from .utils import ZOOM_GEOHASH_PRECISION, expand_occurrences, geohash_bounds, geohash_cell_size, geohash_cover
+from functools import reduce
+import operator
+from authentication.tokens import PlanrJWTAuthentication
+from planr_backend.metrics import EVENT_REGISTRATIONS, WISHLIST_TOGGLES, timed
 
 class PrivateEventViewSet(viewsets.ModelViewSet):
     """ ViewSet pour gérer les événements particuliers """
-    queryset = PrivateEvent.objects.all().select_related('organizer').prefetch_related('participants__profile').filter(date__gte=timezone.now())
+    queryset = PrivateEvent.objects.all().select_related('organizer').prefetch_related(PrivateEvent.participants_prefetch())
     serializer_class = PrivateEventSerializer
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_fields = ['location', 'date', 'interests']
     search_fields = ['title', 'description', 'location']
-    ordering_fields = ['date', 'category']
+    ordering_fields = ['date', 'starts_at', 'category', 'trending']
     permission_classes = [IsAuthenticated]
-      
+
+    def get_queryset(self):
+        """ Événements pas encore commencés, y compris les séries récurrentes encore en cours. """
+        queryset = super().get_queryset().filter(PrivateEvent.upcoming(timezone.now()))
+        if self.action == 'participants' or self.request.GET.get('participants') == 'preview':
+            # Participants servis par l'aperçu ou la liste paginée : inutile de tous les précharger
+            queryset = queryset.prefetch_related(None)
+        return queryset
+
     def get_permissions(self):
         """ Applique des permissions différentes selon les actions. """
         if self.action in ['update', 'partial_update', 'destroy']:
             self.permission_classes = [IsAuthenticated, IsOrganizer]
         return super().get_permissions()
 
+    def list_response(self, queryset):
+        """
+        Liste d'événements, paginée si une pagination est configurée. Avec EVENT_LIST_PROJECTION, les lignes sont
+        rendues par projection values() (identique au serializer, sans instances) : la page n'est alors lue
+        que pour ses identifiants.
+        """
+        if not settings.EVENT_LIST_PROJECTION:
+            page = self.paginate_queryset(queryset)
+            if page is None:
+                return Response(self.get_serializer(queryset, many=True).data)
+            return self.get_paginated_response(self.get_serializer(page, many=True).data)
+
+        page = self.paginate_queryset(queryset.select_related(None).prefetch_related(None).only('pk'))
+        if page is None:
+            return Response(PrivateEventListProjection(queryset, self.request).data)
+        ids = [event.pk for event in page]
+        rows = {row['id']: row for row in PrivateEventListProjection(PrivateEvent.objects.filter(pk__in=ids), self.request).data}
+        return self.get_paginated_response([rows[pk] for pk in ids])
+
+    def list(self, request, *args, **kwargs):
+        return self.list_response(self.filter_queryset(self.get_queryset()))
+
     def perform_create(self, serializer):
         # Assigne l'utilisateur connecté comme organisateur
         serializer.save(organizer=self.request.user)
@@ -32,25 +85,183 @@ class PrivateEventViewSet(viewsets.ModelViewSet):
     def my_wishlist(self, request):
         """ Retourne les événements ajoutés à la wishlist de l'utilisateur connecté """
         user = request.user
-        wishlist_events = PrivateEvent.objects.filter(wishlists__user=user).select_related('organizer').prefetch_related('participants__profile')
-        serializer = self.get_serializer(wishlist_events, many=True)
-        return Response(serializer.data)
+        wishlist_events = PrivateEvent.objects.filter(wishlists__user=user).select_related('organizer').prefetch_related(PrivateEvent.participants_prefetch())
+        return self.list_response(wishlist_events)
     
     @action(detail=False, methods=['get'], url_path='my-events')
     def my_events(self, request):
         """ Retourne les événements créés par l'utilisateur connecté """
         user = request.user
-        my_events = PrivateEvent.objects.filter(organizer=user).select_related('organizer').prefetch_related('participants__profile')
-        serializer = self.get_serializer(my_events, many=True)
-        return Response(serializer.data)
-    
+        my_events = PrivateEvent.objects.filter(organizer=user).select_related('organizer').prefetch_related(PrivateEvent.participants_prefetch())
+        return self.list_response(my_events)
+
+    @action(detail=False, methods=['get'], url_path='my-events/analytics')
+    def my_events_analytics(self, request):
+        """
+        Retourne les indicateurs des événements de l'organisateur : inscriptions et ajouts en wishlist par jour
+        sur la période, taux de remplissage et de conversion (wishlist -> inscription) depuis la création.
+        Seuls les agrégats quotidiens (EventDailyStats) sont lus, jamais les tables d'inscriptions.
+        """
+        window = AnalyticsWindowSerializer(data=request.query_params)
+        window.is_valid(raise_exception=True)
+        start, end = window.validated_data['start'], window.validated_data['end']
+
+        counters = ['registrations', 'cancellations', 'wishlist_adds', 'wishlist_removals', 'conversions']
+        stats = EventDailyStats.objects.filter(event__organizer=request.user)
+        totals = {
+            row['event_id']: row
+            for row in stats.values('event_id').annotate(**{field: Sum(field) for field in counters})
+        }
+        daily = {}
+        for row in stats.filter(day__range=(start, end)).order_by('day'):
+            daily.setdefault(row.event_id, []).append(row)
+
+        rows = []
+        events = PrivateEvent.objects.filter(organizer=request.user).order_by('date', 'time')
+        for event in events.only('id', 'title', 'date', 'max_participants', 'recurrence_frequency'):
+            total = totals.get(event.id) or dict.fromkeys(counters, 0)
+            participants = total['registrations'] - total['cancellations']
+            rows.append({
+                'id': event.id,
+                'title': event.title,
+                'date': event.date,
+                'max_participants': event.max_participants,
+                **{field: total[field] for field in counters},
+                # Vide pour une série (capacité par occurrence) ou un événement sans capacité
+                'fill_rate': None if event.is_recurring or not event.max_participants else round(participants / event.max_participants, 4),
+                'conversion_rate': round(total['conversions'] / total['wishlist_adds'], 4) if total['wishlist_adds'] else None,
+                'daily': daily.get(event.id, []),
+            })
+        return Response({
+            'start': start,
+            'end': end,
+            'events': EventAnalyticsSerializer(rows, many=True).data,
+        })
+
+    @action(detail=True, methods=['get'], url_path='participants')
+    def participants(self, request, pk=None):
+        """ Retourne les participants de l'événement, page par page (pagination par curseur). """
+        event = self.get_object()
+        rows = (
+            PrivateEvent.participants.through.objects
+            .filter(privateevent_id=event.pk)
+            .values('id', 'user_id', 'user__profile__first_name', 'user__profile__profile_picture')
+        )
+        paginator = ParticipantCursorPagination()
+        page = paginator.paginate_queryset(rows, request, view=self)
+        return paginator.get_paginated_response(ParticipantSerializer(page, many=True, context={'request': request}).data)
+
     @action(detail=False, methods=['get'], url_path='joined-events')
     def joined_events(self, request):
         """ Retourne les événements auxquels l'utilisateur est inscrit """
         user = request.user
-        joined_events = PrivateEvent.objects.filter(participants=user).select_related('organizer').prefetch_related('participants__profile')
-        serializer = self.get_serializer(joined_events, many=True)
-        return Response(serializer.data)
+        joined_events = PrivateEvent.objects.filter(participants=user).select_related('organizer').prefetch_related(PrivateEvent.participants_prefetch())
+        return self.list_response(joined_events)
+
+    @action(detail=False, methods=['get'], url_path='occurrences')
+    def occurrences(self, request):
+        """ Retourne les occurrences des événements comprises dans une fenêtre de dates (vue calendrier) """
+        window = OccurrenceWindowSerializer(data=request.query_params)
+        window.is_valid(raise_exception=True)
+        start, end = window.validated_data['start'], window.validated_data['end']
+
+        # Événements ponctuels de la fenêtre et séries qui la recoupent
+        events = self.filter_queryset(PrivateEvent.objects.filter(
+            Q(recurrence_frequency__isnull=True, date__range=(start, end))
+            | Q(recurrence_frequency__isnull=False, date__lte=end) & (Q(recurrence_until__isnull=True) | Q(recurrence_until__gte=start))
+        )).prefetch_related(
+            Prefetch('occurrence_overrides', queryset=EventOccurrenceOverride.objects.filter(occurrence_date__range=(start, end)))
+        )
+
+        counts = {
+            (row['event_id'], row['occurrence_date']): row['total']
+            for row in EventRegistration.objects.filter(event__in=events)
+            .filter(Q(occurrence_date__isnull=True) | Q(occurrence_date__range=(start, end)))
+            .values('event_id', 'occurrence_date')
+            .annotate(total=Count('id'))
+        }
+
+        rows = []
+        for event, day, override in expand_occurrences(events, start, end):
+            rows.append({
+                'id': event.id,
+                'title': event.title,
+                'location': event.location,
+                'category': event.category,
+                'occurrence_date': day,
+                'date': override.date if override and override.date else day,
+                'time': override.time if override and override.time else event.time,
+                'max_participants': override.max_participants if override and override.max_participants else event.max_participants,
+                'participants_count': counts.get((event.id, day if event.is_recurring else None), 0),
+            })
+        rows.sort(key=lambda row: (row['date'], row['time']))
+        return Response(EventOccurrenceSerializer(rows, many=True).data)
+
+    @action(detail=False, methods=['get'], url_path='clusters')
+    def clusters(self, request):
+        """
+        Regroupe les événements à venir de la zone visible par cellule geohash (nombre et barycentre).
+        Les groupes sont calculés en SQL et mis en cache par tuile, une tuile étant une cellule plus large
+        que les groupes : déplacer la carte réutilise les tuiles déjà calculées.
+        """
+        query = ClusterQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        south, west, north, east = query.validated_data['bbox']
+        precision = ZOOM_GEOHASH_PRECISION[query.validated_data['zoom']]
+
+        # Tuiles aussi fines que possible dans la limite de MAX_CLUSTER_TILES cellules
+        tile_precision = precision
+        while tile_precision > 1:
+            height, width = geohash_cell_size(tile_precision)
+            if ((north - south) / height + 2) * ((east - west) / width + 2) <= settings.MAX_CLUSTER_TILES:
+                break
+            tile_precision -= 1
+        tiles = geohash_cover(south, west, north, east, tile_precision)
+
+        keys = {tile: f'event-clusters:{precision}:{tile}' for tile in tiles}
+        cached = cache.get_many(keys.values())
+        clusters = [cluster for key in keys.values() if key in cached for cluster in cached[key]]
+
+        missing = [tile for tile, key in keys.items() if key not in cached]
+        if missing:
+            computed = {tile: [] for tile in missing}
+            rows = (
+                PrivateEvent.objects
+                .filter(PrivateEvent.upcoming(timezone.now()))
+                .filter(reduce(operator.or_, (Q(geohash__startswith=tile) for tile in missing)))
+                .annotate(cell=Substr('geohash', 1, precision))
+                .values('cell')
+                .annotate(total=Count('id'), center_latitude=Avg('latitude'), center_longitude=Avg('longitude'), first_id=Min('id'))
+                .order_by()
+            )
+            for row in rows:
+                computed[row['cell'][:tile_precision]].append({
+                    'geohash': row['cell'],
+                    'count': row['total'],
+                    'latitude': round(float(row['center_latitude']), 6),
+                    'longitude': round(float(row['center_longitude']), 6),
+                    'event_id': row['first_id'] if row['total'] == 1 else None,
+                })
+            cache.set_many({keys[tile]: value for tile, value in computed.items()}, settings.CLUSTER_CACHE_SECONDS)
+            clusters.extend(cluster for value in computed.values() for cluster in value)
+
+        # Les tuiles débordent de la zone : seules les cellules qui la recoupent sont renvoyées
+        visible = []
+        for cluster in clusters:
+            cell_south, cell_west, cell_north, cell_east = geohash_bounds(cluster['geohash'])
+            if cell_south <= north and cell_north >= south and cell_west <= east and cell_east >= west:
+                visible.append(cluster)
+        visible.sort(key=lambda cluster: cluster['count'], reverse=True)
+        return Response(EventClusterSerializer(visible, many=True).data)
+
+
+class ParticipantCursorPagination(CursorPagination):
+    """ Pagination par curseur des participants : coût constant quelle que soit la page, stable aux inscriptions. """
+    ordering = 'id'
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+
 
 class IsOrganizer(permissions.BasePermission):
     """ Permission pour vérifier que l'utilisateur est l'organisateur de l'événement. """
@@ -66,9 +277,42 @@ class EventRegistrationViewSet(viewsets.ModelViewSet):
     serializer_class = EventRegistrationSerializer
     permission_classes = [IsAuthenticated]
 
+    @timed('event_registration')
+    def create(self, request, *args, **kwargs):
+        # Validation (qui verrouille l'événement) et création dans la même transaction
+        with transaction.atomic():
+            return super().create(request, *args, **kwargs)
+
+    def update(self, request, *args, **kwargs):
+        with transaction.atomic():
+            return super().update(request, *args, **kwargs)
+
     def perform_create(self, serializer):
         registration = serializer.save(user=self.request.user)
         registration.event.participants.add(self.request.user)
+        record_registration(registration.event_id, registration.user_id)
+        EVENT_REGISTRATIONS.inc()
+
+    def perform_destroy(self, instance):
+        # Libère la place puis promeut la tête de la liste d'attente dans la même transaction
+        with transaction.atomic():
+            event = instance.event
+            instance.delete()
+            record_registration(event.pk, instance.user_id, cancelled=True, registered_at=instance.registered_at)
+            # Pour une série récurrente, l'utilisateur reste participant tant qu'il a une autre occurrence
+            if not EventRegistration.objects.filter(user=instance.user, event=event).exists():
+                event.participants.remove(instance.user)
+            event.promote_from_waitlist()
+
+
+class WaitlistEntryViewSet(viewsets.ModelViewSet):
+    """ ViewSet pour rejoindre ou quitter la liste d'attente d'un événement complet """
+    serializer_class = WaitlistEntrySerializer
+    permission_classes = [IsAuthenticated]
+    http_method_names = ['get', 'post', 'delete']
+
+    def get_queryset(self):
+        return WaitlistEntry.objects.filter(user=self.request.user)
 
 
 class WishlistViewSet(viewsets.ModelViewSet):
@@ -80,21 +324,243 @@ class WishlistViewSet(viewsets.ModelViewSet):
         return Wishlist.objects.filter(user=self.request.user)
 
     def perform_create(self, serializer):
-        serializer.save(user=self.request.user)
+        wishlist = serializer.save(user=self.request.user)
+        record_wishlist(wishlist.event_id)
+
+    def perform_destroy(self, instance):
+        instance.delete()
+        record_wishlist(instance.event_id, removed=True, added_at=instance.created_at)
 
     @action(detail=False, methods=['post'], url_path='toggle')
+    @timed('wishlist_toggle')
     def toggle_wishlist(self, request):
-        event_id = request.data.get('event_id')
-        event = PrivateEvent.objects.get(id=event_id)
-        wishlist, created = Wishlist.objects.get_or_create(user=request.user, event=event)
-        
-        if not created:
-            wishlist.delete()
+        event_id = serializers.IntegerField().run_validation(request.data.get('event_id'))
+
+        # Le retrait relit la date d'ajout, dont dépend la part du score à retirer ;
+        # l'ajout vérifie l'événement puis insère sans erreur en cas de doublon
+        wishlist = Wishlist.objects.filter(user=request.user, event_id=event_id).only('pk', 'created_at').first()
+        if wishlist is not None and Wishlist.objects.filter(pk=wishlist.pk).delete()[0]:
+            record_wishlist(event_id, removed=True, added_at=wishlist.created_at)
+            WISHLIST_TOGGLES.inc(action='removed')
             return Response({'status': 'removed'}, status=status.HTTP_204_NO_CONTENT)
-        
+
+        if not PrivateEvent.objects.filter(pk=event_id).exists():
+            raise NotFound("Cet événement n'existe pas.")
+        _, created = Wishlist.objects.get_or_create(user=request.user, event_id=event_id)
+        if created:  # Une requête concurrente a pu ajouter l'événement entre-temps : rien à compter
+            record_wishlist(event_id)
+            WISHLIST_TOGGLES.inc(action='added')
         return Response({'status': 'added'}, status=status.HTTP_201_CREATED)
 
 
+class BatchMutationView(generics.GenericAPIView):
+    """
+    Applique un lot d'ajouts/retraits en wishlist et d'inscriptions/désinscriptions dans une seule transaction.
+    Les écritures sont ensemblistes (INSERT ... ON CONFLICT DO NOTHING, DELETE ... IN) et chaque opération
+    reçoit son propre résultat. Une opération rejouée avec la même clé d'idempotence renvoie le résultat
+    enregistré sans être réappliquée : les nouvelles tentatives des applications mobiles sont sans effet.
+    Chaque clé est réservée (cache.add) avant d'appliquer l'opération : une nouvelle tentative arrivée sur un
+    autre worker pendant le premier traitement reçoit le statut « in_progress » au lieu d'être réappliquée.
+    """
+    serializer_class = BatchMutationSerializer
+    permission_classes = [IsAuthenticated]
+
+    # Valeur d'une clé réservée dont le résultat n'est pas encore enregistré
+    IN_PROGRESS = 'in_progress'
+
+    def post(self, request):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        operations = serializer.validated_data['operations']
+        user = request.user
+
+        keys = {
+            index: f"batch-op:{user.pk}:{operation['idempotency_key']}"
+            for index, operation in enumerate(operations) if operation.get('idempotency_key')
+        }
+        results = [None] * len(operations)
+        reserved = self.reserve(keys, operations, results)
+        pending = [(index, operation) for index, operation in enumerate(operations) if results[index] is None]
+
+        try:
+            with transaction.atomic():
+                # Les lots d'un même utilisateur s'appliquent l'un après l'autre, sur un état relu sous ce verrou
+                list(get_user_model().objects.select_for_update().filter(pk=user.pk).values_list('pk', flat=True))
+                existing = set(PrivateEvent.objects.filter(pk__in={operation['event_id'] for _, operation in pending}).values_list('pk', flat=True))
+                wishlist, registrations = [], []
+                for index, operation in pending:
+                    if operation['event_id'] not in existing:
+                        results[index] = self.result(operation, 'invalid', errors=["Cet événement n'existe pas."])
+                    elif operation['op'] in BatchOperationSerializer.WISHLIST_OPERATIONS:
+                        wishlist.append((index, operation))
+                    else:
+                        registrations.append((index, operation))
+                self.apply_wishlist(user, wishlist, results)
+                self.apply_registrations(request, registrations, results)
+
+                # Seuls les résultats validés sont mémorisés : la clé d'une opération refusée est libérée
+                stored = {
+                    keys[index]: results[index]
+                    for index, _ in pending if index in keys and results[index]['status'] != 'invalid'
+                }
+                released = [key for key in reserved if key not in stored]
+                transaction.on_commit(lambda: cache.set_many(stored, settings.IDEMPOTENCY_KEY_SECONDS))
+                transaction.on_commit(lambda: cache.delete_many(released))
+        except Exception:
+            cache.delete_many(reserved)  # Rien n'a été appliqué : les opérations pourront être retentées
+            raise
+
+        return Response({'results': results})
+
+    def reserve(self, keys, operations, results):
+        """
+        Réserve les clés d'idempotence encore inconnues. Une clé déjà présente renvoie son résultat enregistré,
+        ou « in_progress » si l'opération est en cours de traitement par une autre requête.
+
+        Returns:
+            list: Les clés réservées par cette requête.
+        """
+        reserved = []
+        for index, key in keys.items():
+            if cache.add(key, self.IN_PROGRESS, settings.IDEMPOTENCY_PENDING_SECONDS):
+                reserved.append(key)
+                continue
+            stored = cache.get(key)
+            if isinstance(stored, dict):
+                results[index] = {**stored, 'replayed': True}
+            else:
+                results[index] = self.result(operations[index], self.IN_PROGRESS)
+        return reserved
+
+    def result(self, operation, outcome, errors=None):
+        result = {'op': operation['op'], 'event_id': operation['event_id'], 'status': outcome, 'replayed': False}
+        if operation.get('occurrence_date'):
+            result['occurrence_date'] = operation['occurrence_date']
+        if errors:
+            result['errors'] = errors
+        return result
+
+    def apply_wishlist(self, user, operations, results):
+        """ Résout les bascules d'après l'état courant, puis insère et supprime chaque ensemble en une requête. """
+        if not operations:
+            return
+        # {event_id: date d'ajout} des lignes existantes, relues sous le verrou de l'utilisateur
+        current = dict(Wishlist.objects.filter(user=user, event_id__in=[operation['event_id'] for _, operation in operations]).values_list('event_id', 'created_at'))
+        added, removed = [], []
+        for index, operation in operations:
+            event_id = operation['event_id']
+            add = operation['op'] == 'wishlist_add' or operation['op'] == 'wishlist_toggle' and event_id not in current
+            if add == (event_id in current):
+                results[index] = self.result(operation, 'unchanged')
+                continue
+            (added if add else removed).append(event_id)
+            results[index] = self.result(operation, 'added' if add else 'removed')
+
+        Wishlist.objects.bulk_create([Wishlist(user=user, event_id=event_id) for event_id in added], ignore_conflicts=True)
+        Wishlist.objects.filter(user=user, event_id__in=removed).delete()
+        # Une ligne déjà présente est ignorée par l'insertion : seules les lignes réellement créées sont comptées
+        added = set(Wishlist.objects.filter(user=user, event_id__in=added).values_list('event_id', flat=True)) - current.keys()
+        for index, operation in operations:
+            if results[index]['status'] == 'added' and operation['event_id'] not in added:
+                results[index] = self.result(operation, 'unchanged')
+        for event_id in added:
+            record_wishlist(event_id)
+            WISHLIST_TOGGLES.inc(action='added')
+        for event_id in removed:
+            record_wishlist(event_id, removed=True, added_at=current[event_id])
+            WISHLIST_TOGGLES.inc(action='removed')
+
+    def apply_registrations(self, request, operations, results):
+        """
+        Les inscriptions sont validées une à une avec les règles de l'endpoint unitaire (capacité, occurrence,
+        événement commencé), puis insérées ensemble ; les désinscriptions sont supprimées en une requête.
+        """
+        user = request.user
+        registrations, cancellations = [], []
+        targets = {(operation['event_id'], operation.get('occurrence_date')) for _, operation in operations}
+        before = self.registered(user, targets)
+        for index, operation in operations:
+            if operation['op'] == 'unregister':
+                cancellations.append((index, operation))
+                continue
+            registration = EventRegistrationSerializer(
+                data={'event_id': operation['event_id'], 'occurrence_date': operation.get('occurrence_date')},
+                context={'request': request},
+            )
+            if not registration.is_valid():
+                errors = [str(error) for messages in registration.errors.values() for error in messages]
+                results[index] = self.result(operation, 'invalid', errors=errors)
+                continue
+            registrations.append((index, operation, EventRegistration(user=user, **registration.validated_data)))
+
+        EventRegistration.objects.bulk_create([registration for _, _, registration in registrations], ignore_conflicts=True)
+        # Une inscription déjà présente est ignorée par l'insertion : seules les lignes réellement créées sont comptées
+        inserted = self.registered(user, {(registration.event_id, registration.occurrence_date) for _, _, registration in registrations}) - before
+        created = []
+        for index, operation, registration in registrations:
+            is_new = (registration.event_id, registration.occurrence_date) in inserted
+            results[index] = self.result(operation, 'registered' if is_new else 'unchanged')
+            if is_new:
+                created.append(registration)
+
+        PrivateEvent.participants.through.objects.bulk_create([
+            PrivateEvent.participants.through(privateevent_id=registration.event_id, user_id=user.pk)
+            for registration in created
+        ], ignore_conflicts=True)
+        for registration in created:
+            record_registration(registration.event_id, user.pk)
+            EVENT_REGISTRATIONS.inc()
+
+        if not cancellations:
+            return
+        targets = reduce(operator.or_, (
+            Q(event_id=operation['event_id'], occurrence_date=operation.get('occurrence_date'))
+            for _, operation in cancellations
+        ))
+        found = {
+            (event_id, occurrence_date): registered_at
+            for event_id, occurrence_date, registered_at in EventRegistration.objects.filter(targets, user=user)
+            .values_list('event_id', 'occurrence_date', 'registered_at')
+        }
+        EventRegistration.objects.filter(targets, user=user).delete()
+        for index, operation in cancellations:
+            cancelled = (operation['event_id'], operation.get('occurrence_date')) in found
+            results[index] = self.result(operation, 'unregistered' if cancelled else 'unchanged')
+
+        # Libère les places comme l'endpoint unitaire : participant retiré s'il n'a plus d'occurrence, puis promotion
+        event_ids = {event_id for event_id, _ in found}
+        remaining = set(EventRegistration.objects.filter(user=user, event_id__in=event_ids).values_list('event_id', flat=True))
+        PrivateEvent.participants.through.objects.filter(user_id=user.pk, privateevent_id__in=event_ids - remaining).delete()
+        for (event_id, _), registered_at in found.items():
+            record_registration(event_id, user.pk, cancelled=True, registered_at=registered_at)
+        for event in PrivateEvent.objects.filter(pk__in=event_ids):
+            event.promote_from_waitlist()
+
+    def registered(self, user, targets):
+        """ Couples (event_id, occurrence_date) parmi `targets` auxquels l'utilisateur est inscrit. """
+        if not targets:
+            return set()
+        rows = EventRegistration.objects.filter(user=user, event_id__in={event_id for event_id, _ in targets})
+        return set(rows.values_list('event_id', 'occurrence_date')) & targets
+
+
+class EventHistoryViewSet(viewsets.ReadOnlyModelViewSet):
+    """ Historique en lecture seule des événements archivés organisés ou suivis par l'utilisateur """
+    serializer_class = ArchivedPrivateEventSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        user = self.request.user
+        registered = ArchivedEventRegistration.objects.filter(event=OuterRef('pk'), user=user)
+        return (
+            ArchivedPrivateEvent.objects
+            .filter(Q(organizer=user) | Q(Exists(registered)))
+            .select_related('organizer__profile')
+            .annotate(participants_count=Count('registrations'), was_registered=Exists(registered))
+            .order_by('-date', '-time')
+        )
+
+
 class MyUpcomingEventsView(generics.ListAPIView):
     """ Vue pour récupérer les événements à venir de l'utilisateur """
     serializer_class = PrivateEventSerializer
@@ -102,6 +568,141 @@ class MyUpcomingEventsView(generics.ListAPIView):
 
     def get_queryset(self):
         user = self.request.user
-        now = timezone.now()
-        # Récupérer les événements futurs auxquels l'utilisateur est inscrit
-        return PrivateEvent.objects.filter(participants=user, date__gte=now.date())
+        # Récupérer les événements pas encore commencés auxquels l'utilisateur est inscrit
+        return PrivateEvent.objects.filter(PrivateEvent.upcoming(timezone.now()), participants=user)
+
+
+async def authenticate_async(request):
+    """ Authentifie la requête via JWT sans bloquer la boucle d'événements. """
+    result = await sync_to_async(PlanrJWTAuthentication().authenticate)(request)
+    if result is None:
+        raise NotAuthenticated()
+    request.user = result[0]
+    return request.user
+
+
+class AsyncEventView(View):
+    """ Vue de base asynchrone (ASGI) pour les lectures d'événements """
+    chunk_size = 100
+
+    def render(self, data, status_code=status.HTTP_200_OK):
+        """ Rend la réponse avec le même renderer JSON que DRF (clés en camelCase). """
+        renderer = api_settings.DEFAULT_RENDERER_CLASSES[0]()
+        return HttpResponse(renderer.render(data), status=status_code, content_type=renderer.media_type)
+
+    async def dispatch(self, request, *args, **kwargs):
+        try:
+            await authenticate_async(request)
+        except (NotAuthenticated, AuthenticationFailed) as e:
+            data = e.detail if isinstance(e.detail, (list, dict)) else {'detail': e.detail}
+            response = self.render(data, status_code=e.status_code)
+            response['WWW-Authenticate'] = PlanrJWTAuthentication().authenticate_header(request)
+            return response
+        return await super().dispatch(request, *args, **kwargs)
+
+    def base_queryset(self):
+        return PrivateEvent.objects.select_related('organizer__profile').prefetch_related(PrivateEvent.participants_prefetch())
+
+    def participants_preview_requested(self, request):
+        return request.GET.get('participants') == 'preview'
+
+    async def participant_previews(self, request, event_ids):
+        """ Aperçus des participants (?participants=preview), calculés hors de la boucle d'événements. """
+        if not self.participants_preview_requested(request):
+            return {}
+        previews = await sync_to_async(PrivateEvent.participant_previews)(event_ids, settings.PARTICIPANT_PREVIEW_SIZE)
+        return {'participant_previews': previews}
+
+    async def serialize_events(self, request, queryset):
+        """ Charge les événements en flux et calcule les sous-requêtes indépendantes en parallèle. """
+        if self.participants_preview_requested(request):
+            queryset = queryset.prefetch_related(None).select_related('organizer__profile')
+        events = [event async for event in queryset.aiterator(chunk_size=self.chunk_size)]
+        event_ids = [event.id for event in events]
+
+        async def wishlist_counts():
+            rows = Wishlist.objects.filter(event_id__in=event_ids).values('event_id').annotate(total=Count('id'))
+            return {row['event_id']: row['total'] async for row in rows}
+
+        async def event_ids_for(model):
+            rows = model.objects.filter(user=request.user, event_id__in=event_ids).values_list('event_id', flat=True)
+            return {event_id async for event_id in rows}
+
+        counts, wishlisted_ids, registered_ids, previews = await asyncio.gather(
+            wishlist_counts(), event_ids_for(Wishlist), event_ids_for(EventRegistration), self.participant_previews(request, event_ids)
+        )
+        context = {
+            'request': request,
+            'wishlist_counts': counts,
+            'wishlisted_ids': wishlisted_ids,
+            'registered_ids': registered_ids,
+            **previews,
+        }
+        # Toutes les relations sont préchargées : la sérialisation ne touche plus la base
+        return PrivateEventSerializer(events, many=True, context=context).data
+
+
+class AsyncPrivateEventView(AsyncEventView):
+    """ Variante asynchrone de la liste et du détail de PrivateEventViewSet """
+    filter_backends = PrivateEventViewSet.filter_backends
+    filterset_fields = PrivateEventViewSet.filterset_fields
+    search_fields = PrivateEventViewSet.search_fields
+    ordering_fields = PrivateEventViewSet.ordering_fields
+
+    def filter_queryset(self, request, queryset):
+        """ Applique les mêmes filtres, recherche et tri que la vue synchrone. """
+        drf_request = Request(request)
+        for backend in self.filter_backends:
+            queryset = backend().filter_queryset(drf_request, queryset, self)
+        return queryset
+
+    def paginator(self):
+        """ Même pagination que PrivateEventViewSet (aucune par défaut). """
+        pagination_class = PrivateEventViewSet.pagination_class
+        return pagination_class() if pagination_class is not None else None
+
+    def paginate_ids(self, request, queryset, paginator):
+        """ Identifiants de la page demandée, lus comme par la vue synchrone ; None si la pagination est désactivée. """
+        page = paginator.paginate_queryset(queryset.select_related(None).prefetch_related(None).only('pk'), Request(request), view=self)
+        return None if page is None else [event.pk for event in page]
+
+    async def get(self, request, pk=None):
+        queryset = self.base_queryset().filter(PrivateEvent.upcoming(timezone.now()))
+
+        if pk is not None:
+            queryset = queryset.filter(pk=pk)
+            event = await queryset.afirst()
+            if event is None:
+                return self.render({'detail': 'No PrivateEvent matches the given query.'}, status.HTTP_404_NOT_FOUND)
+
+            wishlist_count, is_wishlisted, is_registered, previews = await asyncio.gather(
+                Wishlist.objects.filter(event_id=pk).acount(),
+                Wishlist.objects.filter(user=request.user, event_id=pk).aexists(),
+                EventRegistration.objects.filter(user=request.user, event_id=pk).aexists(),
+                self.participant_previews(request, [event.id]),
+            )
+            context = {
+                'request': request,
+                'wishlist_counts': {event.id: wishlist_count},
+                'wishlisted_ids': {event.id} if is_wishlisted else set(),
+                'registered_ids': {event.id} if is_registered else set(),
+                **previews,
+            }
+            return self.render(PrivateEventSerializer(event, context=context).data)
+
+        # Les filtres django-filter valident leurs valeurs en base : exécution hors de la boucle
+        queryset = await sync_to_async(self.filter_queryset)(request, queryset)
+        paginator = self.paginator()
+        ids = None if paginator is None else await sync_to_async(self.paginate_ids)(request, queryset, paginator)
+        if ids is None:
+            return self.render(await self.serialize_events(request, queryset))
+        rows = {row['id']: row for row in await self.serialize_events(request, self.base_queryset().filter(pk__in=ids))}
+        return self.render(paginator.get_paginated_response([rows[pk] for pk in ids]).data)
+
+
+class AsyncMyUpcomingEventsView(AsyncEventView):
+    """ Variante asynchrone de MyUpcomingEventsView """
+
+    async def get(self, request):
+        queryset = self.base_queryset().filter(PrivateEvent.upcoming(timezone.now()), participants=request.user)
+        return self.render(await self.serialize_events(request, queryset))
@@ -0,0 +1,91 @@
+import math
+import statistics
+import time
+from contextlib import contextmanager
+
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+
+def percentile(values, pct):
+    """
+    Calcule un percentile par la méthode du rang le plus proche.
+
+    Args:
+        values (list): Les mesures (non triées).
+        pct (float): Le percentile voulu, entre 0 et 100.
+
+    Returns:
+        float: La valeur du percentile, ou 0.0 si aucune mesure.
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(math.ceil(pct / 100 * len(ordered)) - 1, 0)
+    return ordered[rank]
+
+
+def summarize(latencies, elapsed):
+    """
+    Résume une série de latences (en secondes) mesurées pendant `elapsed` secondes.
+
+    Returns:
+        dict: Nombre de requêtes, débit (req/s) et latences p50/p99/moyenne en millisecondes.
+    """
+    return {
+        'requests': len(latencies),
+        'throughput': round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        'p50_ms': round(percentile(latencies, 50) * 1000, 3),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 3),
+        'mean_ms': round(statistics.fmean(latencies) * 1000, 3) if latencies else 0.0,
+    }
+
+
+@contextmanager
+def timer():
+    """
+    Mesure la durée d'un bloc. La durée (en secondes) est disponible dans `result['elapsed']`.
+    """
+    result = {}
+    start = time.perf_counter()
+    try:
+        yield result
+    finally:
+        result['elapsed'] = time.perf_counter() - start
+
+
+@contextmanager
+def rolled_back(using=DEFAULT_DB_ALIAS):
+    """
+    Exécute le bloc dans une transaction toujours annulée : le jeu de données d'un benchmark ne reste pas en base.
+    """
+    with transaction.atomic(using=using):
+        yield
+        transaction.set_rollback(True, using=using)
+
+
+def measure(func, repeat, using=DEFAULT_DB_ALIAS):
+    """
+    Appelle `func` `repeat` fois et mesure la latence et le nombre de requêtes SQL de chaque appel.
+
+    Returns:
+        dict: Le résumé de `summarize`, complété du nombre moyen de requêtes SQL par appel.
+    """
+    latencies, queries = [], 0
+
+    def count_query(execute, sql, params, many, context):
+        nonlocal queries
+        queries += 1
+        return execute(sql, params, many, context)
+
+    # Un wrapper plutôt que connection.queries, plafonné à 9000 entrées
+    with connections[using].execute_wrapper(count_query):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            call_start = time.perf_counter()
+            func()
+            latencies.append(time.perf_counter() - call_start)
+        elapsed = time.perf_counter() - start
+    return {
+        **summarize(latencies, elapsed),
+        'queries_per_call': round(queries / repeat, 2) if repeat else 0.0,
+    }
@@ -0,0 +1,93 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+REPLICA_DB_ALIAS = 'replica'
+
+
+class RequestRouting:
+    """
+    État du routage d'une requête. Objet mutable : les modifications faites dans un thread de
+    sync_to_async (authentification d'une vue synchrone sous ASGI) restent visibles du middleware.
+    """
+
+    def __init__(self, replica_reads):
+        self.replica_reads = replica_reads
+        self.user_id = None  # Renseigné par l'authentification JWT, clé de l'épinglage après écriture
+
+
+_routing = ContextVar('replica_routing', default=None)
+
+
+@contextmanager
+def request_routing(replica_reads):
+    """ Ouvre le routage d'une requête (voir ReplicaRoutingMiddleware) et le retourne. """
+    routing = RequestRouting(replica_reads)
+    token = _routing.set(routing)
+    try:
+        yield routing
+    finally:
+        _routing.reset(token)
+
+
+def read_from_replica():
+    """ Autorise les lectures sur le réplica dans le bloc (tâche, script, contexte asynchrone). """
+    return request_routing(replica_reads=True)
+
+
+def pin_primary():
+    """
+    Renvoie vers le primaire les lectures restantes du contexte courant, par exemple pour relire
+    une écriture faite pendant une requête sûre. Sans effet hors d'un bloc read_from_replica.
+    """
+    routing = _routing.get()
+    if routing is not None:
+        routing.replica_reads = False
+
+
+def pin_key(user_id):
+    return f'replica-pin:{user_id}'
+
+
+def route_user(user_id):
+    """
+    Appelé par l'authentification JWT une fois le token validé, avant toute lecture de l'utilisateur :
+    retient l'utilisateur pour l'épinglage après écriture, et renvoie ses lectures au primaire
+    s'il a écrit depuis moins de REPLICA_PIN_SECONDS.
+    """
+    routing = _routing.get()
+    if routing is None or user_id is None:
+        return
+    routing.user_id = user_id
+    if routing.replica_reads and cache.get(pin_key(user_id)) is not None:
+        routing.replica_reads = False
+
+
+def pin_user(user_id):
+    """ Épingle l'utilisateur au primaire après une écriture réussie. """
+    cache.set(pin_key(user_id), True, settings.REPLICA_PIN_SECONDS)
+
+
+class PrimaryReplicaRouter:
+    """
+    Les écritures vont toujours au primaire. Les lectures ne vont au réplica que dans un bloc
+    read_from_replica, jusqu'à un éventuel pin_primary(). Les lectures verrouillantes (select_for_update)
+    passent par db_for_write et vont donc au primaire.
+    """
+
+    def db_for_read(self, model, **hints):
+        routing = _routing.get()
+        if routing is not None and routing.replica_reads and REPLICA_DB_ALIAS in connections:
+            return REPLICA_DB_ALIAS
+        return None
+
+    def db_for_write(self, model, **hints):
+        # Sans effet de bord : Django appelle aussi cette méthode pour des lectures (select_for_update, managers de relation)
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True  # Le réplica est une copie du primaire
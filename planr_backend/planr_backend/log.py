@@ -0,0 +1,75 @@
+import copy
+import json
+import logging
+import queue
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+
+class JsonFormatter(logging.Formatter):
+    """ Formate chaque enregistrement en une ligne JSON. """
+
+    def format(self, record):
+        entry = {
+            'timestamp': datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'module': record.module,
+            'line': record.lineno,
+            'thread': record.threadName,
+        }
+        status_code = getattr(record, 'status_code', None)  # Ajouté par django.request et django.server
+        if status_code is not None:
+            entry['status_code'] = status_code
+        if record.exc_info or record.exc_text:
+            # exc_text : trace déjà formatée par QueueRotatingFileHandler.prepare dans le thread appelant
+            entry['exception'] = record.exc_text or self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class QueueRotatingFileHandler(QueueHandler):
+    """
+    Handler non bloquant : le thread de la requête ne fait que déposer l'enregistrement dans une file,
+    un thread dédié (QueueListener) le formate et l'écrit dans un fichier à rotation par taille.
+    Si la file est pleine, l'enregistrement est abandonné plutôt que de bloquer la requête.
+    """
+
+    def __init__(self, filename, max_bytes=10 * 1024 * 1024, backup_count=5, queue_size=10000):
+        super().__init__(queue.Queue(queue_size))
+        self.target = RotatingFileHandler(filename, maxBytes=max_bytes, backupCount=backup_count, encoding='utf-8')
+        self.dropped = 0
+        self.listener = QueueListener(self.queue, self.target, respect_handler_level=True)
+        self.listener.start()  # Arrêté (et la file vidée) par close(), appelé par logging.shutdown à la sortie
+
+    def setFormatter(self, fmt):
+        # Le formatage est fait par le thread d'écriture, pas par le thread de la requête
+        self.target.setFormatter(fmt)
+
+    def prepare(self, record):
+        """
+        Comme QueueHandler.prepare : le message et la trace sont résolus dans le thread appelant, sur une copie.
+        Un argument modifié après l'appel ne change pas le message, et la file ne retient ni les arguments
+        ni l'exception, ni la requête ajoutée par django.request. Seule la mise en forme JSON est différée.
+        """
+        record = copy.copy(record)
+        record.msg = record.message = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = record.exc_text or logging.Formatter().formatException(record.exc_info)
+        record.exc_info = None
+        record.__dict__.pop('request', None)
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def close(self):
+        if self.listener is not None:
+            self.listener.stop()
+            self.listener = None
+            self.target.close()
+        super().close()
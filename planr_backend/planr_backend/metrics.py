@@ -0,0 +1,288 @@
+import atexit
+import fcntl
+import functools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from django.conf import settings
+
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class MetricsRegistry:
+    """
+    Registre de métriques en mémoire, au format d'exposition texte Prometheus.
+
+    Avec METRICS_DIR, chaque processus (worker gunicorn) écrit périodiquement ses valeurs dans
+    un fichier `<pid>.json` de ce répertoire ; l'exposition additionne les fichiers de tous les workers.
+    Le fichier d'un worker terminé (ou tué) est replié dans `archive.json` puis supprimé : les compteurs
+    restent croissants sans que le répertoire grossisse à chaque recyclage de worker.
+    """
+    ARCHIVE = 'archive.json'
+
+    def __init__(self, flush_interval=1.0):
+        self.lock = threading.Lock()
+        self.metrics = {}
+        self.flush_interval = flush_interval
+        self.last_flush = 0.0
+        self.pid = os.getpid()
+        self.flushed_pid = None
+        atexit.register(self.retire)
+
+    @property
+    def directory(self):
+        directory = getattr(settings, 'METRICS_DIR', None)
+        return Path(directory) if directory else None
+
+    def register(self, metric):
+        self.metrics[metric.name] = metric
+        return metric
+
+    def updated(self):
+        """ Appelé après chaque mise à jour : écrit le fichier du processus au plus une fois par intervalle. """
+        if self.directory and time.monotonic() - self.last_flush >= self.flush_interval:
+            self.flush()
+
+    def check_fork(self):
+        # Après un fork (gunicorn --preload), le worker repart de zéro pour ne pas compter deux fois le maître
+        if os.getpid() != self.pid:
+            self.pid = os.getpid()
+            for metric in self.metrics.values():
+                metric.values.clear()
+
+    def dump(self):
+        with self.lock:
+            return {name: metric.dump() for name, metric in self.metrics.items()}
+
+    @contextmanager
+    def locked(self, directory):
+        """ Verrou exclusif entre processus sur le répertoire (archivage et lecture de l'ensemble des fichiers). """
+        directory.mkdir(parents=True, exist_ok=True)
+        with open(directory / '.lock', 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            yield  # Verrou libéré à la fermeture du fichier
+
+    def flush(self):
+        directory = self.directory
+        if not directory:
+            return
+        path = directory / f'{os.getpid()}.json'
+        if self.flushed_pid != os.getpid():
+            # Fichier laissé par un processus mort dont le pid a été réattribué : il ne doit pas être écrasé
+            with self.locked(directory):
+                self.archive(directory, path)
+            self.flushed_pid = os.getpid()
+        tmp_path = path.with_suffix('.tmp')
+        tmp_path.write_text(json.dumps(self.dump()))
+        os.replace(tmp_path, path)  # Remplacement atomique : un lecteur ne voit jamais de fichier partiel
+        self.last_flush = time.monotonic()
+
+    def retire(self):
+        """ À la sortie du processus : ses dernières valeurs rejoignent l'archive et son fichier disparaît. """
+        directory = self.directory
+        if not directory:
+            return
+        self.flush()
+        with self.locked(directory):
+            self.archive(directory, directory / f'{os.getpid()}.json')
+        with self.lock:
+            # Valeurs désormais portées par l'archive : un flush ultérieur ne doit pas les recompter
+            for metric in self.metrics.values():
+                metric.values.clear()
+
+    def archive(self, directory, path):
+        """ Additionne le fichier d'un processus à l'archive puis le supprime (verrou tenu par l'appelant). """
+        data = self.read(path)
+        if data is None:
+            return
+        archive_path = directory / self.ARCHIVE
+        archived = self.read(archive_path) or {}
+        for name, samples in data.items():
+            metric = self.metrics.get(name)
+            if metric is not None:
+                metric.merge(archived.setdefault(name, {}), samples)
+        tmp_path = archive_path.with_suffix('.tmp')
+        tmp_path.write_text(json.dumps(archived))
+        os.replace(tmp_path, archive_path)
+        path.unlink()
+
+    @staticmethod
+    def read(path):
+        try:
+            return json.loads(path.read_text())
+        except (OSError, ValueError):
+            return None  # Fichier absent ou supprimé entre-temps
+
+    @staticmethod
+    def is_alive(pid):
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            pass  # Processus d'un autre utilisateur
+        return True
+
+    def collect(self):
+        """ Retourne les valeurs de tous les processus, vivants ou archivés, additionnées par métrique et par labels. """
+        directory = self.directory
+        if not directory:
+            return self.dump()
+
+        self.flush()
+        merged = {}
+        with self.locked(directory):
+            for path in directory.glob('*.json'):
+                if path.stem.isdigit() and not self.is_alive(int(path.stem)):
+                    self.archive(directory, path)  # Worker tué sans passer par atexit
+
+            for path in directory.glob('*.json'):
+                data = self.read(path)
+                if data is None:
+                    continue
+                for name, samples in data.items():
+                    metric = self.metrics.get(name)
+                    if metric is not None:
+                        metric.merge(merged.setdefault(name, {}), samples)
+        return merged
+
+    def exposition(self):
+        """ Génère le texte au format d'exposition Prometheus (version 0.0.4). """
+        collected = self.collect()
+        lines = []
+        for name, metric in sorted(self.metrics.items()):
+            lines.append(f'# HELP {name} {metric.documentation}')
+            lines.append(f'# TYPE {name} {metric.type}')
+            lines.extend(metric.exposition(collected.get(name, {})))
+        return '\n'.join(lines) + '\n'
+
+
+def format_labels(labels):
+    if not labels:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for value in labels.values())
+    return '{' + ','.join(f'{name}="{value}"' for name, value in zip(labels, escaped)) + '}'
+
+
+class Metric:
+    type = None
+
+    def __init__(self, name, documentation, labelnames=(), registry=None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.values = {}
+        self.registry = registry or REGISTRY
+        self.registry.register(self)
+
+    def key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"Labels attendus pour {self.name} : {self.labelnames}")
+        return json.dumps([str(labels[name]) for name in self.labelnames])
+
+    def labels_of(self, key):
+        return dict(zip(self.labelnames, json.loads(key)))
+
+    def dump(self):
+        return dict(self.values)
+
+
+class Counter(Metric):
+    type = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self.key(labels)
+        with self.registry.lock:
+            self.registry.check_fork()
+            self.values[key] = self.values.get(key, 0) + amount
+        self.registry.updated()
+
+    def merge(self, merged, samples):
+        for key, value in samples.items():
+            merged[key] = merged.get(key, 0) + value
+
+    def exposition(self, samples):
+        return [f'{self.name}_total{format_labels(self.labels_of(key))} {value}' for key, value in sorted(samples.items())]
+
+
+class Histogram(Metric):
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS, registry=None):
+        self.buckets = tuple(buckets)
+        super().__init__(name, documentation, labelnames, registry)
+
+    def observe(self, value, **labels):
+        key = self.key(labels)
+        with self.registry.lock:
+            self.registry.check_fork()
+            sample = self.values.get(key)
+            if sample is None:
+                sample = self.values[key] = {'buckets': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    sample['buckets'][index] += 1
+                    break
+            sample['sum'] += value
+            sample['count'] += 1
+        self.registry.updated()
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def dump(self):
+        return {key: {**sample, 'buckets': list(sample['buckets'])} for key, sample in self.values.items()}
+
+    def merge(self, merged, samples):
+        for key, sample in samples.items():
+            target = merged.setdefault(key, {'buckets': [0] * len(self.buckets), 'sum': 0.0, 'count': 0})
+            target['buckets'] = [a + b for a, b in zip(target['buckets'], sample['buckets'])]
+            target['sum'] += sample['sum']
+            target['count'] += sample['count']
+
+    def exposition(self, samples):
+        lines = []
+        for key, sample in sorted(samples.items()):
+            labels = self.labels_of(key)
+            cumulative = 0
+            for bound, count in zip(self.buckets, sample['buckets']):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{format_labels({**labels, "le": bound})} {cumulative}')
+            lines.append(f'{self.name}_bucket{format_labels({**labels, "le": "+Inf"})} {sample["count"]}')
+            lines.append(f'{self.name}_sum{format_labels(labels)} {sample["sum"]}')
+            lines.append(f'{self.name}_count{format_labels(labels)} {sample["count"]}')
+        return lines
+
+
+def timed(operation):
+    """ Décorateur qui mesure la durée d'une opération métier dans OPERATION_DURATION. """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with OPERATION_DURATION.time(operation=operation):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+REGISTRY = MetricsRegistry()
+
+# Métriques métier
+OPERATION_DURATION = Histogram('planr_operation_duration_seconds', "Durée des opérations métier.", ['operation'])
+LOGINS = Counter('planr_logins', "Tentatives de connexion par méthode et résultat.", ['method', 'outcome'])
+OTP_SENT = Counter('planr_otp_sent', "OTP envoyés par canal et motif.", ['channel', 'reason'])
+OTP_VERIFICATIONS = Counter('planr_otp_verifications', "Vérifications d'OTP par résultat.", ['outcome'])
+ACCOUNT_LOCKOUTS = Counter('planr_account_lockouts', "Verrouillages de compte par motif.", ['reason'])
+EVENT_REGISTRATIONS = Counter('planr_event_registrations', "Inscriptions à des événements.")
+CAPACITY_REJECTIONS = Counter('planr_event_capacity_rejections', "Inscriptions refusées car l'événement est complet.")
+WISHLIST_TOGGLES = Counter('planr_wishlist_toggles', "Ajouts et retraits de wishlist.", ['action'])
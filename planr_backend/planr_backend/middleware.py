@@ -0,0 +1,276 @@
+import cProfile
+import logging
+import random
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured, MiddlewareNotUsed
+from django.db import connections
+from django.http import QueryDict
+from djangorestframework_camel_case.settings import api_settings as camel_case_settings
+from djangorestframework_camel_case.util import camel_to_underscore
+from rest_framework.permissions import SAFE_METHODS
+
+from .db_routers import REPLICA_DB_ALIAS, pin_user, request_routing
+
+
+logger = logging.getLogger(__name__)
+
+MAX_CACHED_KEYS = 10000
+_underscore_keys = {}
+
+
+def underscore_key(key):
+    """ Convertit une clé camelCase en snake_case, avec mémoïsation. """
+    try:
+        return _underscore_keys[key]
+    except KeyError:
+        underscored = camel_to_underscore(key, **camel_case_settings.JSON_UNDERSCOREIZE)
+        if len(_underscore_keys) < MAX_CACHED_KEYS:
+            _underscore_keys[key] = underscored
+        return underscored
+
+
+class AsyncCapableMiddleware:
+    """
+    Base des middlewares du projet, utilisables en WSGI comme en ASGI : sous ASGI, Django n'exécute
+    une vue asynchrone sans passer par un thread que si tous les middlewares de la chaîne sont asynchrones.
+    """
+    sync_capable = async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return self.handle(request)
+
+    def handle(self, request):
+        raise NotImplementedError
+
+    async def __acall__(self, request):
+        raise NotImplementedError
+
+
+class CamelCaseQueryParamsMiddleware(AsyncCapableMiddleware):
+    """
+    Convertit les paramètres de requête camelCase en snake_case, comme CamelCaseMiddleWare,
+    sans recompiler d'expression régulière et sans rien faire pour les requêtes sans paramètres.
+    """
+
+    def handle(self, request):
+        self.underscore_params(request)
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        self.underscore_params(request)
+        return await self.get_response(request)
+
+    @staticmethod
+    def underscore_params(request):
+        if request.GET:
+            query = QueryDict(mutable=True)
+            for key, values in request.GET.lists():
+                query.setlist(underscore_key(key), values)
+            request.GET = query
+
+
+class ReplicaRoutingMiddleware(AsyncCapableMiddleware):
+    """
+    Envoie les lectures des requêtes sûres (GET, HEAD, OPTIONS) vers le réplica.
+    Après une écriture réussie, l'utilisateur est épinglé au primaire pendant REPLICA_PIN_SECONDS
+    pour toujours relire ses propres écritures malgré le retard de réplication, même avec un token rafraîchi.
+    L'utilisateur est connu par l'authentification JWT de DRF (route_user), le token n'est pas relu ici.
+    L'épinglage est stocké dans le cache : il doit être partagé par tous les workers.
+    """
+
+    def __init__(self, get_response):
+        if REPLICA_DB_ALIAS not in connections:
+            raise MiddlewareNotUsed
+        if settings.CACHES['default']['BACKEND'].endswith('LocMemCache'):
+            raise ImproperlyConfigured(
+                "Le réplica (DB_REPLICA_HOST) nécessite un cache partagé entre workers (CACHE_BACKEND) : "
+                "avec LocMemCache, une lecture servie par un autre worker ne verrait pas l'épinglage au primaire."
+            )
+        super().__init__(get_response)
+
+    def handle(self, request):
+        with request_routing(self.replica_reads(request)) as routing:
+            response = self.get_response(request)
+        if self.should_pin(request, routing, response):
+            pin_user(routing.user_id)
+        return response
+
+    async def __acall__(self, request):
+        # Le ContextVar est copié dans les threads de sync_to_async : les requêtes SQL de la vue le voient
+        with request_routing(self.replica_reads(request)) as routing:
+            response = await self.get_response(request)
+        if self.should_pin(request, routing, response):
+            await sync_to_async(pin_user)(routing.user_id)
+        return response
+
+    @staticmethod
+    def replica_reads(request):
+        # Les sessions (admin) ne sont pas suivies par l'épinglage : elles restent sur le primaire
+        return request.method in SAFE_METHODS and settings.SESSION_COOKIE_NAME not in request.COOKIES
+
+    @staticmethod
+    def should_pin(request, routing, response):
+        return request.method not in SAFE_METHODS and routing.user_id is not None and response.status_code < 400
+
+
+class RequestStats:
+    """ Mesures collectées pendant le traitement d'une requête. """
+
+    def __init__(self):
+        self.query_count = 0
+        self.query_seconds = 0.0
+        self.render_seconds = 0.0
+
+    def record_query(self, execute, sql, params, many, context):
+        """ Wrapper d'exécution SQL (connection.execute_wrapper) qui chronomètre chaque requête. """
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.query_count += 1
+            self.query_seconds += time.perf_counter() - start
+
+
+class RequestMetrics:
+    """ Agrégats par vue (histogramme de durée, requêtes SQL, taille de réponse), partagés par les threads du processus. """
+    BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, float('inf'))
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.views = {}
+
+    def record(self, view, duration_ms, stats, size):
+        with self.lock:
+            entry = self.views.get(view)
+            if entry is None:
+                entry = self.views[view] = {
+                    'count': 0, 'duration_ms_sum': 0.0, 'duration_ms_max': 0.0,
+                    'queries_sum': 0, 'db_ms_sum': 0.0, 'render_ms_sum': 0.0, 'bytes_sum': 0,
+                    'buckets': [0] * len(self.BUCKETS_MS),
+                }
+            entry['count'] += 1
+            entry['duration_ms_sum'] += duration_ms
+            entry['duration_ms_max'] = max(entry['duration_ms_max'], duration_ms)
+            entry['queries_sum'] += stats.query_count
+            entry['db_ms_sum'] += stats.query_seconds * 1000
+            entry['render_ms_sum'] += stats.render_seconds * 1000
+            entry['bytes_sum'] += size
+            for index, bound in enumerate(self.BUCKETS_MS):
+                if duration_ms <= bound:
+                    entry['buckets'][index] += 1
+                    break
+
+    def snapshot(self):
+        """ Retourne une copie des agrégats, avec les bornes d'histogramme en clair. """
+        with self.lock:
+            return {
+                view: {
+                    **{key: value for key, value in entry.items() if key != 'buckets'},
+                    'histogram_ms': {
+                        ('+Inf' if bound == float('inf') else str(bound)): count
+                        for bound, count in zip(self.BUCKETS_MS, entry['buckets'])
+                    },
+                }
+                for view, entry in self.views.items()
+            }
+
+
+request_metrics = RequestMetrics()
+
+
+class RequestProfilingMiddleware(AsyncCapableMiddleware):
+    """
+    Mesure la durée de chaque requête, le nombre et la durée des requêtes SQL, le temps de rendu
+    et la taille de la réponse. Expose ces mesures dans l'en-tête Server-Timing et les agrège par vue.
+    Un échantillon des requêtes est profilé avec cProfile ; le profil n'est conservé que si la requête est lente.
+    Désactivé (retiré de la chaîne des middlewares) si REQUEST_PROFILING['ENABLED'] est faux.
+    Sous ASGI, cProfile ne voit que le thread de la boucle d'événements, pas les parties synchrones de la vue.
+    """
+
+    def __init__(self, get_response):
+        config = settings.REQUEST_PROFILING
+        if not config['ENABLED']:
+            raise MiddlewareNotUsed()
+        super().__init__(get_response)
+        self.slow_request_ms = config['SLOW_REQUEST_MS']
+        self.profile_sample_rate = config['PROFILE_SAMPLE_RATE']
+        self.profile_dir = Path(config['PROFILE_DIR'])
+
+    def handle(self, request):
+        stats, profiler = self.start(request)
+        start = time.perf_counter()
+        with self.instrument(stats, profiler):
+            response = self.get_response(request)
+        return self.finish(request, response, stats, profiler, start)
+
+    async def __acall__(self, request):
+        stats, profiler = self.start(request)
+        start = time.perf_counter()
+        with self.instrument(stats, profiler):
+            response = await self.get_response(request)
+        return self.finish(request, response, stats, profiler, start)
+
+    def start(self, request):
+        stats = request._profiling_stats = RequestStats()
+        profiler = cProfile.Profile() if random.random() < self.profile_sample_rate else None
+        return stats, profiler
+
+    @contextmanager
+    def instrument(self, stats, profiler):
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(stats.record_query))
+            if profiler:
+                profiler.enable()
+            try:
+                yield
+            finally:
+                if profiler:
+                    profiler.disable()
+
+    def finish(self, request, response, stats, profiler, start):
+        duration_ms = (time.perf_counter() - start) * 1000
+
+        match = request.resolver_match
+        view = f"{request.method} {match.view_name if match else 'unresolved'}"
+        size = 0 if response.streaming else len(response.content)
+
+        response['Server-Timing'] = ', '.join([
+            f'total;dur={duration_ms:.1f}',
+            f'db;dur={stats.query_seconds * 1000:.1f};desc="{stats.query_count} queries"',
+            f'render;dur={stats.render_seconds * 1000:.1f}',
+        ])
+        request_metrics.record(view, duration_ms, stats, size)
+
+        if profiler and duration_ms >= self.slow_request_ms:
+            self.dump_profile(profiler, view, duration_ms)
+        return response
+
+    def process_template_response(self, request, response):
+        # Appelé juste avant le rendu : la sérialisation JSON est mesurée par le callback post-rendu
+        render_start = time.perf_counter()
+
+        def record_render(rendered_response):
+            request._profiling_stats.render_seconds = time.perf_counter() - render_start
+
+        response.add_post_render_callback(record_render)
+        return response
+
+    def dump_profile(self, profiler, view, duration_ms):
+        self.profile_dir.mkdir(parents=True, exist_ok=True)
+        filename = f"{time.strftime('%Y%m%d-%H%M%S')}-{''.join(c if c.isalnum() else '_' for c in view)}.prof"
+        profiler.dump_stats(self.profile_dir / filename)
+        logger.warning("Requête lente (%s, %.0f ms) : profil enregistré dans %s", view, duration_ms, filename)
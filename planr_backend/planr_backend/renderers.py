@@ -0,0 +1,74 @@
+import datetime
+import decimal
+import uuid
+from collections import OrderedDict
+
+from django.utils.encoding import force_str
+from django.utils.functional import Promise
+from djangorestframework_camel_case.settings import api_settings as camel_case_settings
+from djangorestframework_camel_case.util import camelize, camelize_re, underscore_to_camel
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.serializer_helpers import ReturnDict, ReturnList
+
+
+# Les clés rencontrées sont des noms de champs de serializers : un ensemble petit et stable
+MAX_CACHED_KEYS = 10000
+_camel_keys = {}
+
+SCALAR_TYPES = frozenset((
+    str, int, float, bool, type(None),
+    decimal.Decimal, datetime.datetime, datetime.date, datetime.time, uuid.UUID,
+))
+DICT_TYPES = frozenset((dict, OrderedDict, ReturnDict))
+LIST_TYPES = frozenset((list, ReturnList))
+
+
+def camelize_key(key):
+    """
+    Convertit une clé snake_case en camelCase, avec mémoïsation.
+    Produit exactement la même clé que djangorestframework_camel_case.
+    """
+    try:
+        return _camel_keys[key]
+    except KeyError:
+        camel_key = camelize_re.sub(underscore_to_camel, key) if '_' in key else key
+        if len(_camel_keys) < MAX_CACHED_KEYS:
+            _camel_keys[key] = camel_key
+        return camel_key
+
+
+def convert_key(key):
+    """ Convertit une clé de dictionnaire selon les mêmes règles que `camelize`. """
+    if isinstance(key, Promise):
+        key = force_str(key)
+    return camelize_key(key) if isinstance(key, str) else key
+
+
+def fast_camelize(data):
+    """
+    Équivalent de `camelize` pour les structures produites par les serializers (dict, list, scalaires).
+    Tout autre type est délégué à l'implémentation d'origine pour garder une sortie identique.
+    """
+    data_type = type(data)
+    if data_type in SCALAR_TYPES:
+        return data
+    if data_type in DICT_TYPES:
+        return {convert_key(key): fast_camelize(value) for key, value in data.items()}
+    if data_type in LIST_TYPES:
+        return [fast_camelize(item) for item in data]
+    return camelize(data, **camel_case_settings.JSON_UNDERSCOREIZE)
+
+
+class CamelCaseJSONRenderer(JSONRenderer):
+    """
+    Renderer JSON en camelCase, remplaçant celui de djangorestframework_camel_case.
+    Les clés sont converties via un cache au lieu d'une expression régulière par clé et par ligne.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        options = camel_case_settings.JSON_UNDERSCOREIZE
+        if options.get('ignore_fields') or options.get('ignore_keys'):
+            data = camelize(data, **options)  # Options non gérées par le chemin rapide
+        else:
+            data = fast_camelize(data)
+        return super().render(data, accepted_media_type, renderer_context)
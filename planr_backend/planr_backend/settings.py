@@ -38,6 +38,8 @@ INSTALLED_APPS = [
 
 # Définition des middlewares
 MIDDLEWARE = [
+    'planr_backend.middleware.RequestProfilingMiddleware',
+    'planr_backend.middleware.ReplicaRoutingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -46,9 +48,21 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
-    'djangorestframework_camel_case.middleware.CamelCaseMiddleWare',
+    'planr_backend.middleware.CamelCaseQueryParamsMiddleware',
 ]
 
+# Profilage des requêtes (désactivé par défaut, sans surcoût dans ce cas)
+REQUEST_PROFILING = {
+    'ENABLED': os.getenv('REQUEST_PROFILING') == 'True',
+    'SLOW_REQUEST_MS': int(os.getenv('REQUEST_PROFILING_SLOW_MS', '500')),
+    'PROFILE_SAMPLE_RATE': float(os.getenv('REQUEST_PROFILING_SAMPLE_RATE', '0')),
+    'PROFILE_DIR': BASE_DIR / 'profiles',
+}
+
+# Métriques métier (format Prometheus) : répertoire partagé entre workers et jeton d'accès à /metrics/
+METRICS_DIR = os.getenv('METRICS_DIR')
+METRICS_TOKEN = os.getenv('METRICS_TOKEN')
+
 # Configuration des CORS
 CORS_ALLOWED_ORIGINS = [
     "http://localhost:5173",
@@ -79,6 +93,8 @@ TEMPLATES = [
 WSGI_APPLICATION = 'planr_backend.wsgi.application'
 
 # Configuration de la base de données
+# Pool natif de Django 5.1 : nécessite psycopg 3 et psycopg-pool, incompatible avec les connexions persistantes
+DB_POOL = os.getenv('DB_POOL') == 'True'
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.postgresql',
@@ -87,16 +103,90 @@ DATABASES = {
         'PASSWORD': os.getenv('DB_PASSWORD'),
         'HOST': os.getenv('DB_HOST', 'localhost'),
         'PORT': os.getenv('DB_PORT', '5432'),
+        # Durée de vie (s) d'une connexion réutilisée entre requêtes ; 0 ouvre une connexion par requête
+        'CONN_MAX_AGE': 0 if DB_POOL else int(os.getenv('DB_CONN_MAX_AGE', '60')),
+        # Vérifie une connexion réutilisée avant la première requête SQL, pour survivre aux redémarrages de Postgres
+        'CONN_HEALTH_CHECKS': os.getenv('DB_CONN_HEALTH_CHECKS', 'True') == 'True',
+        'OPTIONS': {
+            'pool': {
+                'min_size': int(os.getenv('DB_POOL_MIN_SIZE', '2')),
+                'max_size': int(os.getenv('DB_POOL_MAX_SIZE', '10')),
+                'timeout': float(os.getenv('DB_POOL_TIMEOUT', '10')),
+                'max_idle': float(os.getenv('DB_POOL_MAX_IDLE', '600')),
+            },
+        } if DB_POOL else {},
+    }
+}
+
+# Réplica en lecture seule, utilisé uniquement si DB_REPLICA_HOST est défini. L'épinglage au primaire après
+# écriture passe par le cache : ReplicaRoutingMiddleware refuse de démarrer avec LocMemCache (CACHE_BACKEND)
+if os.getenv('DB_REPLICA_HOST'):
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'HOST': os.getenv('DB_REPLICA_HOST'),
+        'PORT': os.getenv('DB_REPLICA_PORT', DATABASES['default']['PORT']),
+        'OPTIONS': dict(DATABASES['default']['OPTIONS']),
+        'TEST': {'MIRROR': 'default'},
+    }
+DATABASE_ROUTERS = ['planr_backend.db_routers.PrimaryReplicaRouter']
+# Durée (s) pendant laquelle un utilisateur qui vient d'écrire lit sur le primaire
+REPLICA_PIN_SECONDS = int(os.getenv('DB_REPLICA_PIN_SECONDS', '10'))
+
+# Regroupement des événements sur la carte : tuiles interrogées au plus par requête et durée de cache (s)
+MAX_CLUSTER_TILES = int(os.getenv('MAX_CLUSTER_TILES', '32'))
+CLUSTER_CACHE_SECONDS = int(os.getenv('CLUSTER_CACHE_SECONDS', '60'))
+
+# Popularité des événements (?ordering=-trending) : poids de chaque action et demi-vie du score (h)
+TRENDING_WEIGHTS = {'registration': 3.0, 'wishlist': 1.0}
+TRENDING_HALF_LIFE_HOURS = float(os.getenv('TRENDING_HALF_LIFE_HOURS', '24'))
+
+# Lots d'opérations (wishlist, inscriptions) : taille maximale, durée de conservation des clés d'idempotence
+# et durée maximale de leur réservation pendant le traitement (s)
+BATCH_MAX_OPERATIONS = int(os.getenv('BATCH_MAX_OPERATIONS', '100'))
+IDEMPOTENCY_KEY_SECONDS = int(os.getenv('IDEMPOTENCY_KEY_SECONDS', '86400'))
+IDEMPOTENCY_PENDING_SECONDS = int(os.getenv('IDEMPOTENCY_PENDING_SECONDS', '60'))
+
+# Participants dans les listes d'événements (?participants=preview) : taille de l'aperçu
+PARTICIPANT_PREVIEW_SIZE = int(os.getenv('PARTICIPANT_PREVIEW_SIZE', '5'))
+
+# Listes d'événements en lecture rendues par projection values() plutôt que par PrivateEventSerializer
+EVENT_LIST_PROJECTION = os.getenv('EVENT_LIST_PROJECTION', 'True') == 'True'
+
+# Cache partagé entre workers (épinglage au primaire...) ; LocMemCache par défaut, propre à chaque processus
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', ''),
     }
 }
 
+# Filtre de Bloom devant la liste noire des tokens (authentication.blacklist). Les workers se synchronisent
+# par le cache : activé par défaut seulement si le cache est partagé, LocMemCache étant propre à chaque processus
+TOKEN_BLACKLIST_BLOOM = os.getenv('TOKEN_BLACKLIST_BLOOM', str(not CACHES['default']['BACKEND'].endswith('LocMemCache'))) == 'True'
+TOKEN_BLACKLIST_BLOOM_ERROR_RATE = float(os.getenv('TOKEN_BLACKLIST_BLOOM_ERROR_RATE', '0.001'))
+TOKEN_BLACKLIST_BLOOM_MIN_CAPACITY = int(os.getenv('TOKEN_BLACKLIST_BLOOM_MIN_CAPACITY', '100000'))
+TOKEN_BLACKLIST_BLOOM_REBUILD_SECONDS = int(os.getenv('TOKEN_BLACKLIST_BLOOM_REBUILD_SECONDS', '3600'))
+
+# Catalogue des centres d'intérêt (authentication.catalog) : invalidé sur tous les workers par une version
+# stockée dans le cache, ce qui suppose un cache partagé. Avec LocMemCache, chaque worker recharge la table
+# au plus tard après INTEREST_CATALOG_MAX_AGE secondes (0 : jamais)
+INTEREST_CATALOG_MAX_AGE = int(os.getenv('INTEREST_CATALOG_MAX_AGE', '60' if CACHES['default']['BACKEND'].endswith('LocMemCache') else '0'))
+
+# Claims des JWT (authentication.tokens) crus sur parole tant que l'utilisateur n'a pas été modifié. Le marqueur
+# de modification est posé dans le cache : sans cache partagé, l'utilisateur est toujours relu en base
+TOKEN_CLAIMS_TRUSTED = os.getenv('TOKEN_CLAIMS_TRUSTED', str(not CACHES['default']['BACKEND'].endswith('LocMemCache'))) == 'True'
+
+# Clés d'idempotence des lots (events.views.BatchMutationView) : réservées dans le cache, elles ne protègent
+# des nouvelles tentatives que si tous les workers le partagent. Refusées par défaut avec LocMemCache
+BATCH_IDEMPOTENCY_KEYS = os.getenv('BATCH_IDEMPOTENCY_KEYS', str(not CACHES['default']['BACKEND'].endswith('LocMemCache'))) == 'True'
+
 # Configuration de Django REST Framework
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'authentication.tokens.PlanrJWTAuthentication',
     ),
     'DEFAULT_RENDERER_CLASSES': (
-        'djangorestframework_camel_case.render.CamelCaseJSONRenderer',
+        'planr_backend.renderers.CamelCaseJSONRenderer',
         'djangorestframework_camel_case.render.CamelCaseBrowsableAPIRenderer',
     ),
     'DEFAULT_PARSER_CLASSES': (
@@ -117,6 +207,9 @@ SIMPLE_JWT = {
     'USER_ID_FIELD': 'id',
     'USER_ID_CLAIM': 'user_id',
     'USER_AUTHENTICATION_RULE': lambda user: True,
+    # Claims profil / rôle / statut ajoutés aux tokens (voir authentication.tokens)
+    'TOKEN_OBTAIN_SERIALIZER': 'authentication.serializers.PlanrTokenObtainPairSerializer',
+    'TOKEN_REFRESH_SERIALIZER': 'authentication.serializers.PlanrTokenRefreshSerializer',
 }
 
 # Configuration d'authentification
@@ -138,6 +231,27 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# Hasheurs de mots de passe : le premier hache les nouveaux mots de passe, les suivants vérifient les anciens
+# hachages, migrés vers le premier à la connexion suivante. PBKDF2 reste préféré : bcrypt coûte autant et argon2
+# (argon2-cffi) n'est pas une dépendance ; les changer d'ordre rehacherait chaque compte à sa prochaine connexion.
+# argon2 n'est accepté que si sa bibliothèque est installée
+try:
+    import argon2  # noqa: F401
+    _ARGON2_HASHERS = ['django.contrib.auth.hashers.Argon2PasswordHasher']
+except ImportError:
+    _ARGON2_HASHERS = []
+PASSWORD_HASHERS = os.getenv('PASSWORD_HASHERS', '').split(',') if os.getenv('PASSWORD_HASHERS') else [
+    'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    *_ARGON2_HASHERS,
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+]
+# Vérifications de mot de passe simultanées (une par cœur par défaut) et attente maximale d'une place (s).
+# L'attente bloque le thread de la requête (le worker entier avec des workers synchrones) avant la réponse 503 :
+# la garder de l'ordre d'un ou deux hachages (cf. bench_password_hashing), pas de plusieurs secondes
+PASSWORD_CHECK_WORKERS = int(os.getenv('PASSWORD_CHECK_WORKERS', os.cpu_count() or 1))
+PASSWORD_CHECK_TIMEOUT = float(os.getenv('PASSWORD_CHECK_TIMEOUT', '1'))
+
 # Configuration de l'e-mail
 EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
 DEFAULT_FROM_EMAIL = 'no-reply@planr.dev'
@@ -159,22 +273,47 @@ STATIC_ROOT = BASE_DIR / 'staticfiles'
 # Type de champ clé primaire par défaut
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
-# Logging Configuration
+# Configuration des logs : écriture JSON non bloquante (file + thread dédié) avec rotation par taille
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'DEBUG' if DEBUG else 'INFO')
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
+    'formatters': {
+        'json': {
+            '()': 'planr_backend.log.JsonFormatter',
+        },
+    },
     'handlers': {
         'file': {
-            'level': 'DEBUG',
-            'class': 'logging.FileHandler',
-            'filename': BASE_DIR / 'debug.log',
+            '()': 'planr_backend.log.QueueRotatingFileHandler',
+            'filename': os.getenv('LOG_FILE', BASE_DIR / 'debug.log'),
+            'max_bytes': int(os.getenv('LOG_MAX_BYTES', 10 * 1024 * 1024)),
+            'backup_count': int(os.getenv('LOG_BACKUP_COUNT', 5)),
+            'formatter': 'json',
+            'level': LOG_LEVEL,
         },
     },
     'loggers': {
         'django': {
             'handlers': ['file'],
-            'level': 'DEBUG',
+            'level': LOG_LEVEL,
             'propagate': True,
         },
+        # Les requêtes SQL ne sont journalisées que sur demande explicite
+        'django.db.backends': {
+            'level': os.getenv('LOG_SQL_LEVEL', 'INFO'),
+        },
+        'authentication': {
+            'handlers': ['file'],
+            'level': LOG_LEVEL,
+        },
+        'events': {
+            'handlers': ['file'],
+            'level': LOG_LEVEL,
+        },
+        'planr_backend': {
+            'handlers': ['file'],
+            'level': LOG_LEVEL,
+        },
     },
 }
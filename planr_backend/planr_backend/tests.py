@@ -0,0 +1,97 @@
+import json
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+from django.test import SimpleTestCase, override_settings
+
+from .log import JsonFormatter, QueueRotatingFileHandler
+from .metrics import Counter, MetricsRegistry
+
+
+class MetricsRegistryTests(SimpleTestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = Path(directory.name)
+        self.enterContext(override_settings(METRICS_DIR=directory.name))
+        self.registry = MetricsRegistry()
+        self.counter = Counter('planr_test', "Compteur de test.", ['outcome'], registry=self.registry)
+
+    def write_worker_file(self, pid, value):
+        (self.directory / f'{pid}.json').write_text(json.dumps({'planr_test': {json.dumps(['ok']): value}}))
+
+    def total(self):
+        return self.registry.collect().get('planr_test', {}).get(json.dumps(['ok']), 0)
+
+    @staticmethod
+    def dead_pid():
+        process = subprocess.Popen([sys.executable, '-c', ''])
+        process.wait()
+        return process.pid
+
+    def test_dead_worker_file_is_archived_once(self):
+        pid = self.dead_pid()
+        self.write_worker_file(pid, 3)
+        self.counter.inc(outcome='ok')
+
+        self.assertEqual(self.total(), 4)
+        self.assertFalse((self.directory / f'{pid}.json').exists())
+        self.assertEqual(self.total(), 4)  # Compté une seule fois, depuis l'archive
+
+    def test_exiting_worker_removes_its_file(self):
+        self.counter.inc(amount=2, outcome='ok')
+        self.registry.retire()
+
+        self.assertEqual(sorted(path.name for path in self.directory.glob('*.json')), ['archive.json'])
+        self.assertEqual(self.total(), 2)
+
+    def test_recycled_pid_does_not_overwrite_dead_worker(self):
+        self.write_worker_file(os.getpid(), 5)  # Laissé par un worker mort qui avait le même pid
+        self.counter.inc(outcome='ok')
+
+        self.assertEqual(self.total(), 6)
+
+
+class QueueRotatingFileHandlerTests(SimpleTestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = Path(directory.name) / 'app.log'
+        self.handler = QueueRotatingFileHandler(self.path)
+        self.handler.setFormatter(JsonFormatter())
+        self.logger = logging.getLogger('planr_backend.tests.queue')
+        self.logger.propagate = False
+        self.logger.addHandler(self.handler)
+        self.addCleanup(self.logger.removeHandler, self.handler)
+
+    def entries(self):
+        self.handler.close()  # Vide la file et arrête le thread d'écriture
+        return [json.loads(line) for line in self.path.read_text().splitlines()]
+
+    def test_message_is_resolved_when_logged(self):
+        participants = ['alice']
+        self.logger.warning("Participants : %s", participants)
+        participants.append('bob')  # Modifié avant que le thread d'écriture ne traite l'enregistrement
+
+        self.assertEqual(self.entries()[0]['message'], "Participants : ['alice']")
+
+    def test_queued_record_keeps_no_reference_to_args_or_exception(self):
+        try:
+            raise ValueError('boom')
+        except ValueError:
+            record = self.logger.makeRecord(self.logger.name, logging.ERROR, __file__, 0, "Erreur %s", ('x',), sys.exc_info())
+        record.request = object()
+
+        prepared = self.handler.prepare(record)
+        self.assertEqual(prepared.getMessage(), 'Erreur x')
+        self.assertIsNone(prepared.args)
+        self.assertIsNone(prepared.exc_info)
+        self.assertFalse(hasattr(prepared, 'request'))
+        self.assertIn('ValueError: boom', JsonFormatter().format(prepared))
+        self.handler.close()
@@ -2,6 +2,7 @@ from django.urls import path, include
 from django.contrib import admin
 from rest_framework.routers import DefaultRouter
 from authentication.views import UserViewSet
+from .views import RequestMetricsView, metrics_view
 
 
 router = DefaultRouter()
@@ -11,4 +12,6 @@ urlpatterns = [
     path('', include('authentication.urls')),
     path('', include('events.urls')),
     path('admin/', admin.site.urls),
+    path('metrics/', metrics_view, name='metrics'),
+    path('metrics/requests/', RequestMetricsView.as_view(), name='request-metrics'),
 ]
@@ -0,0 +1,31 @@
+import hmac
+
+from django.conf import settings
+from django.http import Http404, HttpResponse, HttpResponseForbidden
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from .metrics import REGISTRY
+from .middleware import request_metrics
+
+
+class RequestMetricsView(APIView):
+    """ Agrégats de profilage par vue, réservés aux administrateurs """
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response(request_metrics.snapshot())
+
+
+def metrics_view(request):
+    """
+    Métriques métier au format d'exposition Prometheus.
+    Protégé par le jeton METRICS_TOKEN (en-tête `Authorization: Bearer <jeton>`), désactivé sans jeton.
+    """
+    if not settings.METRICS_TOKEN:
+        raise Http404()
+    expected = f'Bearer {settings.METRICS_TOKEN}'
+    if not hmac.compare_digest(request.headers.get('Authorization', ''), expected):
+        return HttpResponseForbidden()
+    return HttpResponse(REGISTRY.exposition(), content_type='text/plain; version=0.0.4; charset=utf-8')